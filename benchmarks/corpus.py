@@ -0,0 +1,189 @@
+"""
+Deterministic generator of synthetic HTML pages for benchmarking:
+realistic news articles along with adversarial layouts.
+"""
+
+import random
+
+from html import escape
+from typing import Callable, Dict, Iterator, List, Tuple
+
+
+WORDS = (
+    "the of and to in is was for on that with as by at from his her are this be "
+    "which or an have has had not were but they their one all been new more when "
+    "quantum network model market policy government city research data system "
+    "report study people year week minister company energy climate election court "
+    "school health water science team season music history public local national "
+    "university analysis results growth security technology program community"
+).split()
+
+NAV_LABELS = ["Home", "World", "Politics", "Business", "Tech", "Science", "Sports", "Culture", "Opinion", "Video"]
+
+CONTENT_CLASSES = ["post-content", "entry-content", "article-body", "story-content", "main-content", "content"]
+
+CODE_LINES = [
+    "def {name}(value, *args):",
+    "    result = [item for item in value if item]",
+    '    LOGGER.debug("processing %s", value)',
+    "    for index, item in enumerate(result):",
+    "        if index % 2 == 0 and item is not None:",
+    "            yield {{'index': index, 'item': item}}",
+    "    return None",
+    "",
+]
+
+
+class PageGenerator:
+    "Generate HTML pages of different kinds from a seeded random source."
+
+    def __init__(self, seed: int = 42) -> None:
+        self.rng = random.Random(seed)
+
+    def words(self, low: int, high: int) -> str:
+        "Return a random sequence of words."
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def sentence(self) -> str:
+        "Return a capitalized sentence."
+        text = self.words(6, 22)
+        return text[0].upper() + text[1:] + self.rng.choice(".!?.")
+
+    def paragraph(self, sentences: int = 5) -> str:
+        "Return a paragraph with inline formatting and links."
+        parts = []
+        for _ in range(self.rng.randint(max(1, sentences - 2), sentences + 2)):
+            sentence = escape(self.sentence())
+            roll = self.rng.random()
+            if roll < 0.1:
+                sentence = f"<b>{sentence}</b>"
+            elif roll < 0.2:
+                sentence = f'<a href="/{self.rng.choice(WORDS)}">{sentence}</a>'
+            elif roll < 0.25:
+                sentence = f"<em>{sentence}</em>"
+            parts.append(sentence)
+        return f"<p>{' '.join(parts)}</p>"
+
+    def navigation(self, links: int = 10) -> str:
+        "Return a navigation bar."
+        items = "".join(
+            f'<li><a href="/{label.lower()}">{label}</a></li>'
+            for label in (self.rng.choice(NAV_LABELS) for _ in range(links))
+        )
+        return f'<nav class="main-nav"><ul>{items}</ul></nav>'
+
+    def boilerplate_block(self, name: str) -> str:
+        "Return a typical block of boilerplate."
+        links = "".join(
+            f'<li><a href="/{i}">{escape(self.words(2, 6))}</a></li>' for i in range(self.rng.randint(3, 8))
+        )
+        return f'<div class="{name}"><h3>{escape(self.words(1, 3))}</h3><ul>{links}</ul></div>'
+
+    def page(self, title: str, body: str, head: str = "") -> str:
+        "Wrap the content into a full document with header and footer."
+        return (
+            "<!DOCTYPE html>\n<html lang=\"en\"><head><meta charset=\"utf-8\">"
+            f"<title>{escape(title)}</title>{head}</head><body>"
+            f'<header class="site-header">{self.navigation()}</header>'
+            f"{body}"
+            f'<footer id="footer"><p>Copyright {escape(self.words(3, 6))}</p>{self.navigation(6)}</footer>'
+            "</body></html>"
+        )
+
+    def news_article(self) -> str:
+        "A realistic article with teasers, sharing links and related content."
+        title = self.sentence()
+        blocks = [f"<h1>{escape(title)}</h1>", f'<div class="byline">By {escape(self.words(2, 3))}</div>']
+        for num in range(self.rng.randint(8, 25)):
+            blocks.append(self.paragraph())
+            if num % 6 == 5:
+                blocks.append(f"<h2>{escape(self.sentence())}</h2>")
+            if num == 3:
+                items = "".join(f"<li>{escape(self.sentence())}</li>" for _ in range(4))
+                blocks.append(f"<ul>{items}</ul>")
+            if num == 7:
+                blocks.append(f"<blockquote>{escape(self.sentence())}</blockquote>")
+            if num == 9:
+                blocks.append('<figure><img src="/img/photo.jpg" alt="photo"><figcaption>Caption</figcaption></figure>')
+        content_class = self.rng.choice(CONTENT_CLASSES)
+        body = (
+            f'<main><article><div class="{content_class}">{"".join(blocks)}</div>'
+            f'<div class="share-buttons">{self.navigation(5)}</div>'
+            f"{self.boilerplate_block('related-posts')}{self.boilerplate_block('teaser')}"
+            f"</article><aside class=\"sidebar\">{self.boilerplate_block('widget')}</aside></main>"
+        )
+        return self.page(title, body)
+
+    def link_heavy(self) -> str:
+        "A portal page mostly made of navigation and link lists."
+        sections = []
+        for _ in range(self.rng.randint(30, 60)):
+            links = "".join(
+                f'<a href="/{i}">{escape(self.words(1, 5))}</a> ' for i in range(self.rng.randint(5, 25))
+            )
+            sections.append(f'<div class="section-content"><p>{links}</p><p>{escape(self.sentence())}</p></div>')
+        return self.page("Portal", f'<div class="content">{"".join(sections)}</div>')
+
+    def deep_nesting(self, depth: int = 200, width: int = 3) -> str:
+        "Deeply nested div soup, near the default depth limit of libxml2."
+        parts: List[str] = []
+        for level in range(depth):
+            link = f'<a href="/{level}">{escape(self.words(1, 3))}</a>' if level % 3 == 0 else ""
+            siblings = "".join(f"<div><p>{escape(self.sentence())} {link}</p></div>" for _ in range(width))
+            parts.append(f'<div class="level-{level}">{siblings}')
+        inner = "".join(parts) + "</div>" * depth
+        return self.page("Nested", f'<article class="post-content">{inner}</article>')
+
+    def huge_table(self, rows: int = 10000) -> str:
+        "A long data table."
+        header = "".join(f"<th>{escape(self.rng.choice(WORDS))}</th>" for _ in range(5))
+        lines = "".join(
+            "<tr>" + "".join(f"<td>{self.rng.randint(0, 10**6)}</td>" for _ in range(4))
+            + f"<td>{escape(self.words(1, 4))}</td></tr>"
+            for _ in range(rows)
+        )
+        body = f'<article><h1>Data</h1>{self.paragraph()}<table><thead><tr>{header}</tr></thead><tbody>{lines}</tbody></table></article>'
+        return self.page("Table", body)
+
+    def code_blocks(self, blocks: int = 20, lines: int = 400) -> str:
+        "Documentation page with large code listings."
+        parts = []
+        for num in range(blocks):
+            code = "\n".join(
+                escape(self.rng.choice(CODE_LINES).format(name=self.rng.choice(WORDS))) for _ in range(lines)
+            )
+            parts.append(f'{self.paragraph(3)}<pre><code class="language-python">{code}</code></pre>')
+        return self.page("Documentation", f'<div class="entry-content">{"".join(parts)}</div>')
+
+    def comment_section(self, comments: int = 800) -> str:
+        "Short article followed by a large comment section."
+        items = "".join(
+            f'<li class="comment"><div class="comment-author">{escape(self.words(1, 2))}</div>'
+            f'<div class="comment-content">{self.paragraph(2)}</div>'
+            f'<a class="reply-link" href="#r{i}">Reply</a></li>'
+            for i in range(comments)
+        )
+        body = (
+            f'<article class="post"><div class="post-body">{"".join(self.paragraph() for _ in range(5))}</div>'
+            f'<section id="comments"><h2>Comments</h2><ol class="commentlist">{items}</ol></section></article>'
+        )
+        return self.page("Discussion", body)
+
+
+# kind: (generator method, number of documents)
+CORPUS_SPEC: Dict[str, Tuple[Callable[[PageGenerator], str], int]] = {
+    "news": (PageGenerator.news_article, 40),
+    "navigation": (PageGenerator.link_heavy, 8),
+    "nested": (PageGenerator.deep_nesting, 4),
+    "table": (PageGenerator.huge_table, 1),
+    "code": (PageGenerator.code_blocks, 2),
+    "comments": (PageGenerator.comment_section, 2),
+}
+
+
+def generate_corpus(seed: int = 42, scale: float = 1.0) -> Iterator[Tuple[str, str, str]]:
+    "Yield (name, kind, html) tuples, the same ones for a given seed and scale."
+    generator = PageGenerator(seed)
+    for kind, (method, number) in CORPUS_SPEC.items():
+        for num in range(max(1, round(number * scale))):
+            yield f"{kind}-{num:03d}", kind, method(generator)
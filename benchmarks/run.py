@@ -0,0 +1,183 @@
+"""
+Benchmark the extraction on a synthetic corpus and compare the results
+with a stored baseline.
+
+Usage: python benchmarks/run.py [--scale 1.0] [--update-baseline] [--tolerance 0.25] [--fast]
+
+With --fast the fast mode is run as well and compared to the default mode:
+speedup and share of the tokens of the default output which are kept.
+
+Throughput figures depend on the machine, the baseline should be
+regenerated with --update-baseline when the reference hardware changes.
+"""
+
+import argparse
+import hashlib
+import json
+import resource
+import sys
+import tracemalloc
+
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import generate_corpus  # noqa: E402
+
+from trafilatura import _internal_extraction  # noqa: E402
+from trafilatura.settings import Extractor  # noqa: E402
+from trafilatura.stats import ExtractionStats  # noqa: E402
+
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# metric: True if higher is better
+CHECKED_METRICS = {
+    "docs_per_sec": True,
+    "mb_per_sec": True,
+    "peak_python_memory_mb": False,
+}
+
+
+def run_benchmark(
+    corpus: List[Tuple[str, str, str]],
+    output_format: str = "markdown",
+    repeat: int = 3,
+    fast: bool = False,
+) -> Dict[str, Any]:
+    "Extract the corpus several times and gather the figures of the fastest run."
+    total_bytes = sum(len(html.encode("utf-8")) for _, _, html in corpus)
+    options = Extractor(output_format=output_format, fast=fast)
+    # warm-up
+    for _, _, html in corpus[:5]:
+        _internal_extraction(html, options=options)
+
+    best, best_stats, per_kind = float("inf"), ExtractionStats(), {}
+    for _ in range(repeat):
+        stats = ExtractionStats()
+        kind_times: Dict[str, float] = {}
+        start = perf_counter()
+        for _, kind, html in corpus:
+            doc_start = perf_counter()
+            _internal_extraction(html, options=options, stats=stats)
+            kind_times[kind] = kind_times.get(kind, 0.0) + perf_counter() - doc_start
+        duration = perf_counter() - start
+        if duration < best:
+            best, best_stats, per_kind = duration, stats, kind_times
+
+    # memory, measured separately since tracing slows the extraction down,
+    # the outputs are hashed to make sure optimizations do not change them
+    peak, digests = 0, {}
+    for name, _, html in corpus:
+        tracemalloc.start()
+        document = _internal_extraction(html, options=options)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        text = document.text if document is not None else None
+        digests[name] = hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:16]
+
+    summary = best_stats.as_dict()
+    return {
+        "documents": len(corpus),
+        "megabytes": round(total_bytes / 1e6, 3),
+        "seconds": round(best, 4),
+        "docs_per_sec": round(len(corpus) / best, 2),
+        "mb_per_sec": round(total_bytes / 1e6 / best, 3),
+        "peak_python_memory_mb": round(peak / 1e6, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "kinds_seconds": {kind: round(value, 4) for kind, value in per_kind.items()},
+        "stages": {
+            name: {key: round(stage[key] * 1000, 3) for key in ("p50", "p90", "p99", "max")}
+            for name, stage in summary["stages"].items()
+        },
+        "counters": summary["counters"],
+        "outputs": digests,
+    }
+
+
+def compare_fast_mode(
+    corpus: List[Tuple[str, str, str]], results: Dict[str, Any], output_format: str, repeat: int
+) -> Dict[str, Any]:
+    "Run the fast mode and compare its speed and its outputs to the default mode."
+    fast = run_benchmark(corpus, output_format, repeat, fast=True)
+    recalls, identical = [], 0
+    for _, _, html in corpus:
+        texts = []
+        for mode in (False, True):
+            document = _internal_extraction(html, options=Extractor(output_format=output_format, fast=mode))
+            texts.append(document.text if document is not None else "")
+        reference, candidate = Counter(texts[0].split()), Counter(texts[1].split())
+        recalls.append(sum((reference & candidate).values()) / max(sum(reference.values()), 1))
+        identical += texts[0] == texts[1]
+    return {
+        "docs_per_sec": fast["docs_per_sec"],
+        "speedup": round(fast["docs_per_sec"] / results["docs_per_sec"], 2),
+        "p50_total_ms": fast["stages"]["total"]["p50"],
+        "token_recall": round(sum(recalls) / len(recalls), 3),
+        "min_token_recall": round(min(recalls), 3),
+        "identical_outputs": identical,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    "List the metrics which are worse than the baseline beyond the tolerance."
+    regressions = []
+    for metric, higher_is_better in CHECKED_METRICS.items():
+        if metric not in baseline:
+            continue
+        current, reference = results[metric], baseline[metric]
+        if higher_is_better and current < reference * (1 - tolerance):
+            regressions.append(f"{metric}: {current} < {reference} (-{tolerance:.0%})")
+        elif not higher_is_better and current > reference * (1 + tolerance):
+            regressions.append(f"{metric}: {current} > {reference} (+{tolerance:.0%})")
+    changed = [
+        name for name, digest in baseline.get("outputs", {}).items()
+        if results["outputs"].get(name) != digest
+    ]
+    if changed:
+        regressions.append(f"outputs changed: {', '.join(changed)}")
+    return regressions
+
+
+def main() -> int:
+    "Run the benchmark from the command line."
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of documents per kind")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--format", default="markdown", dest="output_format")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="accepted relative slowdown")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--fast", action="store_true", help="compare the fast mode to the default mode")
+    args = parser.parse_args()
+
+    corpus = list(generate_corpus(args.seed, args.scale))
+    results = run_benchmark(corpus, args.output_format, args.repeat)
+    results["settings"] = {"seed": args.seed, "scale": args.scale, "format": args.output_format}
+    if args.fast:
+        results["fast_mode"] = compare_fast_mode(corpus, results, args.output_format, args.repeat)
+    print(json.dumps({key: value for key, value in results.items() if key != "outputs"}, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        return 0
+    if not baseline_path.is_file():
+        print("no baseline found", file=sys.stderr)
+        return 0
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("settings") != results["settings"]:
+        print("baseline settings differ, skipping comparison", file=sys.stderr)
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
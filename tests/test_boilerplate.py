@@ -0,0 +1,52 @@
+import pickle
+
+from lxml.html import fromstring
+
+from trafilatura import _internal_extraction
+from trafilatura.boilerplate import BoilerplateLearner, block_signatures
+from trafilatura.settings import Extractor
+
+PROMO = '<div class="promo-{}"><p>Subscribe to our newsletter to get the best stories every morning.</p></div>'
+
+
+def site_page(num):
+    paragraphs = "".join(
+        f"<p>Paragraph {i} of article {num}, with enough words to be considered as main text.</p>"
+        for i in range(8)
+    )
+    return f"<html><body><article><h1>Title {num}</h1>{paragraphs}{PROMO.format(num)}</article></body></html>"
+
+
+def test_block_signatures():
+    tree = fromstring('<div><div class="a"><p>Text <b>x</b> y</p></div><div class="b"><p>Text <b>x</b> y </p></div><div> </div></div>')
+    signatures = block_signatures(tree)
+    first, second, empty = tree
+    assert signatures[first] == signatures[second] != signatures[tree]
+    assert empty not in signatures
+
+
+def test_learner():
+    learner = BoilerplateLearner(min_pages=2)
+    results = []
+    for num in range(5):
+        options = Extractor(url=f"https://example.org/{num}", learner=learner)
+        results.append(_internal_extraction(site_page(num), options=options).text)
+    assert ["Subscribe" in text for text in results] == [True, True, False, False, False]
+    assert all(f"Paragraph 7 of article {num}" in text for num, text in enumerate(results))
+    # other hosts and pages without URL are not affected
+    for url in ("https://example.com/1", None):
+        options = Extractor(url=url, learner=learner)
+        assert "Subscribe" in _internal_extraction(site_page(9), options=options).text
+    # the same page seen again is not erased
+    options = Extractor(url="https://example.org/0", learner=learner)
+    for _ in range(4):
+        assert "Paragraph 7 of article 0" in _internal_extraction(site_page(0), options=options).text
+    # bounded memory
+    learner = BoilerplateLearner(max_blocks=3, max_hosts=2)
+    for host in ("a", "b", "c"):
+        learner.process(fromstring(site_page(0)), f"https://{host}.org/")
+    assert list(learner.hosts) == ["b.org", "c.org"]
+    assert all(len(counts) == 3 for counts in learner.hosts.values())
+    # worker processes start from scratch
+    copied = pickle.loads(pickle.dumps(learner))
+    assert copied.max_blocks == 3 and not copied.hosts
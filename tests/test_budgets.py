@@ -0,0 +1,41 @@
+import pytest
+
+from lxml.html import fromstring
+
+from trafilatura import ExtractionStats, ExtractionTimeout, _internal_extraction
+from trafilatura.deadline import current_deadline, time_budget
+from trafilatura.settings import Extractor
+
+
+def test_size_budgets(html_content):
+    options = Extractor(output_format="markdown")
+    assert _internal_extraction(html_content, options=options) is not None
+    stats = ExtractionStats()
+    options.max_file_size = len(html_content) - 1
+    assert _internal_extraction(html_content, options=options, stats=stats) is None
+    options.max_file_size, options.min_file_size = len(html_content), len(html_content) + 1
+    assert _internal_extraction(html_content, options=options, stats=stats) is None
+    assert stats.as_dict()["counters"]["rejected_size"] == 2
+
+    options = Extractor(output_format="markdown")
+    tree = fromstring(html_content)
+    options.max_tree_size = sum(1 for _ in tree.iter())
+    assert _internal_extraction(tree, options=options) is not None
+    options.max_tree_size -= 1
+    assert _internal_extraction(tree, options=options) is None
+
+
+def test_time_budget(html_content):
+    options = Extractor(output_format="markdown")
+    # the time budget is opt-in
+    assert options.timeout == 0
+    options.timeout = 1e-9
+    with pytest.raises(ExtractionTimeout):
+        _internal_extraction(html_content, options=options)
+    # the deadline only applies to the extraction
+    assert current_deadline().seconds == float("inf")
+    with time_budget(0) as deadline:
+        deadline.check()
+        assert list(deadline.iterate([1, 2])) == [1, 2]
+    with time_budget(1e-9) as deadline, pytest.raises(ExtractionTimeout):
+        list(deadline.iterate([1, 2]))
@@ -0,0 +1,56 @@
+from trafilatura import ResultCache, _internal_extraction, extract_file
+from trafilatura.cache import hash_input, options_key
+from trafilatura.settings import Extractor
+
+
+def test_memory_cache(html_content):
+    cache = ResultCache(max_entries=2)
+    expected = _internal_extraction(html_content, "markdown").text
+    assert _internal_extraction(html_content, "markdown", cache=cache).text == expected
+    assert cache.stats["misses"] == 1 and cache.stats["stores"] == 1
+    document = _internal_extraction(html_content, "markdown", cache=cache)
+    assert document.text == expected and len(document.body) == 0
+    assert cache.stats["hits"] == cache.stats["memory_hits"] == 1
+    # bytes are decoded differently, other options
+    assert hash_input(html_content) != hash_input(html_content.encode("utf-8"))
+    assert options_key(Extractor(output_format="txt")) != options_key(Extractor(output_format="markdown"))
+    # the date and the URL of copies do not change the output without metadata
+    options = Extractor(url="https://example.org/copy")
+    options.date_params["max_date"] = "2000-01-01"
+    assert options_key(options) == options_key(Extractor())
+    assert options_key(Extractor(url="https://example.org/copy", with_metadata=True)) != options_key(Extractor(with_metadata=True))
+    assert options_key(Extractor(comments=False)) != options_key(Extractor())
+    _internal_extraction(html_content, "txt", cache=cache)
+    _internal_extraction(html_content, "xml", cache=cache)
+    assert cache.stats["evictions"] == 1 and len(cache.memory) == 2
+    # deduplication depends on the documents seen before
+    assert cache.key(html_content, Extractor(dedup=True)) is None
+
+
+def test_disk_cache(tmp_path, html_content):
+    database = tmp_path / "cache.sqlite"
+    path = tmp_path / "page.html"
+    path.write_text(html_content, encoding="utf-8")
+    cache = ResultCache(path=database)
+    expected = extract_file(path, output_format="markdown", cache=cache).text
+    cache.close()
+
+    cache = ResultCache(path=database)
+    assert extract_file(path, output_format="markdown", cache=cache).text == expected
+    assert cache.stats["disk_hits"] == 1
+    cache.invalidate()
+    assert extract_file(path, output_format="markdown", cache=cache).text == expected
+    assert cache.stats["misses"] == 1
+    cache.close()
+
+    # entries of another version are discarded
+    cache = ResultCache(path=database, version="0.0")
+    assert cache.get(cache.key(path, Extractor(output_format="markdown"))) is None
+    cache.close()
+
+    # the least recently used entries are evicted
+    cache = ResultCache(path=database, max_disk_size=len(expected) + 10)
+    for output_format in ("markdown", "txt"):
+        _internal_extraction(html_content, output_format, cache=cache)
+    assert cache.stats["evictions"] == 1
+    cache.close()
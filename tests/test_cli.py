@@ -0,0 +1,63 @@
+import io
+import json
+
+from trafilatura.cli import main, parse_args
+from trafilatura.cli_utils import process_records, read_inputs
+from trafilatura.settings import args_to_extractor
+
+
+def test_cli_jsonl(html_content, expected_md, tmp_path):
+    records = tmp_path / "corpus.jsonl"
+    records.write_text(
+        json.dumps({"id": "doc/1", "url": "https://example.org", "html": html_content})
+        + "\n\n"
+        + json.dumps({"id": "broken"})
+        + "\n",
+        encoding="utf-8",
+    )
+    output_dir = tmp_path / "out"
+    assert main([str(records), "--markdown", "-o", str(output_dir), "--parallel", "1"]) == 0
+    assert (output_dir / "doc" / "1.md").read_text(encoding="utf-8") == expected_md
+
+    args = parse_args(["--markdown", "--jsonl"])
+    stdin = io.StringIO(records.read_text(encoding="utf-8"))
+    output = io.StringIO()
+    total, successes = process_records(
+        read_inputs([], stdin), args_to_extractor(args), output=output, jsonl=True, parallel=1
+    )
+    assert (total, successes) == (1, 1)
+    result = json.loads(output.getvalue())
+    assert result == {"id": "doc/1", "url": "https://example.org", "text": expected_md}
+
+    # the URL of the record is passed to the extraction
+    args = parse_args(["--output-format", "json", "--with-metadata"])
+    page = "<html><body><article><p>" + "Some text of the record. " * 20 + "</p></article></body></html>"
+    output = io.StringIO()
+    records = iter([("doc/2", "https://example.org/page", page)])
+    process_records(records, args_to_extractor(args), output=output, parallel=1)
+    result = json.loads(output.getvalue())
+    assert result["source"] == "https://example.org/page" and result["hostname"] == "example.org"
+
+
+def test_cli_filters():
+    text = "<p>" + "Some text of the record. " * 20 + "</p>"
+    comments = '<div class="comments"><p>' + "A comment on the post. " * 10 + "</p></div>"
+    page = "<html><head>{}</head><body><article>{}</article></body></html>"
+    dated = '<title>A</title><meta property="article:published_time" content="2024-05-06T10:00:00Z">'
+    records = [
+        ("dated", "https://example.org/a", page.format(dated, text + comments)),
+        ("undated", "https://example.org/b", page.format("<title>B</title>", text)),
+        ("german", None, page.format('<meta http-equiv="content-language" content="de">', text)),
+    ]
+
+    def run(*flags):
+        output = io.StringIO()
+        args = parse_args(["--jsonl", *flags])
+        process_records(iter(records), args_to_extractor(args), output=output, jsonl=True, parallel=1)
+        return {result["id"]: result["text"] for result in map(json.loads, output.getvalue().splitlines())}
+
+    assert set(run()) == {"dated", "undated", "german"} and "A comment" in run()["dated"]
+    # documents without title, URL and date are skipped
+    assert set(run("--only-with-metadata")) == {"dated"}
+    assert set(run("--target-language", "en", "--fast")) == {"dated", "undated"}
+    assert "A comment" not in run("--no-comments")["dated"]
@@ -0,0 +1,58 @@
+from io import StringIO
+
+from lxml.etree import tostring
+
+from trafilatura import FeedExtractor, _internal_extraction, extract_file, extract_path
+from trafilatura.settings import Extractor
+
+
+def test_extract_file(tmp_path, html_content):
+    path = tmp_path / "page.html"
+    path.write_text(html_content, encoding="utf-8")
+    expected = _internal_extraction(html_content, "markdown").text
+    output = StringIO()
+    document = extract_file(path, output, "markdown")
+    # streamed without the whole string
+    assert document.text is None and output.getvalue() == expected
+    assert extract_file(path, output_format="markdown").text == expected
+    destination = tmp_path / "page.md"
+    assert extract_path(str(path), destination, "markdown") is True
+    assert destination.read_text(encoding="utf-8") == expected
+    # nothing written without a result, the file is too small
+    path.write_text("<p>x</p>", encoding="utf-8")
+    assert extract_path(path, tmp_path / "none.md") is False
+    assert not (tmp_path / "none.md").exists()
+
+
+def test_feed_extractor(html_content):
+    data = html_content.encode("utf-8")
+    expected = _internal_extraction(data, "markdown").text
+    extractor = FeedExtractor("markdown")
+    for pos in range(0, len(data), 1000):
+        assert extractor.feed(data[pos : pos + 1000]) is True
+    assert extractor.close().text == expected
+    # parsing stops when the maximum size is exceeded
+    options = Extractor(output_format="markdown")
+    options.max_file_size = 5000
+    extractor = FeedExtractor(options=options)
+    assert extractor.feed(data[:4000]) is True
+    assert extractor.feed(data[4000:8000]) is False
+    assert extractor.close() is None
+
+
+def test_fast_mode(html_content):
+    expected = _internal_extraction(html_content, "txt").text
+    document = _internal_extraction(html_content, options=Extractor(fast=True))
+    text = document.text
+    assert text.startswith("Quantum neural network\n") and len(text.split()) > 0.9 * len(expected.split())
+    # the plain rendering leaves the tree unchanged
+    unrendered = _internal_extraction(html_content, options=Extractor(fast=True), render=False)
+    assert tostring(document.body) == tostring(unrendered.body)
+    # formatting is still rendered if required
+    expected = _internal_extraction(html_content, "markdown").text
+    assert _internal_extraction(html_content, options=Extractor(output_format="markdown", fast=True)).text == expected
+    # no fallback on the next expressions
+    paragraph = "<p>This paragraph of the article contains enough words to be kept in the output.</p>"
+    html = f'<html><body><div class="post-content"><p>Short teaser.</p></div><article>{paragraph * 3}</article></body></html>'
+    assert "paragraph" in _internal_extraction(html).text
+    assert _internal_extraction(html, options=Extractor(fast=True)).text == "Short teaser."
@@ -0,0 +1,93 @@
+import io
+import random
+
+from concurrent.futures import ThreadPoolExecutor
+
+from trafilatura import _internal_extraction
+from trafilatura.cli_utils import process_records
+from trafilatura.deduplication import (
+    LRU_TEST,
+    LRUCache,
+    NearDuplicateIndex,
+    SimHash,
+    content_fingerprint,
+    hamming_distance,
+)
+from trafilatura.settings import Extractor
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    assert cache.increment("a") == 0
+    assert cache.increment("b") == 0
+    assert cache.increment("a") == 1
+    cache.increment("c")
+    assert len(cache) == 2 and cache.get("b") == 0 and cache.get("a") == 2
+    cache = LRUCache(maxsize=10)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(cache.increment, ["x"] * 1000))
+    assert cache.get("x") == 1000
+
+
+def test_dedup(html_content):
+    LRU_TEST.clear()
+    options = Extractor(output_format="markdown", dedup=True)
+    expected = _internal_extraction(html_content, "markdown").text
+    lengths = [len(_internal_extraction(html_content, options=options).text) for _ in range(4)]
+    # repeated segments are removed after max_repetitions
+    assert lengths[: options.max_repetitions + 1] == [len(expected)] * (options.max_repetitions + 1)
+    assert lengths[-1] < len(expected)
+    LRU_TEST.clear()
+    assert _internal_extraction(html_content, options=options).text == expected
+    LRU_TEST.clear()
+
+
+def test_simhash():
+    rng = random.Random(1)
+    words = [f"w{i}" for i in range(300)]
+    texts = [" ".join(rng.choices(words, k=rng.randint(200, 400))) for _ in range(50)] + ["", "a", "a b"]
+    fingerprints = [SimHash(text).value() for text in texts]
+    assert SimHash("").value() == SimHash("  ").value() == 0
+    # incremental computation
+    tokens = texts[0].split()
+    simhash = SimHash()
+    for pos in range(0, len(tokens), 7):
+        simhash.update(" ".join(tokens[pos : pos + 7]))
+    assert simhash.value() == fingerprints[0]
+    # a small change leads to a close fingerprint
+    tokens[len(tokens) // 2] = "changed"
+    assert hamming_distance(SimHash(" ".join(tokens)).value(), fingerprints[0]) < 8
+    assert hamming_distance(fingerprints[0], fingerprints[1]) > 16
+
+
+def test_near_duplicate_index():
+    rng = random.Random(2)
+    index = NearDuplicateIndex(max_distance=3)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    for num, value in enumerate(values):
+        assert index.add(value, num) is None
+    for num, value in enumerate(values):
+        for bit in rng.sample(range(64), 3):
+            value ^= 1 << bit
+        assert index.query(f"{value:016x}") == num
+    assert index.add(values[0] ^ 0b1111, "new") is None
+    # the least recently used fingerprints are evicted
+    index = NearDuplicateIndex(max_distance=3, maxsize=100)
+    for num, value in enumerate(values[:150]):
+        if num == 99:
+            assert index.add(values[0] ^ 1, num) == 0
+        else:
+            assert index.add(value, num) is None
+    assert len(index) == 100 and index.query(values[0]) == 0 and index.query(values[1]) is None
+    assert sum(len(bucket) for bucket in index.tables[0].values()) == 100
+
+
+def test_fingerprint_output(html_content):
+    document = _internal_extraction(html_content, options=Extractor(with_metadata=True))
+    assert document.fingerprint == content_fingerprint(" ".join(document.body.itertext()))
+    assert f"fingerprint: {document.fingerprint}" in document.text
+    assert _internal_extraction(html_content).fingerprint is None
+    # near duplicates are skipped in batch runs
+    records = [("a", None, html_content), ("b", None, html_content.replace("<p>", "<p>Intro. ", 1))]
+    output = io.StringIO()
+    assert process_records(iter(records), Extractor(dedup=True), output, parallel=1) == (2, 1)
@@ -0,0 +1,109 @@
+from copy import deepcopy
+
+from lxml.html import fromstring, tostring
+
+from trafilatura import _internal_extraction, load_html
+from trafilatura.htmlprocessing import (
+    LinkStatsTable,
+    TreeJournal,
+    collect_link_info,
+    delete_by_link_density,
+    prune_unwanted_nodes,
+    tree_cleaning,
+)
+from trafilatura.settings import Extractor
+from trafilatura.utils import trim
+from trafilatura.xml import delete_element
+from trafilatura.xpaths import OVERALL_DISCARD_XPATH
+
+
+def prune_with_copy(tree, nodelist):
+    "Former implementation, based on a full copy."
+    old_len = len(tree.text_content())
+    backup = deepcopy(tree)
+    for expression in nodelist:
+        for subtree in expression(tree):
+            if subtree.tail is not None:
+                prev = subtree.getprevious()
+                if prev is None:
+                    prev = subtree.getparent()
+                prev.tail = (prev.tail or "") + " " + subtree.tail
+            delete_element(subtree)
+    return tree if len(tree.text_content()) > old_len / 7 else backup
+
+
+def test_journal():
+    tree = fromstring("<div>a<p>b</p>c<span>d<i>e</i>f</span>g<b>h</b>i</div>")
+    before = tostring(tree)
+    journal = TreeJournal()
+    journal.delete(tree.find(".//i"))
+    journal.delete(tree.find("span"))
+    journal.set_tail(tree[0], "x")
+    after = tostring(tree)
+    assert after != before
+    journal.rollback()
+    assert tostring(tree) == before
+    journal.replay()
+    assert tostring(tree) == after
+
+
+def test_prune_backup():
+    htmlstrings = [
+        # pruning reverted
+        '<html><body><article><div class="nav">Long text in a navigation block, so long that removing it would delete nearly everything.</div><p>Text.</p></article></body></html>',
+        # nested matches
+        '<html><body><article><div class="footer"><div class="share">x</div>a</div>b<p>Some text which is long enough.</p></article></body></html>',
+        '<html><body><article><div id="footer"><div id="sidebar">x</div>a</div>b</article></body></html>',
+    ]
+    for htmlstring in htmlstrings:
+        reference = prune_with_copy(fromstring(htmlstring), OVERALL_DISCARD_XPATH)
+        tree = fromstring(htmlstring)
+        result = prune_unwanted_nodes(tree, OVERALL_DISCARD_XPATH, with_backup=True)
+        assert tostring(result) == tostring(reference)
+        # the input tree is pruned in both cases
+        assert tostring(tree) == tostring(prune_unwanted_nodes(fromstring(htmlstring), OVERALL_DISCARD_XPATH))
+    # the backup is only materialized when needed
+    assert prune_unwanted_nodes(fromstring(htmlstrings[0]), OVERALL_DISCARD_XPATH, with_backup=True).find(".//div") is not None
+    tree = fromstring(htmlstrings[1])
+    assert prune_unwanted_nodes(tree, OVERALL_DISCARD_XPATH, with_backup=True) is tree
+
+
+def test_recall_cleaning():
+    htmlstring = "<html><body><aside><p>Text</p></aside><div>Other</div></body></html>"
+    tree = tree_cleaning(fromstring(htmlstring), Extractor(recall=True))
+    assert tree.find(".//p") is not None
+    tree = tree_cleaning(fromstring(htmlstring), Extractor())
+    assert tree.find(".//p") is None
+
+
+def test_consume(html_content):
+    tree = load_html(html_content)
+    before = tostring(tree)
+    first = _internal_extraction(tree, "markdown")
+    assert tostring(tree) == before
+    second = _internal_extraction(tree, "markdown", consume=True)
+    assert second.text == first.text
+    assert tostring(tree) != before
+
+
+def test_link_stats_table():
+    htmlstring = """<div> a<!-- c --> b <ref>link one</ref> <ref>  </ref>
+    <div><ref><ref>nested</ref> and</ref>text<p>x</p>\n<p> y <ref>z</ref></p></div>tail
+    <list><item><ref>one</ref></item><item><ref>two</ref></item><item><ref>three</ref></item></list></div>"""
+    tree = fromstring(htmlstring)
+    table = LinkStatsTable(tree)
+
+    def check():
+        for elem in tree.iter("*"):
+            assert table.text_length(elem) == len(trim(elem.text_content()))
+            linklen, elemnum, shortelems, _ = collect_link_info(elem.findall(".//ref"))
+            assert table.link_info(elem) == (linklen, elemnum, shortelems, len(elem.findall(".//ref")))
+
+    check()
+    delete_by_link_density(tree, "list", table=table)
+    assert tree.find(".//list") is None
+    check()
+    # same results without the table
+    reference = fromstring(htmlstring)
+    delete_by_link_density(reference, "list")
+    assert tostring(tree) == tostring(reference)
@@ -0,0 +1,43 @@
+import json
+
+from lxml.html import fromstring
+
+from trafilatura import extract_metadata, json_metadata
+from trafilatura.json_metadata import MAX_JSON_SIZE, extract_json_ld
+from trafilatura.metadata import collect_metadata
+
+GRAPH = {
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": ["NewsArticle", "Thing"], "headline": "Graph title", "articleSection": ["Science", ""],
+         "author": [{"@type": "Person", "name": "Jane Doe"}, {"@type": "Organization", "name": "Newsroom"}, "John Smith"]},
+        {"@type": "WebSite", "name": "Example News"},
+        [{"@type": "Person", "name": "Ann Other"}],
+    ],
+}
+
+
+def test_extract_json_ld(monkeypatch):
+    metadata = extract_json_ld([json.dumps(GRAPH)])
+    assert metadata.title == "Graph title" and metadata.categories == ["Science"]
+    assert metadata.author == "Jane Doe; John Smith; Ann Other"
+    assert metadata.sitename == "Example News" and metadata.pagetype == "newsarticle"
+    # same results with the standard library parser
+    monkeypatch.setattr(json_metadata, "JSON_LOADS", json.loads)
+    assert extract_json_ld([json.dumps(GRAPH)]).author == metadata.author
+    # malformed scripts are examined with regular expressions, oversized ones are skipped
+    malformed = '{"@context":"https://schema.org","@type":"Article","headline": "Broken title", "author":{"name":"Jane Doe"},}'
+    metadata = extract_json_ld([malformed, " " * MAX_JSON_SIZE + json.dumps(GRAPH)])
+    assert metadata.title == "Broken title" and metadata.author == "Jane Doe" and not metadata.categories
+    assert extract_json_ld(["[1, 2]", '{"@context": "http://example.org", "headline": "x"}', "null"]).title is None
+
+
+def test_json_ld_metadata():
+    page = f"""<html><head><title>Page</title><script type="application/ld+json">{json.dumps(GRAPH)}</script></head>
+    <body><h1>Heading</h1><script>var x = 1;</script></body></html>"""
+    document = extract_metadata(fromstring(page))
+    assert document.title == "Graph title" and document.author == "Jane Doe; John Smith; Ann Other"
+    assert document.categories == ["Science"] and document.pagetype == "newsarticle"
+    assert document.sitename == "Example News"
+    # the scripts are not gathered if not needed
+    assert not collect_metadata(fromstring(page), ["url"]).json_ld
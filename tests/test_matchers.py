@@ -0,0 +1,128 @@
+import random
+import re
+
+from copy import deepcopy
+
+from lxml.html import fromstring, tostring
+
+from trafilatura import load_html
+from trafilatura.htmlprocessing import prune_unwanted_nodes
+from trafilatura.matchers import AhoCorasick, AutomatonMatcher, RuleMatcher
+from trafilatura.xpaths import (
+    BODY_XPATH,
+    COMMENTS_DISCARD_XPATH,
+    DISCARD_IMAGE_ELEMENTS,
+    OVERALL_DISCARD_XPATH,
+    PRECISION_DISCARD_XPATH,
+    TEASER_DISCARD_XPATH,
+)
+
+RULE_LISTS = [
+    BODY_XPATH,
+    OVERALL_DISCARD_XPATH,
+    TEASER_DISCARD_XPATH,
+    PRECISION_DISCARD_XPATH,
+    DISCARD_IMAGE_ELEMENTS,
+    COMMENTS_DISCARD_XPATH,
+]
+
+TAGS = ["article", "div", "main", "section", "span", "p", "list", "item", "cite", "quote", "header", "a"]
+ATTRIBUTES = ["id", "class", "role", "style", "itemprop", "aria-hidden", "data-component", "data-lp-replacement-content"]
+
+
+def random_tree(rng, needles, size=300):
+    "Random tree whose attribute values are built from the strings searched for by the rules."
+    root = fromstring("<html><body></body></html>")
+    elements = [root.find("body")]
+    for _ in range(size):
+        elem = rng.choice(elements).makeelement(rng.choice(TAGS), {})
+        attributes = rng.sample(ATTRIBUTES, rng.randint(0, 3))
+        for attribute in attributes:
+            parts = [rng.choice(needles) for _ in range(rng.randint(1, 3))]
+            value = rng.choice(["", " ", "-", "_"]).join(parts)
+            if rng.random() < 0.3:
+                value = value.upper() if rng.random() < 0.5 else value.title()
+            if rng.random() < 0.3:
+                value = value[rng.randint(0, len(value)):] + " " + value[: rng.randint(0, len(value))]
+            elem.set(attribute, value)
+        rng.choice(elements).append(elem)
+        elements.append(elem)
+    return root
+
+
+def rule_needles():
+    needles = set()
+    for rules in RULE_LISTS:
+        for expression in rules:
+            needles.update(re.findall(r"""["']([^"']*)["']""", expression.path))
+    return sorted(n for n in needles if n.strip()) + ["x", "Main", "content"]
+
+
+MATCHERS = [(rules, RuleMatcher(rules), AutomatonMatcher(rules)) for rules in RULE_LISTS]
+
+
+def check_parity(tree):
+    for rules, *matchers in MATCHERS:
+        for matcher in matchers:
+            results = matcher.scan(tree)
+            for rule, expression, matched in zip(matcher.rules, rules, results):
+                expected = expression(tree)
+                if rule.first:
+                    assert matched[:1] == expected[:1], expression.path
+                else:
+                    assert matched == expected, expression.path
+
+
+def test_aho_corasick():
+    patterns = ["he", "she", "his", "hers", "nav", "navbar", "avigation"]
+    automaton = AhoCorasick(patterns)
+    text = "ushers navbar-navigation"
+    expected = sorted(
+        (index, start + len(pattern) - 1)
+        for index, pattern in enumerate(patterns)
+        for start in range(len(text))
+        if text.startswith(pattern, start)
+    )
+    assert sorted(automaton.search(text)) == expected
+
+
+def test_parity_random():
+    rng = random.Random(1)
+    needles = rule_needles()
+    for _ in range(30):
+        check_parity(random_tree(rng, needles))
+
+
+def test_parity_documents(html_content):
+    check_parity(load_html(html_content))
+    check_parity(fromstring(
+        '<html><body><div class="Post-content" id="main"><div id="x" class="post-body">'
+        '<section role="main"></section><main></main></div></div>'
+        '<div class="notloaded" aria-hidden="true" style="display: none"><p class="teaser">t</p></div>'
+        '<div data-lp-replacement-content=""><span id="shareBox" class="other">s</span></div></body></html>'
+    ))
+
+
+def test_first_valid():
+    tree = fromstring('<html><body><div class="post-body"><article></article></div><article></article></body></html>')
+    matcher = RuleMatcher(BODY_XPATH)
+    candidates = matcher.scan(tree)
+    first = matcher.first_valid(1, candidates[1], tree)
+    assert first is tree.find(".//article")
+    # detached or modified elements are skipped
+    first.getparent().remove(first)
+    assert matcher.first_valid(1, candidates[1], tree) is tree.findall(".//article")[0]
+    tree.find(".//div").attrib.clear()
+    assert matcher.first_valid(0, candidates[0], tree) is None
+
+
+def test_prune_backend(html_content):
+    rng = random.Random(2)
+    needles = rule_needles()
+    trees = [random_tree(rng, needles) for _ in range(10)] + [load_html(html_content)]
+    for tree in trees:
+        for rules in (OVERALL_DISCARD_XPATH, COMMENTS_DISCARD_XPATH):
+            for with_backup in (False, True):
+                reference = prune_unwanted_nodes(deepcopy(tree), rules, with_backup)
+                result = prune_unwanted_nodes(deepcopy(tree), AutomatonMatcher(rules), with_backup)
+                assert tostring(result) == tostring(reference)
@@ -0,0 +1,48 @@
+from lxml.html import fromstring
+
+from trafilatura import _internal_extraction, extract_metadata, load_html
+from trafilatura.metadata import LINK_PATTERNS, MATCHER, RULE_GROUPS, collect_metadata
+from trafilatura.settings import Extractor
+from trafilatura.xpaths import AUTHOR_DISCARD_XPATHS, AUTHOR_XPATHS, CATEGORIES_XPATHS, TAGS_XPATHS, TITLE_XPATHS
+
+PAGE = """<html><head><title>Blog post title | My blog</title><meta name="keywords" content="a, b"/></head><body>
+<header class="entry-header"><h1 class="entry-title">Blog post title</h1>
+<div class="post-meta"><span class="author">By Jane Doe and John Smith</span> in
+<a href="/category/science/">Science</a> <time>today</time></div></header>
+<article><p>Text</p><div class="comments"><span class="author">A commenter</span></div></article>
+<div class="tags"><a href="/tag/physics/">Physics</a> <a href="/tags/lasers">Lasers</a> <a href="/about">About</a></div>
+</body></html>"""
+
+
+def test_rules(html_content):
+    # the rewritten rules select the same elements as the original expressions
+    for tree in (fromstring(PAGE), load_html(html_content)):
+        matches = [MATCHER.matching(elem) for elem in tree.iter("*")]
+        for index, expression in enumerate(AUTHOR_DISCARD_XPATHS + TITLE_XPATHS + AUTHOR_XPATHS):
+            assert [elem for elem, found in zip(tree.iter("*"), matches) if index in found] == expression(tree)
+    tree = fromstring(PAGE)
+    assert [group for group, _ in RULE_GROUPS] == ["discard", "title", "author", "categories", "tags"]
+    candidates = collect_metadata(tree)
+    for field, links, expressions in (("categories", candidates.category_links, CATEGORIES_XPATHS), ("tags", candidates.tag_links, TAGS_XPATHS)):
+        for results, expression in zip(links, expressions):
+            # only the links to categories, respectively tags, are kept
+            assert results == [a.text_content() for a in expression(tree) if LINK_PATTERNS[field].search(a.get("href"))]
+
+
+def test_extract_metadata(html_content):
+    document = extract_metadata(fromstring(PAGE))
+    assert document.title == "Blog post title" and document.sitename == "My blog"
+    assert document.author == "Jane Doe; John Smith"
+    assert document.categories == ["Science"] and document.tags == ["a", "b"]
+    # only the fields asked for are filled
+    document = extract_metadata(fromstring(PAGE), ["title"])
+    assert document.title == "Blog post title" and document.author is None and document.tags is None
+    document = extract_metadata(load_html(html_content))
+    assert document.title == "Quantum neural network" and document.sitename == "Wikipedia"
+    assert document.url == "https://en.wikipedia.org/wiki/Quantum_neural_network"
+    assert document.hostname == "en.wikipedia.org" and document.license == "CC BY-SA 4.0"
+    assert document.pagetype == "website" and document.image.startswith("https://upload.wikimedia.org/")
+    # the metadata is gathered before the cleaning
+    extracted = _internal_extraction(html_content, options=Extractor(with_metadata=True))
+    assert extracted.title == document.title and extracted.license == document.license
+    assert extracted.text.startswith("---\ntitle: Quantum neural network\n")
@@ -0,0 +1,29 @@
+import asyncio
+
+from trafilatura import aextract, aextract_many, extract_many
+from trafilatura.main import extract_html_into_markdown
+
+
+def test_extract_many(html_content, expected_md):
+    inputs = [html_content, "plain text", html_content]
+    for workers in (1, 2):
+        results = list(extract_many(inputs, max_workers=workers, chunksize=1))
+        assert [i for i, _ in results] == [0, 1, 2]
+        assert results[0][1] == expected_md == results[2][1]
+        assert results[1][1] is None
+    unordered = dict(extract_many(inputs, ordered=False, max_workers=2, chunksize=1))
+    assert unordered[2] == extract_html_into_markdown(html_content)
+
+
+def test_aextract(html_content, expected_md):
+    async def collect(ordered):
+        return [
+            result
+            async for result in aextract_many(
+                [html_content, "plain text"], concurrency=1, ordered=ordered
+            )
+        ]
+
+    assert asyncio.run(aextract(html_content)) == expected_md
+    assert asyncio.run(collect(True)) == [(0, expected_md), (1, None)]
+    assert sorted(asyncio.run(collect(False))) == [(0, expected_md), (1, None)]
@@ -0,0 +1,29 @@
+import pickle
+
+from copy import deepcopy
+
+from trafilatura.settings import DEFAULT_CONFIG, Extractor, compile_plan
+
+
+def test_plan():
+    options = Extractor(output_format="markdown", images=True)
+    plan = options.plan
+    assert plan is Extractor(output_format="markdown", images=True).plan
+    assert "graphic" in plan.potential_tags and "img" not in plan.stripping and "figure" not in plan.cleaning
+    assert plan.link_selection is not None and plan.body_stripped == ("ref", "span")
+    # the options can still be changed afterwards
+    options.links = True
+    assert options.plan is not plan and options.plan.link_selection is None
+    assert hash(options.frozen()) == hash(deepcopy(options).frozen())
+    # worker processes compile the plan again
+    copied = pickle.loads(pickle.dumps(plan))
+    assert copied is compile_plan(plan.options) and copied.potential_tags == plan.potential_tags
+
+
+def test_config_values():
+    config = deepcopy(DEFAULT_CONFIG)
+    assert Extractor(config=config).min_output_size == DEFAULT_CONFIG.getint("DEFAULT", "MIN_OUTPUT_SIZE")
+    # changes of the configuration are taken into account
+    config["DEFAULT"]["MIN_OUTPUT_SIZE"] = "1234"
+    assert Extractor(config=config).min_output_size == 1234
+    assert Extractor().min_output_size != 1234
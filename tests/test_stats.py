@@ -0,0 +1,28 @@
+import pickle
+
+from trafilatura import _internal_extraction, extract_many
+from trafilatura.stats import ExtractionStats, collect_stats
+
+
+def test_stats(html_content):
+    stats = ExtractionStats()
+    document = _internal_extraction(html_content, "markdown", stats=stats)
+    assert document is not None
+    with collect_stats() as context_stats:
+        _internal_extraction(html_content, "markdown")
+    for collected in (stats, context_stats):
+        summary = collected.as_dict()
+        assert summary["documents"] == 1
+        for stage in ("load_html", "tree_cleaning", "body_xpath", "delete_by_link_density", "sanitize", "total"):
+            assert summary["stages"][stage]["count"] >= 1
+        # the body search is measured once per document, whatever the number of rules tried
+        assert summary["stages"]["body_xpath"]["count"] == 1
+        assert summary["counters"]["nodes_before_cleaning"] > summary["counters"]["nodes_after_cleaning"]
+        assert sum(v for k, v in summary["counters"].items() if k.startswith("body_xpath_")) == 1
+
+    # aggregation across workers
+    batch_stats = pickle.loads(pickle.dumps(stats))
+    list(extract_many([html_content] * 2, max_workers=2, chunksize=1, stats=batch_stats))
+    assert batch_stats.documents == 3
+    assert batch_stats.as_dict()["stages"]["total"]["count"] == 3
+    assert len(batch_stats.slowest) == 3
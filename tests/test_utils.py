@@ -0,0 +1,89 @@
+import random
+
+from html import unescape
+from unicodedata import normalize
+
+from lxml.html import tostring
+
+from trafilatura.utils import (
+    HTMLFeed,
+    load_html,
+    normalize_unicode,
+    remove_control_characters,
+    return_printables_and_spaces,
+    sanitize,
+    sanitize_text,
+    sniff_encoding,
+)
+
+PIECES = [
+    "a", "word ", " ", "\t", "\n", "\r\n", "\r", "\x0b", "\x0c", "\x1c", "\x85", " ", " ",
+    "\x00", "\x07", "\x1b", "\x7f", "\x9f", "​", "﻿", "\U000e0001", "",
+    "&nbsp;", "&#13;", "&#10;", "&amp;", "&lt", "&#1", "3;", "&", "␤", "\n␤\n",
+    "é", "é", " ", "　", "漢字", "🙂",
+]
+
+
+def test_sanitize_text():
+    rng = random.Random(4)
+    for _ in range(3000):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 30)))
+        assert remove_control_characters(text) == "".join(map(return_printables_and_spaces, text))
+        assert sanitize_text(text) == unescape(sanitize(text, True) or "")
+        assert normalize_unicode(text) == normalize("NFC", text)
+
+
+def test_load_bytes():
+    html = "<html><head>{}</head><body><p>{}</p><p>x</p></body></html>"
+    for encoding, declaration, sniffed, text in [
+        ("utf-8", "", None, "Café naïve, 漢字 €"),
+        ("utf-8-sig", "", "utf-8-sig", "Café naïve, 漢字 €"),
+        ("utf-16", "", "utf-16", "Café naïve, 漢字 €"),
+        ("gb18030", '<meta charset="GB18030">', "gb18030", "Café naïve, 漢字 €"),
+        ("shift_jis", '<meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS">', "shift_jis", "漢字 テスト"),
+    ]:
+        data = html.format(declaration, text).encode(encoding)
+        assert sniff_encoding(data) == sniffed
+        assert load_html(data).find(".//p").text == text
+    # XML declaration, latin-1 handled as windows-1252
+    data = '<?xml version="1.0" encoding="ISO-8859-1"?><html><body><p>Caf\xe9 \x80</p><p>x</p></body></html>'.encode("latin-1")
+    assert sniff_encoding(data) == "cp1252"
+    assert load_html(data).find(".//p").text == "Café €"
+    # no declaration and not UTF-8
+    data = "<html><body><p>Café</p><p>x</p></body></html>".encode("cp1252")
+    assert sniff_encoding(data) is None
+    assert load_html(data).find(".//p").text == "Café"
+
+
+# faulty beginnings, fragment, BOM, other encodings, not UTF-8 without declaration
+DOCUMENTS = [
+    b'<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0//EN" "a/b">\n<html lang="en"/>\n<body><p>a</p><p>b</p></body></html>',
+    b"<div><p>fragment</p><p>x</p></div>",
+    b"text <b>x</b> <i>y</i>",
+    "\ufeff<html><body><p>Café</p><p>x</p></body></html>".encode("utf-8"),
+    '<html><head><meta charset="gb18030"></head><body><p>漢字</p><p>x</p></body></html>'.encode("gb18030"),
+    "<html><body><p>Café</p><p>x</p></body></html>".encode("cp1252"),
+    "<html><body><p>Café</p><p>x</p></body></html>".encode("utf-16"),
+]
+
+
+def test_load_file(tmp_path, html_content):
+    for num, data in enumerate([html_content.encode("utf-8")] + DOCUMENTS):
+        path = tmp_path / f"{num}.html"
+        path.write_bytes(data)
+        assert tostring(load_html(path)) == tostring(load_html(data))
+    path = tmp_path / "empty.html"
+    path.write_bytes(b"")
+    assert load_html(path) is None
+
+
+def test_feed(html_content):
+    for data in [html_content.encode("utf-8")] + DOCUMENTS:
+        for size in (3, 1000):
+            feed = HTMLFeed()
+            for pos in range(0, len(data), size):
+                feed.feed(data[pos : pos + size])
+            assert tostring(feed.close()) == tostring(load_html(data))
+    feed = HTMLFeed(max_size=100)
+    feed.feed(b"<html><body>" + b"x" * 200)
+    assert feed.too_large and feed.close() is None
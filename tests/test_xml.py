@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import random
+
+from copy import deepcopy
+from datetime import date
+
+from lxml.etree import Element, SubElement, fromstring
+from lxml.html import fromstring as html_fromstring
+
+from trafilatura import _internal_extraction, extract_path
+from trafilatura import xml
+from trafilatura.settings import Document, Extractor
+from trafilatura.utils import normalize_unicode
+from trafilatura.xml import (
+    CSV_FIELDS,
+    TEI_NAMESPACE,
+    TextSinkAdapter,
+    build_tei_output,
+    process_element,
+    render_element,
+    validate_tei,
+    write_txt,
+    xmltotxt,
+)
+
+TAGS = ["p", "head", "hi", "del", "code", "lb", "ref", "list", "item", "table", "row", "cell", "graphic", "quote", "div"]
+TEXTS = [None, None, "", " ", "word", " two words ", "line\nbreak"]
+
+
+def random_document(rng, size=150):
+    "Random tree made of the elements handled by the renderer."
+    root = Element("body")
+    elements = [root]
+    for _ in range(size):
+        elem = SubElement(rng.choice(elements), rng.choice(TAGS))
+        elem.text, elem.tail = rng.choice(TEXTS), rng.choice(TEXTS)
+        if elem.tag in ("head", "hi"):
+            elem.set("rend", rng.choice(["h1", "h3", "#b", "#i", "xx"]))
+        elif elem.tag == "ref" and rng.random() < 0.7:
+            elem.set("target", "https://example.org")
+        elif elem.tag == "cell" and rng.random() < 0.3:
+            elem.set("role", "head")
+        elif elem.tag == "row" and rng.random() < 0.3:
+            elem.set("span", rng.choice(["2", "5", "x"]))
+        elif elem.tag == "graphic":
+            elem.set("src", "image.png")
+        elements.append(elem)
+    return root
+
+
+def check_rendering(tree):
+    for include_formatting in (True, False):
+        expected, result = [], []
+        process_element(deepcopy(tree), expected, include_formatting)
+        render_element(deepcopy(tree), result, include_formatting)
+        assert "".join(result) == "".join(expected)
+
+
+def test_render_random():
+    rng = random.Random(3)
+    for _ in range(200):
+        check_rendering(random_document(rng))
+
+
+def test_render_document(html_content):
+    document = _internal_extraction(html_content, "markdown", include_formatting=True, include_links=True, include_images=True)
+    check_rendering(document.body)
+
+
+def test_text_writer(monkeypatch):
+    # clean the text after each block
+    monkeypatch.setattr(xml, "FLUSH_FRAGMENTS", 1)
+    rng = random.Random(4)
+    texts = TEXTS + ["\n\n", "a\r\n b", "&amp;", "&am", "p;", "e", "\u0301", "\u2424", "\u2028", "\u3000"]
+    for _ in range(100):
+        document = Document()
+        document.body, document.commentsbody = random_document(rng), random_document(rng, 20)
+        for elem in document.body.iter():
+            elem.text = rng.choice(texts)
+        body, comments = document.body, document.commentsbody
+        for include_formatting in (True, False):
+            output = io.StringIO()
+            document.body, document.commentsbody = deepcopy(body), deepcopy(comments)
+            write_txt(document, output, include_formatting)
+            expected = xmltotxt(deepcopy(body), include_formatting) + "\n" + xmltotxt(deepcopy(comments), include_formatting)
+            assert output.getvalue() == normalize_unicode(expected.strip())
+
+
+def test_text_sink_adapter():
+    sink = io.StringIO()
+    adapter = TextSinkAdapter(sink)
+    data = "é€😀".encode("utf-8")
+    for pos in range(len(data)):
+        adapter.write(data[pos : pos + 1])
+    adapter.finish()
+    assert sink.getvalue() == "é€😀"
+
+
+def test_output_formats(tmp_path, html_content):
+    options = {fmt: Extractor(output_format=fmt, with_metadata=True) for fmt in ("csv", "json", "html", "xml", "xmltei")}
+    expected = _internal_extraction(html_content, options=Extractor(with_metadata=True))
+    outputs = {fmt: _internal_extraction(html_content, options=opts).text for fmt, opts in options.items()}
+
+    row = next(csv.reader(io.StringIO(outputs["csv"]), delimiter="\t"))
+    assert len(row) == len(CSV_FIELDS) and row[2] == expected.fingerprint
+    data = json.loads(outputs["json"])
+    assert data["fingerprint"] == expected.fingerprint and data["text"].startswith("Quantum neural network\n")
+    html = html_fromstring(outputs["html"])
+    assert html.find("head/meta[@name='fingerprint']").get("content") == expected.fingerprint
+    assert html.find("head/meta[@name='title']").get("content") == expected.title == "Quantum neural network"
+    assert html.find("body/h1").text == "Quantum neural network"
+    xml = fromstring(outputs["xml"].encode("utf-8"))
+    assert xml.get("fingerprint") == expected.fingerprint and xml.find("main/head").get("rend") == "h1"
+    tei = fromstring(outputs["xmltei"].encode("utf-8"))
+    assert tei.find(f".//{{{TEI_NAMESPACE}}}div[@type='entry']/{{{TEI_NAMESPACE}}}ab[@type='header']") is not None
+    assert tei.find(f".//{{{TEI_NAMESPACE}}}creation/{{{TEI_NAMESPACE}}}date").text == date.today().isoformat()
+    # the output is converted to valid TEI, the DTD is shipped with the package
+    body = Element("body")
+    body.text = "Loose text"
+    SubElement(body, "code").text = "Code"
+    SubElement(body, "graphic", src="image.png", alt="Image")
+    tei = build_tei_output(Document(title="Title", body=body))
+    assert validate_tei(tei) is True
+    assert tei.find("text/body/div/p").text == "Loose text" and tei.find("text/body/div/ab").get("type") == "code"
+    assert tei.find("text/body/div/p/graphic").attrib == {"url": "image.png"}
+    tei_options = Extractor(output_format="xmltei", formatting=True, links=True, images=True, with_metadata=True)
+    document = _internal_extraction(html_content, options=tei_options, render=False)
+    assert validate_tei(build_tei_output(document)) is True
+    # files are written directly
+    path = tmp_path / "page.html"
+    path.write_text(html_content, encoding="utf-8")
+    for fmt, opts in options.items():
+        destination = tmp_path / f"output.{fmt}"
+        assert extract_path(path, destination, options=opts) is True
+        assert destination.read_text(encoding="utf-8") == outputs[fmt]
@@ -12,8 +12,13 @@ __version__ = "2.0.0"
 
 import logging
 
-from .core import _internal_extraction
-
+from .boilerplate import BoilerplateLearner
+from .cache import ResultCache
+from .core import FeedExtractor, _internal_extraction, extract_file, extract_path
+from .deadline import ExtractionTimeout
+from .metadata import extract_metadata
+from .parallel import aextract, aextract_many, extract_many
+from .stats import ExtractionStats, collect_stats
 
 from .utils import load_html
 
@@ -22,8 +27,20 @@ logging.getLogger(__name__).addHandler(logging.NullHandler())
 __all__ = [
     "bare_extraction",
     "_internal_extraction",
+    "aextract",
+    "aextract_many",
+    "collect_stats",
+    "extract_file",
+    "extract_many",
+    "extract_metadata",
+    "extract_path",
+    "ExtractionStats",
+    "ExtractionTimeout",
+    "FeedExtractor",
     "baseline",
+    "BoilerplateLearner",
     "fetch_response",
     "fetch_url",
     "load_html",
+    "ResultCache",
 ]
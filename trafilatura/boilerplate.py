@@ -0,0 +1,130 @@
+"""
+Site-level learning of boilerplate: blocks which recur on many pages
+of the same host are removed before the rule-based pruning.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from lxml.etree import _Element, iterwalk
+
+from .settings import LRU_SIZE
+
+# elements considered as blocks, after the conversion of the tags
+BLOCK_TAGS = {"div", "list", "p", "quote", "section", "table"}
+
+# number of pages on which a block has to be seen before it is removed
+MIN_PAGES = 3
+# number of hosts kept in memory
+MAX_HOSTS = 256
+
+
+def block_signatures(tree: _Element) -> Dict[_Element, int]:
+    """Compute a signature of each block bottom-up, based on the tags and the
+    stripped texts of its subtree, ignoring attributes which often vary
+    between pages. Blocks without text are left out."""
+    # element -> (signature, text length)
+    signatures: Dict[_Element, Tuple[int, int]] = {}
+    for _, elem in iterwalk(tree, events=("end",), tag="*"):
+        text = elem.text.strip() if elem.text else None
+        length = len(text) if text else 0
+        parts: List[object] = [elem.tag, text]
+        for child in elem:
+            tail = child.tail.strip() if child.tail else None
+            if tail:
+                length += len(tail)
+            if isinstance(child.tag, str):
+                signature, sublength = signatures[child]
+                parts.append(signature)
+                length += sublength
+            parts.append(tail)
+        # the built-in hash is enough since the counts are kept by the process
+        signatures[elem] = (hash(tuple(parts)), length)
+    return {
+        elem: signature
+        for elem, (signature, length) in signatures.items()
+        if length and elem.tag in BLOCK_TAGS
+    }
+
+
+class BoilerplateLearner:
+    """Learn which blocks recur on the pages of each host and remove them.
+    Memory is bounded by the number of blocks kept per host and the number of hosts,
+    the least recently seen ones are discarded first. Thread-safe."""
+
+    __slots__ = ["hosts", "lock", "max_blocks", "max_hosts", "min_pages"]
+
+    def __init__(
+        self,
+        min_pages: int = MIN_PAGES,
+        max_blocks: int = LRU_SIZE,
+        max_hosts: int = MAX_HOSTS,
+    ) -> None:
+        self.min_pages = min_pages
+        self.max_blocks = max_blocks
+        self.max_hosts = max_hosts
+        # host -> block signature -> number of pages
+        self.hosts: "OrderedDict[str, OrderedDict[int, int]]" = OrderedDict()
+        self.lock = Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the signatures are only valid in the current process,
+        # worker processes start learning from scratch
+        return {slot: getattr(self, slot) for slot in ("max_blocks", "max_hosts", "min_pages")}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
+        self.hosts = OrderedDict()
+        self.lock = Lock()
+
+    def _host(self, hostname: str) -> "OrderedDict[int, int]":
+        "Get the blocks of a host, evict the least recently seen host if necessary."
+        host = self.hosts.get(hostname)
+        if host is None:
+            host = self.hosts[hostname] = OrderedDict()
+            if len(self.hosts) > self.max_hosts:
+                self.hosts.popitem(last=False)
+        else:
+            self.hosts.move_to_end(hostname)
+        return host
+
+    def process(self, tree: _Element, url: Optional[str]) -> List[_Element]:
+        """Record the blocks of a page and return the outermost ones which have
+        already been seen on enough other pages of the host."""
+        hostname = urlsplit(url).hostname if url else None
+        if not hostname:
+            return []
+        signatures = block_signatures(tree)
+        seen: Set[int] = set(signatures.values())
+        with self.lock:
+            counts = self._host(hostname)
+            known = {
+                signature
+                for signature in seen
+                if counts.get(signature, 0) >= self.min_pages
+            }
+            # count each block once per page
+            for signature in seen:
+                counts[signature] = counts.get(signature, 0) + 1
+                counts.move_to_end(signature)
+            while len(counts) > self.max_blocks:
+                counts.popitem(last=False)
+        if not known:
+            return []
+        # top-down, without the blocks contained in a removed one
+        boilerplate, stack = [], [tree]
+        while stack:
+            elem = stack.pop()
+            if signatures.get(elem) in known and elem is not tree:
+                boilerplate.append(elem)
+            else:
+                stack.extend(reversed(elem))
+        return boilerplate
+
+    def clear(self) -> None:
+        "Forget all hosts."
+        with self.lock:
+            self.hosts.clear()
@@ -0,0 +1,230 @@
+"""
+Content-addressed cache of extraction results: the rendered text is stored
+under a hash of the input and of the extraction options, in memory and
+optionally in a SQLite database shared by several processes or runs.
+"""
+
+import json
+import logging
+import sqlite3
+
+from collections import OrderedDict
+from hashlib import blake2b
+from mmap import ACCESS_READ, mmap
+from os import PathLike
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional, Union
+
+from .settings import CONFIG_MAPPING, LRU_SIZE, Extractor
+from .xml import PKG_VERSION
+
+
+LOGGER = logging.getLogger(__name__)
+
+# default maximum size of the database, text length in bytes
+MAX_DISK_SIZE = 2**30
+
+
+def hash_input(filecontent: Any) -> Optional[str]:
+    """Hash the input of a document, None if the input type cannot be cached.
+    Strings are not decoded like bytes and files, the kind of input is part of the hash."""
+    digest = blake2b(digest_size=16)
+    if isinstance(filecontent, bytes):
+        digest.update(b"b")
+        digest.update(filecontent)
+    elif isinstance(filecontent, str):
+        digest.update(b"s")
+        digest.update(filecontent.encode("utf-8", "surrogatepass"))
+    elif isinstance(filecontent, PathLike):
+        # files are decoded like bytes
+        digest.update(b"b")
+        with open(filecontent, "rb") as filehandle:
+            if filehandle.seek(0, 2):
+                with mmap(filehandle.fileno(), 0, access=ACCESS_READ) as data:
+                    digest.update(data)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def options_key(options: Extractor) -> str:
+    """Fingerprint of the options which change the output: the extraction plan,
+    the size thresholds, the filters and the metadata, the URL only if metadata is written."""
+    values = {
+        "plan": list(options.frozen()),
+        "thresholds": {key: getattr(options, key) for key in (*CONFIG_MAPPING, "max_tree_size")},
+        "filters": [options.comments, options.lang, options.only_with_metadata],
+        "with_metadata": options.with_metadata,
+        "url": options.url if options.with_metadata else None,
+    }
+    return blake2b(
+        json.dumps(values, sort_keys=True).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class _DiskTier:
+    """SQLite storage of the results with eviction of the least recently used ones,
+    the total size is tracked by the process and recomputed when the database is opened."""
+    __slots__ = ["connection", "max_size", "size"]
+
+    def __init__(self, path: Union[str, "PathLike[str]"], max_size: int, version: str) -> None:
+        self.max_size = max_size
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, text TEXT, size INTEGER, accessed REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS info (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            row = self.connection.execute(
+                "SELECT value FROM info WHERE name = 'version'"
+            ).fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                LOGGER.info("cache version changed: %s -> %s", row[0], version)
+            self.reset(version)
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def reset(self, version: str) -> None:
+        "Remove all entries and store the version."
+        with self.connection:
+            self.connection.execute("DELETE FROM results")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO info VALUES ('version', ?)", (version,)
+            )
+        self.size = 0
+
+    def get(self, key: str) -> Optional[str]:
+        "Return the stored text and mark it as used."
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT text FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE results SET accessed = ? WHERE key = ?", (time(), key)
+                )
+        return row[0] if row is not None else None
+
+    def put(self, key: str, text: str) -> int:
+        "Store a text and evict old entries, return the number of evictions."
+        size = len(text.encode("utf-8"))
+        evicted = 0
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, text, size, time()),
+            )
+            self.size += size - (row[0] if row is not None else 0)
+            while self.size > self.max_size:
+                oldest = self.connection.execute(
+                    "SELECT key, size FROM results WHERE key != ? ORDER BY accessed LIMIT 64",
+                    (key,),
+                ).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self.size <= self.max_size:
+                        break
+                    self.connection.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    self.size -= old_size
+                    evicted += 1
+        return evicted
+
+    def close(self) -> None:
+        "Close the database."
+        self.connection.close()
+
+
+class ResultCache:
+    """Cache of rendered texts keyed by the input and the options, with an in-memory
+    LRU tier and an optional SQLite tier. Entries are invalidated when the version
+    changes, by default the version of the package. Thread-safe."""
+
+    __slots__ = ["disk", "lock", "max_entries", "memory", "stats", "version"]
+
+    def __init__(
+        self,
+        max_entries: int = LRU_SIZE,
+        path: Optional[Union[str, "PathLike[str]"]] = None,
+        max_disk_size: int = MAX_DISK_SIZE,
+        version: str = PKG_VERSION,
+    ) -> None:
+        self.max_entries = max_entries
+        self.version = version
+        self.memory: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = Lock()
+        self.disk = _DiskTier(path, max_disk_size, version) if path is not None else None
+        self.stats: Dict[str, int] = dict.fromkeys(
+            ("hits", "memory_hits", "disk_hits", "misses", "stores", "evictions"), 0
+        )
+
+    def key(self, filecontent: Any, options: Extractor) -> Optional[str]:
+        """Key of a document, None if it should not be cached: parsed trees,
+        deduplication and learned boilerplate, which depend on the documents seen before."""
+        if options.dedup or options.learner is not None:
+            return None
+        input_hash = hash_input(filecontent)
+        if input_hash is None:
+            return None
+        return f"{input_hash}-{options_key(options)}"
+
+    def get(self, key: str) -> Optional[str]:
+        "Return the text stored under the key, if any."
+        with self.lock:
+            text = self.memory.get(key)
+            if text is not None:
+                self.memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return text
+            if self.disk is not None:
+                text = self.disk.get(key)
+                if text is not None:
+                    self._remember(key, text)
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return text
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        "Store a text in all tiers."
+        with self.lock:
+            self._remember(key, text)
+            if self.disk is not None:
+                self.stats["evictions"] += self.disk.put(key, text)
+            self.stats["stores"] += 1
+
+    def _remember(self, key: str, text: str) -> None:
+        "Store a text in memory and evict the least recently used one if necessary."
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, version: Optional[str] = None) -> None:
+        "Remove all entries, for example after a change of version or of the extraction rules."
+        with self.lock:
+            self.memory.clear()
+            if version is not None:
+                self.version = version
+            if self.disk is not None:
+                self.disk.reset(self.version)
+
+    def close(self) -> None:
+        "Close the database if there is one."
+        if self.disk is not None:
+            self.disk.close()
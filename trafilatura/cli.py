@@ -0,0 +1,108 @@
+# pylint:disable-msg=E0611
+"""
+Implementing a basic command-line interface.
+"""
+
+import argparse
+import logging
+import sys
+
+from typing import Any, List, Optional
+
+from . import __version__
+from .cli_utils import process_records, read_inputs
+from .settings import PARALLEL_CORES, SUPPORTED_FMT_CLI, args_to_extractor
+
+
+def add_args(parser: Any) -> Any:
+    "Add argument groups and arguments to parser."
+    group1 = parser.add_argument_group("Input", "URLs, files or directories to process")
+    group2 = parser.add_argument_group("Output", "Determines if and how files will be written")
+    group3 = parser.add_argument_group("Format", "Selection of the output format")
+    group4 = parser.add_argument_group("Extraction", "Customization of text and metadata processing")
+
+    parser.add_argument(
+        "-v", "--verbose", help="increase logging verbosity (-v or -vv)", action="count", default=0
+    )
+    parser.add_argument("--version", help="show version information and exit", action="version",
+                        version=f"Trafilatura {__version__} - Python {sys.version.split()[0]}")
+
+    group1.add_argument(
+        "inputs", nargs="*",
+        help="HTML files, directories or JSONL files with id, url and html fields (default: stdin)",
+    )
+    group1.add_argument(
+        "--parallel", help="specify a number of cores/threads for parallel processing",
+        type=int, default=PARALLEL_CORES,
+    )
+
+    group2.add_argument("-o", "--output-dir", help="write results in a specified directory (relative path)")
+    group2.add_argument("--jsonl", help="write JSON lines with id, url and text to the standard output",
+                        action="store_true")
+
+    group3.add_argument(
+        "-out", "--output-format", help="determine output format",
+        choices=SUPPORTED_FMT_CLI, default="txt",
+    )
+    group3.add_argument("--markdown", help="shorthand for Markdown output", action="store_true")
+    group3.add_argument("--formatting", help="include text formatting (bold, italic, etc.)", action="store_true")
+    group3.add_argument("--links", help="include links along with their targets (experimental)", action="store_true")
+    group3.add_argument("--images", help="include image sources in output (experimental)", action="store_true")
+    group3.add_argument("--no-comments", help="don't output any comments", action="store_false")
+    group3.add_argument("--no-tables", help="don't output any table elements", action="store_false")
+    group3.add_argument("--with-metadata", help="extract and add metadata to the output", action="store_true")
+    group3.add_argument("--only-with-metadata", help="only output those documents with title, URL and date",
+                        action="store_true")
+    group3.add_argument("--target-language", help="select a target language (ISO 639-1 codes)", type=str)
+    group3.add_argument("--validate-tei", help="validate XML TEI output", action="store_true")
+
+    group4.add_argument("--deduplicate", help="filter out duplicate documents and sections", action="store_true")
+    group4.add_argument("--config-file", help="override standard extraction parameters with a custom config file")
+    group4.add_argument("--precision", help="favor extraction precision (less noise, possibly less text)",
+                        action="store_true")
+    group4.add_argument("--recall", help="favor extraction recall (more text, possibly more noise)",
+                        action="store_true")
+    group4.add_argument("--fast", help="fast extraction without fallbacks", action="store_true")
+
+    return parser
+
+
+def parse_args(args: Optional[List[str]]) -> Any:
+    "Define parser for command-line arguments."
+    parser = argparse.ArgumentParser(
+        description="Command-line interface for Trafilatura",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser = add_args(parser)
+    return map_args(parser.parse_args(args))
+
+
+def map_args(args: Any) -> Any:
+    "Map existing options to format choice."
+    if args.markdown:
+        args.output_format = "markdown"
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    "Run as a command-line utility."
+    args = parse_args(argv)
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.ERROR - 10 * min(args.verbose, 2),
+    )
+    # the configuration is read once for the whole corpus
+    options = args_to_extractor(args)
+    total, successes = process_records(
+        read_inputs(args.inputs),
+        options,
+        output_dir=args.output_dir,
+        jsonl=args.jsonl,
+        parallel=max(args.parallel, 1),
+    )
+    logging.getLogger(__name__).info("processed %s documents, %s with output", total, successes)
+    return 0 if successes or not total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
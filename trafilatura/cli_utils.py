@@ -0,0 +1,167 @@
+# pylint:disable-msg=E0611
+"""
+Functions dedicated to command-line processing: reading the input
+as a stream of records and writing the results.
+"""
+
+import json
+import logging
+import re
+import sys
+
+from collections import deque
+from copy import copy
+from os import makedirs, walk
+from pathlib import Path
+from typing import Any, Deque, Iterable, Iterator, Optional, TextIO, Tuple
+
+from .deduplication import NearDuplicateIndex, content_fingerprint
+from .parallel import extract_many
+from .settings import FILENAME_LEN, Extractor
+
+
+LOGGER = logging.getLogger(__name__)
+
+# id, url, content
+Record = Tuple[str, Optional[str], Any]
+
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+FORMAT_EXTENSIONS = {
+    "csv": ".csv",
+    "html": ".html",
+    "json": ".json",
+    "markdown": ".md",
+    "txt": ".txt",
+    "xml": ".xml",
+    "xmltei": ".xml",
+}
+
+CLEAN_FILENAME = re.compile(r"[^\w.-]+")
+
+
+def read_jsonl(stream: Iterable[str], origin: str = "stdin") -> Iterator[Record]:
+    "Read JSON records with id, url and html fields line by line."
+    for num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            html = record["html"]
+        except (KeyError, TypeError, ValueError):
+            LOGGER.warning("invalid JSON record: %s line %s", origin, num)
+            continue
+        yield str(record.get("id") or f"{origin}-{num}"), record.get("url"), html
+
+
+def read_path(path: Path, root: Optional[Path] = None) -> Iterator[Record]:
+    "Read a single HTML or JSONL file."
+    if path.suffix.lower() in JSONL_SUFFIXES:
+        with open(path, "r", encoding="utf-8", errors="replace") as stream:
+            yield from read_jsonl(stream, str(path))
+        return
+    # the workers read the file themselves through a memory map
+    name = path.relative_to(root) if root is not None else Path(path.name)
+    yield str(name.with_suffix("")), None, path
+
+
+def read_inputs(paths: Any, stdin: Optional[TextIO] = None) -> Iterator[Record]:
+    "Lazily generate records from files, directories or standard input."
+    if not paths:
+        stdin = stdin or sys.stdin
+        first = stdin.read(1)
+        while first and first.isspace():
+            first = stdin.read(1)
+        if first == "{":
+            yield from read_jsonl(_prepend(first, stdin))
+        elif first:
+            yield "stdin", None, first + stdin.read()
+        return
+    for name in paths:
+        path = Path(name)
+        if path.is_dir():
+            for dirpath, dirnames, filenames in walk(path):
+                # deterministic order without listing the whole tree
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    yield from read_path(Path(dirpath) / filename, path)
+        elif path.is_file():
+            yield from read_path(path)
+        else:
+            LOGGER.warning("not a file or directory: %s", path)
+
+
+def _prepend(first: str, stream: TextIO) -> Iterator[str]:
+    "Restore the character consumed while sniffing the input type."
+    lines = iter(stream)
+    yield first + next(lines, "")
+    yield from lines
+
+
+def process_records(
+    records: Iterator[Record],
+    options: Extractor,
+    output: Optional[TextIO] = None,
+    output_dir: Optional[str] = None,
+    jsonl: bool = False,
+    parallel: Optional[int] = None,
+) -> Tuple[int, int]:
+    """Extract the records in parallel and stream the results,
+    return the number of processed and successful documents.
+    Near duplicates of documents already written are skipped if deduplication is on."""
+    # only the records in flight are kept in memory
+    pending: Deque[Tuple[str, Optional[str]]] = deque()
+    output = output or sys.stdout
+
+    def contents() -> Iterator[Any]:
+        "Pass the content on with its URL and keep track of the metadata."
+        for record_id, url, content in records:
+            pending.append((record_id, url))
+            if url is None:
+                yield content
+                continue
+            record_options = copy(options)
+            record_options.url = url
+            record_options._set_source(url, None)
+            yield content, record_options
+
+    if output_dir:
+        makedirs(output_dir, exist_ok=True)
+    index = NearDuplicateIndex() if options.dedup else None
+
+    total, successes = 0, 0
+    for _, text in extract_many(contents(), options=options, max_workers=parallel):
+        record_id, url = pending.popleft()
+        total += 1
+        if text is None:
+            LOGGER.warning("no output for %s", record_id)
+            continue
+        if index is not None:
+            duplicate = index.add(content_fingerprint(text), record_id)
+            if duplicate is not None:
+                LOGGER.info("near duplicate of %s: %s", duplicate, record_id)
+                continue
+        successes += 1
+        if output_dir:
+            write_file(text, record_id, output_dir, options.format)
+        elif jsonl:
+            output.write(
+                json.dumps({"id": record_id, "url": url, "text": text}, ensure_ascii=False)
+                + "\n"
+            )
+        else:
+            output.write(text + "\n")
+    output.flush()
+    return total, successes
+
+
+def write_file(text: str, record_id: str, output_dir: str, output_format: str) -> None:
+    "Write the result to a file in the output directory, keeping subfolders."
+    parts = [CLEAN_FILENAME.sub("_", part) for part in Path(record_id).parts]
+    parts = [part for part in parts if part.strip("._")] or ["0" * FILENAME_LEN]
+    destination = Path(output_dir, *parts[:-1]) / (
+        parts[-1] + FORMAT_EXTENSIONS.get(output_format, ".txt")
+    )
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with open(destination, "w", encoding="utf-8") as outputfile:
+        outputfile.write(text)
@@ -6,110 +6,227 @@ Extraction configuration and processing functions.
 import logging
 
 from copy import copy
-from typing import Any, Optional
+from io import StringIO
+from os import PathLike, stat
+from pathlib import Path
+from typing import Any, Optional, TextIO, Union
 
 
+from .cache import ResultCache
 from .htmlprocessing import (
     convert_tags,
+    prune_boilerplate,
+    prune_unwanted_nodes,
     tree_cleaning,
+    write_html_output,
 )
+from .deadline import ExtractionTimeout, time_budget
+from .deduplication import content_fingerprint
 from .main_extractor import extract_content
+from .metadata import METADATA_FIELDS, collect_metadata
 from .settings import Document, Extractor
+from .stats import ExtractionStats, current_stats, measure, track_document
 from .utils import (
+    LANGID_FLAG,
+    HTMLFeed,
+    check_html_lang,
+    is_acceptable_length,
+    is_acceptable_tree_size,
+    language_classifier,
     load_html,
-    normalize_unicode,
 )
-from .xml import xmltotxt
+from .xml import (
+    CSV_FIELDS,
+    META_ATTRIBUTES,
+    TEXT_HEADER_FIELDS,
+    write_csv,
+    write_json,
+    write_txt,
+    write_xml,
+    write_xmltei,
+)
+from .xpaths import REMOVE_COMMENTS_XPATH
 
 
 LOGGER = logging.getLogger(__name__)
 
 TXT_FORMATS = {"markdown", "txt"}
+SERIALIZED_FORMATS = {"csv", "html", "json", "xml", "xmltei"}
 
 
-def determine_returnstring(document: Document, options: Extractor) -> str:
-    # """Convert XML tree to chosen format, clean the result and output it as a string"""
-    # # XML (TEI) steps
-    # if "xml" in options.format:
-    #     # last cleaning
-    #     for element in document.body.iter("*"):
-    #         if (
-    #             element.tag != "graphic"
-    #             and len(element) == 0
-    #             and not element.text
-    #             and not element.tail
-    #         ):
-    #             parent = element.getparent()
-    #             # do not remove elements inside <code> to preserve formatting
-    #             if parent is not None and parent.tag != "code":
-    #                 parent.remove(element)
-    #     # build output tree
-    #     returnstring = control_xml_output(document, options)
-    # # CSV
-    # elif options.format == "csv":
-    #     returnstring = xmltocsv(document, options.formatting)
-    # # JSON
-    # elif options.format == "json":
-    #     returnstring = build_json_output(document, options.with_metadata)
-    # # HTML
-    # elif options.format == "html":
-    #     returnstring = build_html_output(document, options.with_metadata)
-    # # Markdown and TXT
-    # else:
-    if options.with_metadata:
-        header = "---\n"
-        for attr in (
-            "title",
-            "author",
-            "url",
-            "hostname",
-            "description",
-            "sitename",
-            "date",
-            "categories",
-            "tags",
-            "fingerprint",
-            "id",
-            "license",
-        ):
-            if getattr(document, attr):
-                header += f"{attr}: {str(getattr(document, attr))}\n"
-        header += "---\n"
+# metadata fields written by each output format, all of them otherwise
+OUTPUT_METADATA = {
+    "csv": CSV_FIELDS,
+    "html": META_ATTRIBUTES,
+    "markdown": TEXT_HEADER_FIELDS,
+    "txt": TEXT_HEADER_FIELDS,
+    "xml": META_ATTRIBUTES,
+}
+
+
+def write_output(document: Document, options: Extractor, sink: TextIO) -> None:
+    """Serialize the document in the chosen format and write it to a text sink.
+    The trees of the document may be modified, except for the TXT formats."""
+    if options.format == "csv":
+        write_csv(document, sink, options.formatting)
+    elif options.format == "json":
+        write_json(document, sink, options.with_metadata)
+    elif options.format == "html":
+        write_html_output(document, sink, options.with_metadata)
+    elif options.format == "xml":
+        write_xml(document, sink)
+    elif options.format == "xmltei":
+        write_xmltei(document, sink, options.tei_validation)
     else:
-        header = ""
-    returnstring = f"{header}{xmltotxt(document.body, options.formatting)}"
-    if document.commentsbody is not None:
-        returnstring = f"{returnstring}\n{xmltotxt(document.commentsbody, options.formatting)}".strip()
-    # normalize Unicode format (defaults to NFC)
-    return normalize_unicode(returnstring)
+        write_txt(document, sink, options.formatting, options.with_metadata, options.plan.minimal)
+
+
+def determine_returnstring(document: Document, options: Extractor) -> str:
+    "Convert the document to the chosen format and return it as a string."
+    output = StringIO()
+    # Markdown and TXT are the default
+    stage = "serialize" if options.format in SERIALIZED_FORMATS else "xmltotxt"
+    with measure(current_stats(), stage):
+        write_output(document, options, output)
+    return output.getvalue()
 
 
 def _internal_extraction(
     filecontent: Any,
-    output_format: str,
+    output_format: str = "txt",
     include_tables: bool = True,
     include_images: bool = False,
     include_formatting: bool = False,
     include_links: bool = False,
+    options: Optional[Extractor] = None,
+    stats: Optional[ExtractionStats] = None,
+    consume: bool = False,
+    cache: Optional[ResultCache] = None,
+    render: bool = True,
 ) -> Optional[Document]:
-    options = Extractor(
-        output_format=output_format,
-        formatting=include_formatting,
-        links=include_links,
-        images=include_images,
-        tables=include_tables,
-    )
+    """Extract the main text of a document, an Extractor can replace the individual options.
+    Timings and counters are recorded if a stats object is given or active in the context.
+    A parsed tree given as input is copied first unless consume is True, in which case
+    it is modified in place and should not be reused.
+    If a cache is given, a known input returns a document with the stored text only.
+    Without rendering, the text is left empty so that the document can be written with write_output().
+    Raises ExtractionTimeout if the time budget of the options is exceeded."""
+    if options is None:
+        options = Extractor(
+            output_format=output_format,
+            formatting=include_formatting,
+            links=include_links,
+            images=include_images,
+            tables=include_tables,
+        )
+    key = cache.key(filecontent, options) if cache is not None and render else None
+    if cache is not None and key is not None:
+        text = cache.get(key)
+        if text is not None:
+            return Document(text=text)
+    stats = stats or current_stats()
+    if stats is None:
+        document = _extract_document(filecontent, options, consume, render)
+    else:
+        with track_document(stats, options.source):
+            document = _extract_document(filecontent, options, consume, render)
+    if cache is not None and key is not None and document is not None:
+        cache.put(key, document.text)  # type: ignore[arg-type]
+    return document
 
+
+def _extract_document(
+    filecontent: Any, options: Extractor, consume: bool = False, render: bool = True
+) -> Optional[Document]:
+    "Run the extraction pipeline on a single document within its resource budgets."
+    stats = current_stats()
+    size = _input_size(filecontent)
+    if size is not None and not is_acceptable_length(size, options):
+        if stats is not None:
+            stats.count("rejected_size")
+        return None
+    try:
+        with time_budget(options.timeout):
+            return _run_pipeline(filecontent, options, consume, render)
+    except ExtractionTimeout:
+        LOGGER.warning("extraction timeout: %s", options.source)
+        if stats is not None:
+            stats.count("timeouts")
+        raise
+
+
+def _input_size(filecontent: Any) -> Optional[int]:
+    "Size of the input in characters or bytes, if known without parsing it."
+    if isinstance(filecontent, (bytes, str)):
+        return len(filecontent)
+    if isinstance(filecontent, PathLike):
+        return stat(filecontent).st_size
+    return None
+
+
+def _run_pipeline(
+    filecontent: Any, options: Extractor, consume: bool = False, render: bool = True
+) -> Optional[Document]:
+    "Parse, clean and extract the document, then render the result."
+    stats = current_stats()
     try:
-        tree = load_html(filecontent)
+        with measure(stats, "load_html"):
+            tree = load_html(filecontent)
         if tree is None:
             LOGGER.error("empty HTML tree: %s", tree)
             raise ValueError
+        if not is_acceptable_tree_size(tree, options.max_tree_size):
+            LOGGER.error("too many elements in tree: %s", options.source)
+            if stats is not None:
+                stats.count("rejected_tree_size")
+            raise ValueError
+        # quick check of the declared language, the text is checked later if possible
+        if options.lang and (options.fast or not LANGID_FLAG) and not check_html_lang(tree, options.lang):
+            LOGGER.error("wrong HTML meta language: %s", options.source)
+            if stats is not None:
+                stats.count("rejected_language")
+            raise ValueError
         document = Document()
+        if stats is not None:
+            size = _input_size(filecontent)
+            if size is not None:
+                stats.count("input_bytes", size)
+            stats.count("nodes_before_cleaning", int(tree.xpath("count(//*)")))
+
+        # the <head> and other parts are removed by the cleaning
+        fields = OUTPUT_METADATA.get(options.format, METADATA_FIELDS) if render else METADATA_FIELDS
+        if options.with_metadata:
+            with measure(stats, "metadata"):
+                metadata = collect_metadata(tree, fields)
+            # cut short if core elements are missing
+            if options.only_with_metadata and not (
+                metadata.date() and metadata.title() and metadata.url(options.url)
+            ):
+                LOGGER.error("no metadata: %s", options.source)
+                if stats is not None:
+                    stats.count("rejected_metadata")
+                raise ValueError
 
-        cleaned_tree = tree_cleaning(copy(tree), options)
-        cleaned_tree = convert_tags(cleaned_tree, options)
-        postbody = extract_content(cleaned_tree, options)
+        # trees parsed here belong to the extraction and can be modified in place
+        if tree is filecontent and not consume:
+            with measure(stats, "copy"):
+                tree = copy(tree)
+        with measure(stats, "tree_cleaning"):
+            cleaned_tree = tree_cleaning(tree, options)
+        with measure(stats, "convert_tags"):
+            cleaned_tree = convert_tags(cleaned_tree, options)
+        if not options.comments:
+            with measure(stats, "prune_comments"):
+                cleaned_tree = prune_unwanted_nodes(cleaned_tree, REMOVE_COMMENTS_XPATH)
+        if options.learner is not None:
+            with measure(stats, "prune_boilerplate"):
+                removed = prune_boilerplate(cleaned_tree, options)
+            if stats is not None:
+                stats.count("boilerplate_blocks", removed)
+        if stats is not None:
+            stats.count("nodes_after_cleaning", int(cleaned_tree.xpath("count(//*)")))
+        with measure(stats, "extract_content"):
+            postbody = extract_content(cleaned_tree, options)
 
     except (TypeError, ValueError):
         LOGGER.warning("discarding data: %s", options.source)
@@ -117,6 +234,123 @@ def _internal_extraction(
 
     # document.raw_text, document.commentsbody = temp_text, commentsbody
     document.body = postbody
+    if options.lang:
+        document.language = language_classifier(" ".join(postbody.itertext()))
+        if document.language is not None and document.language != options.lang:
+            LOGGER.warning("wrong language: %s %s", document.language, options.source)
+            if stats is not None:
+                stats.count("rejected_language")
+            return None
+    if options.with_metadata:
+        metadata.fill(document, fields, options.url)
+        document.fingerprint = content_fingerprint(" ".join(postbody.itertext()))
 
-    document.text = determine_returnstring(document, options)
+    if render:
+        document.text = determine_returnstring(document, options)
     return document
+
+
+def extract_file(
+    path: Union[str, "PathLike[str]"],
+    output: Optional[TextIO] = None,
+    output_format: str = "txt",
+    include_tables: bool = True,
+    include_images: bool = False,
+    include_formatting: bool = False,
+    include_links: bool = False,
+    options: Optional[Extractor] = None,
+    stats: Optional[ExtractionStats] = None,
+    cache: Optional[ResultCache] = None,
+) -> Optional[Document]:
+    """Extract the main text of an HTML file read through a memory map,
+    so that it is not loaded as a Python string first.
+    The text is streamed to the output if one is given, without building
+    the whole string, unless results are cached.
+    Raises ExtractionTimeout if the time budget of the options is exceeded."""
+    if options is None:
+        options = Extractor(
+            output_format=output_format,
+            formatting=include_formatting,
+            links=include_links,
+            images=include_images,
+            tables=include_tables,
+        )
+    render = output is None or cache is not None
+    document = _internal_extraction(
+        Path(path), options=options, stats=stats, cache=cache, render=render
+    )
+    if document is not None and output is not None:
+        if render:
+            output.write(document.text)  # type: ignore[arg-type]
+        else:
+            write_output(document, options, output)
+    return document
+
+
+def extract_path(
+    path: Union[str, "PathLike[str]"],
+    destination: Union[str, "PathLike[str]"],
+    output_format: str = "txt",
+    options: Optional[Extractor] = None,
+    stats: Optional[ExtractionStats] = None,
+) -> bool:
+    """Extract an HTML file and stream the result to the destination file,
+    which is only created if the extraction succeeds.
+    Raises ExtractionTimeout if the time budget of the options is exceeded."""
+    options = options or Extractor(output_format=output_format)
+    document = _internal_extraction(Path(path), options=options, stats=stats, render=False)
+    if document is None:
+        return False
+    with open(destination, "w", encoding="utf-8") as outputfile:
+        write_output(document, options, outputfile)
+    return True
+
+
+class FeedExtractor:
+    """Extract a document given in chunks of bytes, for example during a download:
+    the chunks are parsed as they come and the extraction runs on close().
+    Parsing stops once the maximum file size of the options is exceeded."""
+
+    __slots__ = ["options", "parser", "stats"]
+
+    def __init__(
+        self,
+        output_format: str = "txt",
+        *,
+        include_tables: bool = True,
+        include_images: bool = False,
+        include_formatting: bool = False,
+        include_links: bool = False,
+        options: Optional[Extractor] = None,
+        stats: Optional[ExtractionStats] = None,
+    ) -> None:
+        self.options = options or Extractor(
+            output_format=output_format,
+            formatting=include_formatting,
+            links=include_links,
+            images=include_images,
+            tables=include_tables,
+        )
+        self.stats = stats
+        self.parser = HTMLFeed(self.options.max_file_size)
+
+    def feed(self, chunk: bytes) -> bool:
+        "Parse a chunk, return False if the document is too large and the rest can be skipped."
+        self.parser.feed(chunk)
+        return not self.parser.too_large
+
+    def close(self) -> Optional[Document]:
+        """Finish parsing and extract the document.
+        Raises ExtractionTimeout if the time budget of the options is exceeded."""
+        size, too_large = self.parser.size, self.parser.too_large
+        tree = self.parser.close()
+        if too_large or not is_acceptable_length(size, self.options):
+            stats = self.stats or current_stats()
+            if stats is not None:
+                stats.count("rejected_size")
+            return None
+        if tree is None:
+            return None
+        return _internal_extraction(
+            tree, options=self.options, stats=self.stats, consume=True
+        )
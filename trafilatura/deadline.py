@@ -0,0 +1,74 @@
+"""
+Cooperative time budget of an extraction: the long loops check
+the deadline of the current document and stop when it is exceeded.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterable, Iterator, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class ExtractionTimeout(Exception):
+    "Raised when the extraction of a document exceeds its time budget."
+
+
+class Deadline:
+    "Point in time after which the extraction of the current document is aborted."
+    __slots__ = ["end", "seconds"]
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.end = perf_counter() + seconds
+
+    def check(self) -> None:
+        "Raise an error if the deadline has passed."
+        if perf_counter() > self.end:
+            raise ExtractionTimeout(f"extraction took more than {self.seconds} seconds")
+
+    def iterate(self, iterable: Iterable[T]) -> Iterator[T]:
+        "Iterate and check the deadline before each item."
+        for item in iterable:
+            self.check()
+            yield item
+
+
+class _NullDeadline(Deadline):
+    "No time limit, used when the budget is disabled."
+    __slots__ = ()
+
+    def __init__(self) -> None:  # pylint: disable=super-init-not-called
+        self.seconds = self.end = float("inf")
+
+    def check(self) -> None:
+        return None
+
+    def iterate(self, iterable: Iterable[T]) -> Iterable[T]:  # type: ignore[override]
+        return iterable
+
+
+NULL_DEADLINE = _NullDeadline()
+
+# deadline of the document being extracted in the current context
+CURRENT_DEADLINE: ContextVar[Deadline] = ContextVar(
+    "trafilatura_deadline", default=NULL_DEADLINE
+)
+
+
+def current_deadline() -> Deadline:
+    "Return the deadline of the current extraction, a null object if there is none."
+    return CURRENT_DEADLINE.get()
+
+
+@contextmanager
+def time_budget(seconds: Optional[float]) -> Iterator[Deadline]:
+    "Set a deadline for the extraction run in the block, no limit if seconds is 0 or None."
+    deadline = Deadline(seconds) if seconds else NULL_DEADLINE
+    token = CURRENT_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        CURRENT_DEADLINE.reset(token)
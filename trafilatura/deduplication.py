@@ -0,0 +1,230 @@
+"""
+Deduplication of text segments across the documents handled by a process
+and detection of near-duplicate documents.
+"""
+
+import re
+
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+from lxml.etree import _Element
+
+from .settings import LRU_SIZE, Extractor
+from .utils import trim
+
+
+class LRUCache:
+    "Thread-safe counter of keys which only keeps the most recently used ones."
+
+    __slots__ = ["data", "lock", "maxsize"]
+
+    def __init__(self, maxsize: int = LRU_SIZE) -> None:
+        self.data: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.lock = Lock()
+        self.maxsize = maxsize
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: Hashable) -> int:
+        "Return the count of a key, 0 if it is unknown."
+        with self.lock:
+            return self.data.get(key, 0)
+
+    def increment(self, key: Hashable) -> int:
+        "Count a key, evict the least recently used one if necessary and return the previous count."
+        with self.lock:
+            count = self.data.get(key, 0)
+            self.data[key] = count + 1
+            if count:
+                self.data.move_to_end(key)
+            elif len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+        return count
+
+    def clear(self) -> None:
+        "Forget all keys, for example between two sessions."
+        with self.lock:
+            self.data.clear()
+
+
+LRU_TEST = LRUCache(LRU_SIZE)
+
+
+def duplicate_test(element: _Element, options: Extractor) -> bool:
+    "Check if the text of an element has already been seen more than max_repetitions times."
+    teststring = trim(" ".join(element.itertext()))
+    if len(teststring) <= options.min_duplcheck_size:
+        return False
+    # the hash is enough within a process and lighter than the text itself
+    return LRU_TEST.increment(hash(teststring)) > options.max_repetitions
+
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+TOKENS = re.compile(r"\w+")
+
+
+def shingle_digests(tokens: Sequence[str]) -> bytes:
+    """Concatenated 8-byte hashes of the sequences of SHINGLE_SIZE consecutive tokens,
+    or of all tokens if there are fewer."""
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = [
+            " ".join(tokens[i : i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        ]
+    return b"".join(
+        blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles
+    )
+
+
+# for each bit of a byte, most significant first: byte value -> 1 if the bit is set
+BIT_TABLES = [bytes((value >> (7 - bit)) & 1 for value in range(256)) for bit in range(8)]
+
+
+class SimHash:
+    """64-bit SimHash of a text over its word shingles, computed incrementally:
+    the text can be added in several parts as long as they do not split words."""
+
+    __slots__ = ["counts", "tail", "total"]
+
+    def __init__(self, text: str = "") -> None:
+        self.counts = [0] * FINGERPRINT_BITS
+        self.tail: List[str] = []
+        self.total = 0
+        if text:
+            self.update(text)
+
+    def update(self, text: str) -> None:
+        "Add a part of the text, the last tokens are kept to form shingles with the next one."
+        tokens = self.tail + TOKENS.findall(text.lower())
+        if len(tokens) < SHINGLE_SIZE:
+            self.tail = tokens
+            return
+        self._add(shingle_digests(tokens))
+        self.tail = tokens[len(tokens) - SHINGLE_SIZE + 1 :]
+
+    def _add(self, digests: bytes) -> None:
+        "Count the set bits of the hashes, most significant bit first."
+        # counting by byte position and bit keeps the loops in C
+        counts = self.counts
+        for position in range(8):
+            column = digests[position::8]
+            for bit, table in enumerate(BIT_TABLES):
+                counts[position * 8 + bit] += column.translate(table).count(1)
+        self.total += len(digests) // 8
+
+    def value(self) -> int:
+        "Return the fingerprint as an integer."
+        if not self.total:
+            # short text, a single shingle
+            return int.from_bytes(shingle_digests(self.tail), "big")
+        result = 0
+        for count in self.counts:
+            result = (result << 1) | (count * 2 > self.total)
+        return result
+
+    def hexdigest(self) -> str:
+        "Return the fingerprint as a hexadecimal string."
+        return f"{self.value():016x}"
+
+
+def content_fingerprint(text: str) -> str:
+    "Compute the SimHash fingerprint of a text as a hexadecimal string."
+    return SimHash(text).hexdigest()
+
+
+def hamming_distance(first: int, second: int) -> int:
+    "Number of bits which differ between two fingerprints."
+    return bin(first ^ second).count("1")
+
+
+class NearDuplicateIndex:
+    """Index of fingerprints split into bands, two fingerprints which differ
+    in max_distance bits or less share at least one band. Only the maxsize
+    most recently used fingerprints are kept. Thread-safe."""
+
+    __slots__ = ["bands", "entries", "lock", "max_distance", "maxsize", "tables"]
+
+    def __init__(self, max_distance: int = 3, maxsize: int = LRU_SIZE) -> None:
+        self.max_distance = max_distance
+        self.maxsize = maxsize
+        count = max_distance + 1
+        width, rest = divmod(FINGERPRINT_BITS, count)
+        # (shift, mask) of each band, the first ones take the remaining bits
+        self.bands: List[Tuple[int, int]] = []
+        shift = FINGERPRINT_BITS
+        for band in range(count):
+            size = width + (band < rest)
+            shift -= size
+            self.bands.append((shift, (1 << size) - 1))
+        self.entries: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.tables: List[Dict[int, Dict[Hashable, int]]] = [{} for _ in self.bands]
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _candidates(self, value: int) -> Dict[Hashable, int]:
+        "Gather the entries which share at least one band with the fingerprint."
+        candidates: Dict[Hashable, int] = {}
+        for (shift, mask), table in zip(self.bands, self.tables):
+            candidates.update(table.get((value >> shift) & mask, {}))
+        return candidates
+
+    def _remove(self, key: Hashable) -> None:
+        "Remove an entry from the band tables, empty buckets included."
+        value = self.entries.pop(key)
+        for (shift, mask), table in zip(self.bands, self.tables):
+            band = (value >> shift) & mask
+            bucket = table[band]
+            del bucket[key]
+            if not bucket:
+                del table[band]
+
+    def query(self, fingerprint: Union[int, str]) -> Optional[Hashable]:
+        "Return the key of a stored near duplicate, if any."
+        value = _as_int(fingerprint)
+        with self.lock:
+            candidates = self._candidates(value)
+        for key, other in candidates.items():
+            if hamming_distance(value, other) <= self.max_distance:
+                return key
+        return None
+
+    def add(self, fingerprint: Union[int, str], key: Hashable) -> Optional[Hashable]:
+        """Return the key of a stored near duplicate if there is one,
+        otherwise store the fingerprint under the given key and evict
+        the least recently used one if necessary."""
+        value = _as_int(fingerprint)
+        with self.lock:
+            for other_key, other in self._candidates(value).items():
+                if hamming_distance(value, other) <= self.max_distance:
+                    self.entries.move_to_end(other_key)
+                    return other_key
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = value
+            for (shift, mask), table in zip(self.bands, self.tables):
+                table.setdefault((value >> shift) & mask, {})[key] = value
+            if len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+        return None
+
+    def clear(self) -> None:
+        "Forget all fingerprints."
+        with self.lock:
+            self.entries.clear()
+            for table in self.tables:
+                table.clear()
+
+
+def _as_int(fingerprint: Union[int, str]) -> int:
+    "Convert a hexadecimal fingerprint if necessary."
+    return int(fingerprint, 16) if isinstance(fingerprint, str) else fingerprint
@@ -6,7 +6,8 @@ Functions to process nodes in HTML code.
 import logging
 
 from copy import deepcopy
-from typing import List, Optional, Tuple
+from io import StringIO
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
 
 
 from lxml.etree import (
@@ -14,22 +15,29 @@ from lxml.etree import (
     Element,
     SubElement,
     XPath,
+    iterwalk,
     strip_tags,
-    tostring,
+    xmlfile,
 )
 from lxml.html import HtmlElement
 
 
+from .deadline import current_deadline
+from .deduplication import duplicate_test
+from .matchers import RuleMatcher
 from .settings import (
     Document,
     Extractor,
     CUT_EMPTY_ELEMS,
-    MANUALLY_CLEANED,
-    MANUALLY_STRIPPED,
 )
 
 from .utils import trim, is_image_element
-from .xml import META_ATTRIBUTES, delete_element
+from .xml import (
+    TextSinkAdapter,
+    delete_element,
+    metadata_attributes,
+    normalize_tree,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -50,51 +58,111 @@ REND_TAG_MAPPING = {
 
 HTML_TAG_MAPPING = {v: k for k, v in REND_TAG_MAPPING.items()}
 
-PRESERVE_IMG_CLEANING = {"figure", "picture", "source"}
+FIGURE_TABLES = XPath(".//figure[descendant::table]")
 
 CODE_INDICATORS = ["{", '("', "('", "\n    "]
 
 
+class TreeJournal:
+    """Log of the destructive operations performed on a tree, used instead
+    of a backup copy: the changes can be reverted and applied again."""
+    __slots__ = ["entries"]
+
+    def __init__(self) -> None:
+        self.entries: List[Tuple[Any, ...]] = []
+
+    def set_text(self, element: _Element, value: Optional[str]) -> None:
+        "Change the text of an element."
+        self.entries.append(("text", element, element.text, value))
+        element.text = value
+
+    def set_tail(self, element: _Element, value: Optional[str]) -> None:
+        "Change the tail of an element."
+        self.entries.append(("tail", element, element.tail, value))
+        element.tail = value
+
+    def delete(self, element: _Element, keep_tail: bool = True) -> None:
+        "Same as delete_element() but recorded."
+        parent = element.getparent()
+        if parent is None:
+            return
+        if keep_tail and element.tail:
+            previous = element.getprevious()
+            if previous is None:
+                self.set_text(parent, (parent.text or "") + element.tail)
+            else:
+                self.set_tail(previous, (previous.tail or "") + element.tail)
+        self.entries.append(("remove", parent, parent.index(element), element))
+        parent.remove(element)
+
+    def rollback(self) -> None:
+        "Revert all the recorded changes, the log can be replayed afterwards."
+        for action, target, old, new in reversed(self.entries):
+            if action == "remove":
+                # the element is reinserted along with its tail
+                target.insert(old, new)
+            elif action == "text":
+                target.text = old
+            else:
+                target.tail = old
+
+    def replay(self) -> None:
+        "Apply the recorded changes again after a rollback."
+        for action, target, old, new in self.entries:
+            if action == "remove":
+                target.remove(new)
+            elif action == "text":
+                target.text = new
+            else:
+                target.tail = new
+
+
 def tree_cleaning(tree: HtmlElement, options: Extractor) -> HtmlElement:
     "Prune the tree by discarding unwanted elements."
-    # determine cleaning strategy, use lists to keep it deterministic
-    cleaning_list, stripping_list = (
-        MANUALLY_CLEANED.copy(),
-        MANUALLY_STRIPPED.copy(),
-    )
-    if not options.tables:
-        cleaning_list.extend(["table", "td", "th", "tr"])
-    else:
+    plan = options.plan
+    if options.tables:
         # prevent this issue: https://github.com/adbar/trafilatura/issues/301
-        for elem in tree.xpath(".//figure[descendant::table]"):
+        for elem in FIGURE_TABLES(tree):
             elem.tag = "div"
-    if options.images:
-        # Many websites have <img> inside <figure> or <picture> or <source> tag
-        cleaning_list = [
-            e for e in cleaning_list if e not in PRESERVE_IMG_CLEANING
-        ]
-        stripping_list.remove("img")
 
     # strip targeted elements
-    strip_tags(tree, stripping_list)
+    strip_tags(tree, plan.stripping)
 
     # prevent removal of paragraphs
     if options.focus == "recall" and tree.find(".//p") is not None:
-        tcopy = deepcopy(tree)
-        for expression in cleaning_list:
+        journal = TreeJournal()
+        for expression in plan.cleaning:
             for element in tree.iter(expression):
-                delete_element(element)
+                journal.delete(element)
         if tree.find(".//p") is None:
-            tree = tcopy
+            journal.rollback()
     # delete targeted elements
     else:
-        for expression in cleaning_list:
+        for expression in plan.cleaning:
             for element in tree.iter(expression):
                 delete_element(element)
 
     return prune_html(tree, options.focus)
 
 
+def prune_boilerplate(tree: HtmlElement, options: Extractor) -> int:
+    """Remove the blocks learned as boilerplate for the host of the page,
+    reverted if most of the text would be deleted. Return the number of removed blocks."""
+    if options.learner is None:
+        return 0
+    blocks = options.learner.process(tree, options.url)
+    if not blocks:
+        return 0
+    old_len = len(tree.text_content())
+    journal = TreeJournal()
+    for block in blocks:
+        journal.delete(block)
+    if len(tree.text_content()) <= old_len / 7:
+        journal.rollback()
+        return 0
+    return len(blocks)
+
+
 def prune_html(tree: HtmlElement, focus: str = "balanced") -> HtmlElement:
     "Delete selected empty elements to save space and processing time."
     tails = focus != "precision"
@@ -105,41 +173,189 @@ def prune_html(tree: HtmlElement, focus: str = "balanced") -> HtmlElement:
     return tree
 
 
+def select_nodes(
+    tree: HtmlElement, nodelist: Union[List[XPath], RuleMatcher]
+) -> Iterator[List[_Element]]:
+    "Yield the nodes selected by each expression in turn, using a compiled matcher if given."
+    if isinstance(nodelist, RuleMatcher):
+        yield from nodelist.select(tree)
+    else:
+        for expression in nodelist:
+            yield expression(tree)
+
+
 def prune_unwanted_nodes(
-    tree: HtmlElement, nodelist: List[XPath], with_backup: bool = False
+    tree: HtmlElement,
+    nodelist: Union[List[XPath], RuleMatcher],
+    with_backup: bool = False,
 ) -> HtmlElement:
-    "Prune the HTML tree by removing unwanted sections."
-    if with_backup:
-        old_len = len(tree.text_content())  # ' '.join(tree.itertext())
-        backup = deepcopy(tree)
-
-    for expression in nodelist:
-        for subtree in expression(tree):
-            # preserve tail text from deletion
+    """Prune the HTML tree by removing unwanted sections, selected by a list of
+    XPath expressions or a matcher compiled from it. With a backup the
+    pruning is reverted if it deletes most of the text, the changes are
+    journaled so that a copy of the tree is only made in that case."""
+    if not with_backup:
+        for selection in select_nodes(tree, nodelist):
+            for subtree in selection:
+                # preserve tail text from deletion
+                if subtree.tail is not None:
+                    prev = subtree.getprevious()
+                    if prev is None:
+                        prev = subtree.getparent()
+                    if prev is not None:
+                        # There is a previous node, append text to its tail
+                        prev.tail = (prev.tail or "") + " " + subtree.tail
+                # remove the node
+                delete_element(subtree)
+        return tree
+
+    old_len = new_len = len(tree.text_content())  # ' '.join(tree.itertext())
+    journal = TreeJournal()
+    for selection in select_nodes(tree, nodelist):
+        for subtree in selection:
+            # keep track of the text length, nodes inside a deleted subtree don't count
+            attached = subtree.getparent()
+            while attached is not None and attached is not tree:
+                attached = attached.getparent()
+            if attached is not None:
+                new_len -= len(subtree.xpath("string()"))
             if subtree.tail is not None:
                 prev = subtree.getprevious()
                 if prev is None:
                     prev = subtree.getparent()
                 if prev is not None:
-                    # There is a previous node, append text to its tail
-                    prev.tail = (prev.tail or "") + " " + subtree.tail
-            # remove the node
-            delete_element(subtree)
-
-    if with_backup:
-        new_len = len(tree.text_content())
-        # todo: adjust for recall and precision settings
-        return tree if new_len > old_len / 7 else backup
-    return tree
+                    journal.set_tail(prev, (prev.tail or "") + " " + subtree.tail)
+                    if attached is not None and prev is not tree:
+                        new_len += len(subtree.tail) + 1
+            journal.delete(subtree)
+
+    # todo: adjust for recall and precision settings
+    if new_len > old_len / 7:
+        return tree
+    # materialize the backup, the pruned tree stays as it is for the caller
+    journal.rollback()
+    backup = deepcopy(tree)
+    journal.replay()
+    return backup
+
+
+# summary of a string: non-space characters, tokens, starts and ends with a non-space character
+TextSummary = Optional[Tuple[int, int, bool, bool]]
+
+
+def summarize_text(text: Optional[str]) -> TextSummary:
+    "Summarize a string so that the length of its trimmed form can be derived after concatenation."
+    if not text:
+        return None
+    tokens = text.split()
+    if not tokens:
+        return 0, 0, False, False
+    return sum(map(len, tokens)), len(tokens), not text[0].isspace(), not text[-1].isspace()
+
+
+def merge_summaries(first: TextSummary, second: TextSummary) -> TextSummary:
+    "Summarize the concatenation of two strings."
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return (
+        first[0] + second[0],
+        first[1] + second[1] - (first[3] and second[2]),
+        first[2],
+        second[3],
+    )
+
+
+def trimmed_length(summary: TextSummary) -> int:
+    "Length of the string after trim()."
+    return summary[0] + summary[1] - 1 if summary and summary[1] else 0
+
+
+class LinkStatsTable:
+    """Text and link lengths of the elements of a tree, computed in a single
+    post-order traversal and updated when elements are deleted, in order to
+    avoid going through nested elements over and over."""
+    __slots__ = ["nodes"]
+
+    def __init__(self, tree: _Element) -> None:
+        # element: (text summary, link text length, non-empty links, short links, links)
+        # leaves are only stored when queried to save memory, their values are derived from their text
+        self.nodes: Dict[_Element, Tuple[TextSummary, int, int, int, int]] = {}
+        for _, elem in iterwalk(tree, events=("end",)):
+            if len(elem):
+                self._compute(elem)
+
+    def _get(self, elem: _Element) -> Tuple[TextSummary, int, int, int, int]:
+        record = self.nodes.get(elem)
+        if record is None:
+            record = self.nodes[elem] = summarize_text(elem.text), 0, 0, 0, 0
+        return record
+
+    def _compute(self, elem: _Element) -> None:
+        nodes = self.nodes
+        summary = summarize_text(elem.text)
+        linklen = elemnum = shortelems = total = 0
+        for child in elem:
+            # comments and processing instructions only count through their tail
+            if isinstance(child.tag, str):
+                record = nodes.get(child)
+                if record is None:
+                    child_summary = summarize_text(child.text)
+                else:
+                    child_summary = record[0]
+                    linklen += record[1]
+                    elemnum += record[2]
+                    shortelems += record[3]
+                    total += record[4]
+                if child_summary is not None:
+                    summary = merge_summaries(summary, child_summary)
+                if child.tag == "ref":
+                    length = trimmed_length(child_summary)
+                    linklen += length
+                    elemnum += length > 0
+                    shortelems += 0 < length < 10
+                    total += 1
+            if child.tail:
+                summary = merge_summaries(summary, summarize_text(child.tail))
+        nodes[elem] = (summary, linklen, elemnum, shortelems, total)
+
+    def text_length(self, elem: _Element) -> int:
+        "Length of the trimmed text content of the element."
+        return trimmed_length(self._get(elem)[0])
+
+    def link_info(self, elem: _Element) -> Tuple[int, int, int, int]:
+        "Length of the link texts, number of non-empty links, of short links and total number of links."
+        return self._get(elem)[1:]  # type: ignore[return-value]
+
+    def refresh(self, elements: Sequence[Optional[_Element]]) -> None:
+        "Update the given elements and their ancestors after changes in their subtrees."
+        # gather the ancestors once, then recompute them from the bottom up
+        depths: Dict[_Element, int] = {}
+        for elem in elements:
+            chain = []
+            while elem is not None and elem in self.nodes and elem not in depths:
+                chain.append(elem)
+                elem = elem.getparent()
+            depth = depths.get(elem, -1) if elem is not None else -1
+            for node in reversed(chain):
+                depth += 1
+                depths[node] = depth
+        for elem in sorted(depths, key=depths.__getitem__, reverse=True):
+            self._compute(elem)
 
 
 def collect_link_info(
-    links_xpath: List[HtmlElement],
+    links_xpath: List[HtmlElement], table: Optional[LinkStatsTable] = None
 ) -> Tuple[int, int, int, List[str]]:
     "Collect heuristics on link text"
-    mylist = [
-        e for e in (trim(elem.text_content()) for elem in links_xpath) if e
-    ]
+    if table is None:
+        mylist = [
+            e for e in (trim(elem.text_content()) for elem in links_xpath) if e
+        ]
+    else:
+        mylist = [
+            trim(elem.text_content()) for elem in links_xpath if table.text_length(elem)
+        ]
     lengths = list(map(len, mylist))
     # longer strings impact recall in favor of precision
     shortelems = sum(1 for length in lengths if length < 10)
@@ -147,18 +363,27 @@ def collect_link_info(
 
 
 def link_density_test(
-    element: HtmlElement, text: str, favor_precision: bool = False
+    element: HtmlElement,
+    text: str,
+    favor_precision: bool = False,
+    table: Optional[LinkStatsTable] = None,
 ) -> Tuple[bool, List[str]]:
-    "Remove sections which are rich in links (probably boilerplate)"
-    links_xpath = element.findall(".//ref")
-    if not links_xpath:
+    """Remove sections which are rich in links (probably boilerplate).
+    With a stats table the lengths are read from it and text can be empty."""
+    if table is None:
+        links_xpath = element.findall(".//ref")
+        total, elemlen = len(links_xpath), len(text)
+    else:
+        linklen, elemnum, shortelems, total = table.link_info(element)
+        elemlen = table.text_length(element)
+    if not total:
         return False, []
     mylist: List[str] = []
     # shortcut
-    if len(links_xpath) == 1:
+    if total == 1:
         len_threshold = 10 if favor_precision else 100
-        link_text = trim(links_xpath[0].text_content())
-        if len(link_text) > len_threshold and len(link_text) > len(text) * 0.9:
+        link_len = len(trim(links_xpath[0].text_content())) if table is None else linklen
+        if link_len > len_threshold and link_len > elemlen * 0.9:
             return True, []
     if element.tag == "p":
         limitlen = 60 if element.getnext() is None else 30
@@ -169,9 +394,12 @@ def link_density_test(
         #    limitlen, threshold = 150, 0.66
         else:
             limitlen = 100
-    elemlen = len(text)
     if elemlen < limitlen:
-        linklen, elemnum, shortelems, mylist = collect_link_info(links_xpath)
+        if table is None:
+            linklen, elemnum, shortelems, mylist = collect_link_info(links_xpath)
+        elif elemnum:
+            # the link texts are only needed here, for short elements
+            mylist = collect_link_info(element.findall(".//ref"), table)[3]
         if elemnum == 0:
             return True, mylist
         LOGGER.debug(
@@ -188,18 +416,27 @@ def link_density_test(
     return False, mylist
 
 
-def link_density_test_tables(element: HtmlElement) -> bool:
+def link_density_test_tables(
+    element: HtmlElement, table: Optional[LinkStatsTable] = None
+) -> bool:
     "Remove tables which are rich in links (probably boilerplate)."
-    links_xpath = element.findall(".//ref")
-
-    if not links_xpath:
+    if table is None:
+        links_xpath = element.findall(".//ref")
+        total = len(links_xpath)
+    else:
+        linklen, elemnum, _, total = table.link_info(element)
+    if not total:
         return False
 
-    elemlen = len(trim(element.text_content()))
+    if table is None:
+        elemlen = len(trim(element.text_content()))
+    else:
+        elemlen = table.text_length(element)
     if elemlen < 200:
         return False
 
-    linklen, elemnum, _, _ = collect_link_info(links_xpath)
+    if table is None:
+        linklen, elemnum, _, _ = collect_link_info(links_xpath)
     if elemnum == 0:
         return True
 
@@ -214,28 +451,38 @@ def delete_by_link_density(
     tagname: str,
     backtracking: bool = False,
     favor_precision: bool = False,
+    table: Optional[LinkStatsTable] = None,
 ) -> HtmlElement:
     """Determine the link density of elements with respect to their length,
-    and remove the elements identified as boilerplate."""
+    and remove the elements identified as boilerplate. A stats table
+    covering the subtree is used and kept up to date if given."""
     deletions = []
     len_threshold = 200 if favor_precision else 100
     depth_threshold = 1 if favor_precision else 3
 
-    for elem in subtree.iter(tagname):
-        elemtext = trim(elem.text_content())
-        result, templist = link_density_test(elem, elemtext, favor_precision)
+    for elem in current_deadline().iterate(subtree.iter(tagname)):
+        if table is None:
+            elemtext = trim(elem.text_content())
+            elemlen = len(elemtext)
+        else:
+            elemtext, elemlen = "", table.text_length(elem)
+        result, templist = link_density_test(elem, elemtext, favor_precision, table)
         if result or (
             backtracking
             and templist
-            and 0 < len(elemtext) < len_threshold
+            and 0 < elemlen < len_threshold
             and len(elem) >= depth_threshold
         ):
             deletions.append(elem)
             # else: # and not re.search(r'[?!.]', text):
             # print(elem.tag, templist)
 
+    parents = []
     for elem in dict.fromkeys(deletions):
+        parents.append(elem.getparent())
         delete_element(elem)
+    if table is not None:
+        table.refresh(parents)
 
     return subtree
 
@@ -279,12 +526,10 @@ def handle_textnode(
 
     # filter content
     # or not re.search(r'\w', element.text):  # text_content()?
-    # if (
-    #     not elem.text
-    #     and textfilter(elem)
-    #     or (options.dedup and duplicate_test(elem, options))
-    # ):
+    # if not elem.text and textfilter(elem):
     #     return None
+    if options.dedup and duplicate_test(elem, options):
+        return None
     return elem
 
 
@@ -303,9 +548,10 @@ def process_node(elem: _Element, options: Extractor) -> Optional[_Element]:
         elem.text, elem.tail = elem.tail, None
 
     # content checks
-    # if elem.text or elem.tail:
-    #     if textfilter(elem) or (options.dedup and duplicate_test(elem, options)):
-    #         return None
+    # if (elem.text or elem.tail) and textfilter(elem):
+    #     return None
+    if options.dedup and (elem.text or elem.tail) and duplicate_test(elem, options):
+        return None
 
     return elem
 
@@ -418,12 +664,10 @@ CONVERSIONS = {
 def convert_tags(tree: HtmlElement, options: Extractor) -> HtmlElement:
     "Simplify markup and convert relevant HTML tags to an XML standard."
     # delete links for faster processing
-    if not options.links:
-        xpath_expr = ".//*[self::div or self::li or self::p]//a"
-        if options.tables:
-            xpath_expr += "|.//table//a"
+    link_selection = options.plan.link_selection
+    if link_selection is not None:
         # necessary for further detection
-        for elem in tree.xpath(xpath_expr):
+        for elem in link_selection(tree):
             elem.tag = "ref"
         # strip the rest
         strip_tags(tree, "a")
@@ -466,8 +710,8 @@ HTML_CONVERSIONS = {
 }
 
 
-def convert_to_html(tree: _Element) -> _Element:
-    "Convert XML to simplified HTML."
+def convert_html_tags(tree: _Element) -> None:
+    "Convert the XML elements of a tree to simplified HTML in place."
     for elem in tree.iter(HTML_CONVERSIONS.keys()):
         conversion = HTML_CONVERSIONS[str(elem.tag)]
         # apply function or straight conversion
@@ -481,20 +725,34 @@ def convert_to_html(tree: _Element) -> _Element:
         else:
             elem.attrib.clear()
     tree.tag = "body"
+
+
+def convert_to_html(tree: _Element) -> _Element:
+    "Convert XML to simplified HTML."
+    convert_html_tags(tree)
     root = Element("html")
     root.append(tree)
     return root
 
 
-def build_html_output(document: Document, with_metadata: bool = False) -> str:
-    "Convert the document to HTML and return a string."
-    html_tree = convert_to_html(document.body)
+def write_html_output(document: Document, sink: TextIO, with_metadata: bool = False) -> None:
+    "Convert the document to HTML in place and stream it to a text sink."
+    convert_html_tags(document.body)
+    normalize_tree(document.body)
+    adapter = TextSinkAdapter(sink)
+    with xmlfile(adapter, encoding="utf-8") as xf:
+        with xf.element("html"):
+            if with_metadata:
+                head = Element("head")
+                for item, value in metadata_attributes(document).items():
+                    SubElement(head, "meta", name=item, content=value)
+                xf.write(head, pretty_print=True)
+            xf.write(document.body, pretty_print=True, with_tail=False)
+    adapter.finish()
 
-    if with_metadata:
-        head = Element("head")
-        for item in META_ATTRIBUTES:
-            if value := getattr(document, item):
-                SubElement(head, "meta", name=item, content=value)
-        html_tree.insert(0, head)
 
-    return tostring(html_tree, pretty_print=True, encoding="unicode").strip()
+def build_html_output(document: Document, with_metadata: bool = False) -> str:
+    "Convert the document to HTML and return a string."
+    output = StringIO()
+    write_html_output(document, output, with_metadata)
+    return output.getvalue().strip()
@@ -7,13 +7,14 @@ import logging
 import re  # import regex as re
 
 from copy import deepcopy
-from typing import Any, Optional, Tuple, Set, Union
+from typing import AbstractSet, Any, FrozenSet, Optional, Tuple, Union, cast
 from urllib.parse import urljoin
 
 from lxml.etree import (
     _Element,
     Element,
     SubElement,
+    XPath,
     strip_elements,
     strip_tags,
     tostring,
@@ -22,13 +23,17 @@ from lxml.html import HtmlElement
 
 # own
 from .htmlprocessing import (
+    LinkStatsTable,
     delete_by_link_density,
     handle_textnode,
     link_density_test_tables,
     process_node,
     prune_unwanted_nodes,
 )
+from .deadline import current_deadline
+from .matchers import AutomatonMatcher, RuleMatcher
 from .settings import TAG_CATALOG, Extractor
+from .stats import current_stats, measure, measure_total
 from .utils import (
     FORMATTING_PROTECTED,
     copy_attributes,
@@ -56,6 +61,15 @@ FORMATTING = {"hi", "ref", "span"}
 CODES_QUOTES = {"code", "quote"}
 NOT_AT_THE_END = {"head", "ref"}
 
+# compiled rules evaluated in a single pass, the XPath versions serve as reference
+BODY_MATCHER = RuleMatcher(BODY_XPATH)
+# the fast mode leaves out the last expression, generic main containers used as fallback
+FAST_BODY_MATCHER = RuleMatcher(BODY_XPATH[:-1])
+OVERALL_DISCARD_MATCHER = AutomatonMatcher(OVERALL_DISCARD_XPATH)
+TEASER_DISCARD_MATCHER = AutomatonMatcher(TEASER_DISCARD_XPATH)
+
+ALL_DESCENDANTS = XPath(".//*")
+
 
 def _log_event(msg: str, tag: Any, text: Optional[Union[bytes, str]]) -> None:
     "Format extraction event for debugging purposes."
@@ -264,7 +278,7 @@ def handle_quotes(element: _Element, options: Extractor) -> Optional[_Element]:
 
 
 def handle_other_elements(
-    element: _Element, potential_tags: Set[str], options: Extractor
+    element: _Element, potential_tags: AbstractSet[str], options: Extractor
 ) -> Optional[_Element]:
     "Handle diverse or unknown elements in the scope of relevant tags."
     # handle w3schools code
@@ -298,7 +312,7 @@ def handle_other_elements(
 
 
 def handle_paragraphs(
-    element: _Element, potential_tags: Set[str], options: Extractor
+    element: _Element, potential_tags: AbstractSet[str], options: Extractor
 ) -> Optional[_Element]:
     "Process paragraphs along with their children, trim and clean the content."
     element.attrib.clear()  # todo: test if necessary
@@ -398,7 +412,7 @@ def define_cell_type(is_header: bool) -> _Element:
 
 
 def handle_table(
-    table_elem: _Element, potential_tags: Set[str], options: Extractor
+    table_elem: _Element, potential_tags: AbstractSet[str], options: Extractor
 ) -> Optional[_Element]:
     "Process single table element."
     newtable = Element("table")
@@ -477,7 +491,7 @@ def handle_table(
                     else:
                         # subcell_elem = Element(child.tag)
                         processed_subchild = handle_textelem(
-                            child, potential_tags.union(["div"]), options
+                            child, potential_tags | {"div"}, options
                         )
                     # add child element to processed_element
                     if processed_subchild is not None:
@@ -549,7 +563,7 @@ def handle_image(
 
 
 def handle_textelem(
-    element: _Element, potential_tags: Set[str], options: Extractor
+    element: _Element, potential_tags: AbstractSet[str], options: Extractor
 ) -> Optional[_Element]:
     """Process text element and determine how to deal with its content"""
     new_element = None
@@ -594,7 +608,7 @@ def recover_wild_text(
     LOGGER.debug("Recovering wild text elements")
     search_expr = ".//blockquote|.//code|.//p|.//pre|.//q|.//quote|.//table|.//div[contains(@class, 'w3-code')]"
     if options.focus == "recall":
-        potential_tags.update(["div", "lb"])
+        potential_tags = potential_tags | {"div", "lb"}
         search_expr += "|.//div|.//lb|.//list"
     # prune
     search_tree = prune_unwanted_sections(tree, potential_tags, options)
@@ -614,37 +628,47 @@ def recover_wild_text(
 
 
 def prune_unwanted_sections(
-    tree: HtmlElement, potential_tags: Set[str], options: Extractor
+    tree: HtmlElement, potential_tags: AbstractSet[str], options: Extractor
 ) -> HtmlElement:
-    "Rule-based deletion of targeted document sections"
+    """Rule-based deletion of targeted document sections. The fast mode
+    prunes without backup and deletes by link density in a single pass."""
+    stats = current_stats()
     # favor_precision = options.focus == "precision"
     # prune the rest
-    tree = prune_unwanted_nodes(tree, OVERALL_DISCARD_XPATH, with_backup=True)
-    # decide if images are preserved
-    # if "graphic" not in potential_tags:
-    #     tree = prune_unwanted_nodes(tree, DISCARD_IMAGE_ELEMENTS)
-    # balance precision/recall
-    # if options.focus != "recall":
-    tree = prune_unwanted_nodes(tree, TEASER_DISCARD_XPATH)
-    # if favor_precision:
-    #     tree = prune_unwanted_nodes(tree, PRECISION_DISCARD_XPATH)
-    # remove elements by link density, several passes
-    for _ in range(2):
-        tree = delete_by_link_density(
-            tree, "div", backtracking=True, favor_precision=False
-        )
-        tree = delete_by_link_density(
-            tree, "list", backtracking=False, favor_precision=False
-        )
-        tree = delete_by_link_density(
-            tree, "p", backtracking=False, favor_precision=False
+    with measure(stats, "prune_unwanted_nodes"):
+        tree = prune_unwanted_nodes(
+            tree, OVERALL_DISCARD_MATCHER, with_backup=not options.fast
         )
+        # decide if images are preserved
+        # if "graphic" not in potential_tags:
+        #     tree = prune_unwanted_nodes(tree, DISCARD_IMAGE_ELEMENTS)
+        # balance precision/recall
+        # if options.focus != "recall":
+        tree = prune_unwanted_nodes(tree, TEASER_DISCARD_MATCHER)
+        # if favor_precision:
+        #     tree = prune_unwanted_nodes(tree, PRECISION_DISCARD_XPATH)
+    # remove elements by link density, several passes
+    with measure(stats, "delete_by_link_density"):
+        # text and link lengths computed once for all passes
+        table = LinkStatsTable(tree)
+        for _ in range(1 if options.fast else 2):
+            tree = delete_by_link_density(
+                tree, "div", backtracking=True, favor_precision=False, table=table
+            )
+            tree = delete_by_link_density(
+                tree, "list", backtracking=False, favor_precision=False, table=table
+            )
+            tree = delete_by_link_density(
+                tree, "p", backtracking=False, favor_precision=False, table=table
+            )
     # tables
     if "table" in potential_tags:
         # tree = delete_by_link_density(tree, 'table', backtracking=False, favor_precision=favor_precision)
         for elem in tree.iter("table"):
-            if link_density_test_tables(elem) is True:
+            if link_density_test_tables(elem, table) is True:
+                parent = elem.getparent()
                 delete_element(elem, keep_tail=False)
+                table.refresh([parent])
     # also filter fw/head, table and quote elements?
     # if favor_precision:
     #     # delete trailing titles
@@ -661,43 +685,51 @@ def prune_unwanted_sections(
 
 def _extract(
     tree: HtmlElement, options: Extractor
-) -> Tuple[_Element, str, Set[str]]:
+) -> Tuple[_Element, str, FrozenSet[str]]:
     # init
-    potential_tags = set(TAG_CATALOG)
-    if options.tables is True:
-        potential_tags.update(["table", "td", "th", "tr"])
-    if options.images is True:
-        potential_tags.add("graphic")
-    if options.links is True:
-        potential_tags.add("ref")
+    plan = options.plan
+    potential_tags = plan.potential_tags
     result_body = Element("body")
+    stats = current_stats()
+    deadline = current_deadline()
+    matched = None
+    # locate the candidates of all expressions in a single pass,
+    # the fast mode stops at the first expression found, without fallback,
+    # the search is measured once per document
+    body_timer = measure_total(stats, "body_xpath")
+    with body_timer:
+        if options.fast:
+            first, subtree = FAST_BODY_MATCHER.first_match(tree)
+        else:
+            candidates = BODY_MATCHER.scan(tree)
     # iterate
-    for expr in BODY_XPATH:
+    for index, expr in enumerate(BODY_XPATH):
         # select tree if the expression has been found
-        subtree = next((s for s in expr(tree) if s is not None), None)
+        if options.fast:
+            if index != first:
+                continue
+        else:
+            with body_timer:
+                subtree = BODY_MATCHER.first_valid(index, candidates[index], tree)
         if subtree is None:
             continue
         # prune the subtree
-        subtree = prune_unwanted_sections(subtree, potential_tags, options)
+        with measure(stats, "prune_unwanted_sections"):
+            subtree = prune_unwanted_sections(cast(HtmlElement, subtree), potential_tags, options)
         # skip if empty tree
         if len(subtree) == 0:
             continue
         # no paragraphs containing text, or not enough
-        ptest = subtree.xpath("//p//text()")
-        if options.focus == "precision":
-            factor = 1
-        else:
-            factor = 3
+        # ptest = subtree.xpath("//p//text()")
+        # factor = 1 if options.focus == "precision" else 3
         # if not ptest or len("".join(ptest)) < options.min_extracted_size * factor:  # type: ignore[attr-defined]
         #     potential_tags.add("div")
         # polish list of potential tags
-        if "ref" not in potential_tags:
-            strip_tags(subtree, "ref")
-        if "span" not in potential_tags:
-            strip_tags(subtree, "span")
+        if plan.body_stripped:
+            strip_tags(subtree, plan.body_stripped)
         LOGGER.debug(sorted(potential_tags))
         # proper extraction
-        subelems = subtree.xpath(".//*")
+        subelems = ALL_DESCENDANTS(subtree)
         # e.g. only lb-elems in a div
         if {e.tag for e in subelems} == {"lb"}:
             subelems = [subtree]
@@ -707,7 +739,7 @@ def _extract(
                 el
                 for el in (
                     handle_textelem(e, potential_tags, options)
-                    for e in subelems
+                    for e in deadline.iterate(subelems)
                 )
                 if el is not None
             ]
@@ -716,22 +748,23 @@ def _extract(
         while len(result_body) > 0 and (result_body[-1].tag in NOT_AT_THE_END):
             delete_element(result_body[-1], keep_tail=False)
         # exit the loop if the result has children
-        if len(result_body) > 1:
+        if len(result_body) > 1 or options.fast:
             LOGGER.debug(trim(str(expr)))
+            matched = index
             break
+    body_timer.record()
+    if stats is not None:
+        stats.count(f"body_xpath_{matched if matched is not None else 'none'}")
     temp_text = " ".join(result_body.itertext()).strip()
     return result_body, temp_text, potential_tags
 
 
 def extract_content(
     cleaned_tree: HtmlElement, options: Extractor
-) -> Tuple[_Element, str, int]:
+) -> _Element:
     """Find the main content of a page using a set of XPath expressions,
     then extract relevant elements, strip them of unwanted subparts and
     convert them"""
-    # backup
-    backup_tree = deepcopy(cleaned_tree)
-
     result_body, temp_text, potential_tags = _extract(cleaned_tree, options)
     # if len(result_body) == 0:
     #    result_body, temp_text, potential_tags = _extract(tree_backup, options)
@@ -751,7 +784,7 @@ def extract_content(
 
 
 def process_comments_node(
-    elem: _Element, potential_tags: Set[str], options: Extractor
+    elem: _Element, potential_tags: AbstractSet[str], options: Extractor
 ) -> Optional[_Element]:
     """Process comment node and determine how to deal with its content"""
     if elem.tag in potential_tags:
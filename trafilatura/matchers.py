@@ -0,0 +1,608 @@
+# pylint:disable-msg=E0611
+"""
+Compiled versions of the XPath rules listed in xpaths.py: the attribute
+tests of several expressions are evaluated in a single traversal of the
+tree instead of one XPath evaluation per expression.
+"""
+
+import re
+
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+
+from lxml.etree import _Element, XPath
+
+
+EQUALS, EXISTS, CONTAINS, STARTS, TAG = range(5)
+
+FUNCTIONS = {"contains": CONTAINS, "starts-with": STARTS}
+
+NAME = r"[A-Za-z_][\w.:-]*"
+STEP = re.compile(rf"\s*(\.?//)(\*|{NAME})")
+ATTRIBUTE = re.compile(rf"\s*@({NAME})\s*$")
+ATTRIBUTE_UNION = re.compile(rf"\s*@{NAME}(?:\s*\|\s*@{NAME})+\s*$")
+COMPARISON = re.compile(rf"""\s*@({NAME})\s*=\s*(["'])(.*)\2\s*$""", re.DOTALL)
+FUNCTION = re.compile(r"\s*(contains|starts-with|translate)\((.*)\)\s*$", re.DOTALL)
+LITERAL = re.compile(r"""\s*(["'])(.*)\1\s*$""", re.DOTALL)
+SELF_TEST = re.compile(rf"\s*self::({NAME})\s*$")
+POSITION = re.compile(r"\s*1\s*$")
+OR_SEPARATOR = re.compile(r"\sor\s")
+COMMA = re.compile(",")
+PIPE = re.compile(r"\|")
+
+NO_ATTRIBUTES: Dict[str, str] = {}
+
+
+def _split(text: str, separator: "re.Pattern[str]") -> List[str]:
+    "Split an expression on a separator found outside of brackets and quotes."
+    parts, depth, quote, start, i = [], 0, "", 0, 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in "'\"":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif depth == 0:
+            match = separator.match(text, i)
+            if match:
+                parts.append(text[start:i])
+                i = start = match.end()
+                continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _closing(text: str, start: int) -> int:
+    "Find the position of the bracket closing the one found at the start position."
+    depth, quote = 0, ""
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in "'\"":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f"unbalanced expression: {text}")
+
+
+def _literal(text: str) -> str:
+    match = LITERAL.match(text)
+    if not match:
+        raise ValueError(f"string literal expected: {text}")
+    return match[2]
+
+
+class Atom:
+    "Elementary test on the tag or the attributes of an element."
+    __slots__ = ["kind", "attributes", "table", "value"]
+
+    def __init__(
+        self,
+        kind: int,
+        attributes: Tuple[str, ...] = (),
+        value: str = "",
+        table: Optional[Dict[int, Optional[int]]] = None,
+    ) -> None:
+        self.kind = kind
+        self.attributes = attributes
+        self.value = value
+        self.table = table
+
+
+def _parse_atom(text: str) -> Atom:
+    "Compile an elementary condition of a predicate."
+    match = SELF_TEST.match(text)
+    if match:
+        return Atom(TAG, value=match[1])
+    match = COMPARISON.match(text)
+    if match:
+        return Atom(EQUALS, (match[1],), match[3])
+    match = ATTRIBUTE.match(text)
+    if match:
+        return Atom(EXISTS, (match[1],))
+    match = FUNCTION.match(text)
+    if match and match[1] in FUNCTIONS:
+        target, literal = _split(match[2], COMMA)
+        table = None
+        function = FUNCTION.match(target)
+        if function and function[1] == "translate":
+            # translate(@attr, "ABC", "abc"), characters without replacement are deleted
+            target, source, destination = _split(function[2], COMMA)
+            source, destination = _literal(source), _literal(destination)
+            table = {
+                ord(char): ord(destination[i]) if i < len(destination) else None
+                for i, char in reversed(list(enumerate(source)))
+            }
+        if ATTRIBUTE.match(target) or ATTRIBUTE_UNION.match(target):
+            attributes = tuple(a.strip()[1:] for a in target.split("|"))
+            return Atom(FUNCTIONS[match[1]], attributes, _literal(literal), table)
+    raise ValueError(f"unsupported condition: {text.strip()}")
+
+
+class Condition:
+    """Disjunction of atoms, grouped by attribute so that each value is
+    resolved once and searched for all strings at once."""
+    __slots__ = ["atoms", "tags", "channels", "required"]
+
+    def __init__(self, atoms: List[Atom]) -> None:
+        self.atoms = atoms
+        self.tags = frozenset(atom.value for atom in atoms if atom.kind == TAG)
+        grouped: Dict[Tuple[Any, ...], List[Atom]] = {}
+        for atom in atoms:
+            if atom.kind != TAG:
+                table = tuple(sorted(atom.table.items())) if atom.table is not None else None
+                grouped.setdefault((atom.attributes, table), []).append(atom)
+        self.channels = [Channel(group) for group in grouped.values()]
+        # attributes among which one is needed for a match, if there is such a constraint
+        self.required: Optional[FrozenSet[str]] = None
+        if not self.tags and not any(channel.matches_missing for channel in self.channels):
+            self.required = frozenset(a for atom in atoms for a in atom.attributes)
+
+    def test(self, tag: str, values: Dict[str, str]) -> bool:
+        "Evaluate the condition on a tag and a dictionary of attributes."
+        return tag in self.tags or any(channel.test(values) for channel in self.channels)
+
+
+class Channel:
+    "Tests on the same attribute value: existence, equalities, substrings and prefixes."
+    __slots__ = ["attributes", "table", "exists", "equals", "contains", "starts", "matches_missing"]
+
+    def __init__(self, atoms: List[Atom]) -> None:
+        self.attributes = atoms[0].attributes
+        self.table = atoms[0].table
+        self.exists = any(atom.kind == EXISTS for atom in atoms)
+        self.equals = frozenset(atom.value for atom in atoms if atom.kind == EQUALS)
+        self.contains = _alternation([atom.value for atom in atoms if atom.kind == CONTAINS])
+        self.starts = _alternation([atom.value for atom in atoms if atom.kind == STARTS])
+        # a missing attribute is an empty string for functions
+        self.matches_missing = any(
+            atom.kind in (CONTAINS, STARTS) and not atom.value for atom in atoms
+        )
+
+    def test(self, values: Dict[str, str]) -> bool:
+        "Evaluate the tests on a dictionary of attributes."
+        if len(self.attributes) == 1:
+            value = values.get(self.attributes[0])
+        else:
+            # union of attributes: the first one in document (i.e. source) order
+            value = next((v for k, v in values.items() if k in self.attributes), None)
+        if value is None:
+            return self.matches_missing
+        if self.exists:
+            return True
+        if self.table is not None:
+            value = value.translate(self.table)
+        return (
+            value in self.equals
+            or (self.contains is not None and self.contains.search(value) is not None)
+            or (self.starts is not None and self.starts.match(value) is not None)
+        )
+
+
+def _alternation(strings: List[str]) -> Optional["re.Pattern[str]"]:
+    "Compile a regular expression matching any of the strings."
+    if not strings:
+        return None
+    return re.compile("|".join(map(re.escape, sorted(set(strings), key=len, reverse=True))))
+
+
+class Branch:
+    """Single location path: elements with one of the given tags (any if None)
+    which satisfy all conditions."""
+    __slots__ = ["tags", "conditions", "first"]
+
+    def __init__(
+        self, tags: Optional[FrozenSet[str]], conditions: List[Condition], first: bool
+    ) -> None:
+        self.tags = tags
+        self.conditions = conditions
+        self.first = first
+
+    def matches(self, tag: str, values: Dict[str, str]) -> bool:
+        "Test an element given its tag and attributes."
+        if self.tags is not None and tag not in self.tags:
+            return False
+        return all(condition.test(tag, values) for condition in self.conditions)
+
+    @property
+    def required(self) -> Optional[FrozenSet[str]]:
+        "Attributes among which one is needed for a match, None if there is no such constraint."
+        return next((c.required for c in self.conditions if c.required is not None), None)
+
+
+def _parse_branch(text: str) -> Branch:
+    "Compile a location path of the form .//tag[predicate]..., possibly in parentheses and followed by [1]."
+    text = text.strip()
+    first = False
+    if text.startswith("("):
+        end = _closing(text, 0)
+        rest = text[end + 1:].strip()
+        if not (rest.startswith("[") and POSITION.match(rest[1:-1]) and rest.endswith("]")):
+            raise ValueError(f"unsupported expression: {text}")
+        text, first = text[1:end].strip(), True
+    match = STEP.match(text)
+    if not match or match[1] != ".//":
+        raise ValueError(f"unsupported expression: {text}")
+    tags = None if match[2] == "*" else frozenset([match[2]])
+    conditions: List[Condition] = []
+    position = match.end()
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        if text[position] != "[":
+            raise ValueError(f"unsupported expression: {text}")
+        end = _closing(text, position)
+        predicate = text[position + 1:end]
+        position = end + 1
+        if POSITION.match(predicate):
+            # .//*[...][1] selects the first match of each parent, the first one
+            # in document order is the same as for (.//*[...])[1]
+            first = True
+            continue
+        atoms = [_parse_atom(part) for part in _split(predicate, OR_SEPARATOR)]
+        if all(atom.kind == TAG for atom in atoms):
+            selected = frozenset(atom.value for atom in atoms)
+            tags = selected if tags is None else tags & selected
+        else:
+            conditions.append(Condition(atoms))
+    return Branch(tags, conditions, first)
+
+
+class Rule:
+    "Compiled form of an XPath expression, a union of location paths."
+    __slots__ = ["expression", "branches", "tags", "attributes"]
+
+    def __init__(self, expression: Union[str, XPath]) -> None:
+        self.expression = expression if isinstance(expression, XPath) else XPath(expression)
+        self.branches = [_parse_branch(part) for part in _split(self.expression.path, PIPE)]
+        if len({branch.first for branch in self.branches}) > 1:
+            raise ValueError(f"unsupported union: {self.expression.path}")
+        # prefilters: tags (None if any) and attributes needed by all branches
+        self.tags: Optional[FrozenSet[str]] = None
+        if all(branch.tags is not None for branch in self.branches):
+            self.tags = frozenset().union(*(branch.tags for branch in self.branches))  # type: ignore[arg-type]
+        self.attributes: Optional[FrozenSet[str]] = None
+        required = [branch.required for branch in self.branches]
+        if all(attributes is not None for attributes in required):
+            self.attributes = frozenset().union(*required)  # type: ignore[arg-type]
+
+    @property
+    def first(self) -> bool:
+        "Whether only the first match in document order is used."
+        return self.branches[0].first
+
+    def matches(self, elem: _Element, values: Optional[Dict[str, str]] = None) -> bool:
+        "Test if the element is selected by the rule, the attributes can be passed along."
+        tag = elem.tag
+        if not isinstance(tag, str) or (self.tags is not None and tag not in self.tags):
+            return False
+        if values is None:
+            values = dict(elem.items())
+        if self.attributes is not None and not any(a in values for a in self.attributes):
+            return False
+        return any(branch.matches(tag, values) for branch in self.branches)
+
+
+class RuleMatcher:
+    """Evaluate a list of XPath expressions relative to a context node
+    (.//...) in a single traversal of the tree, the attributes of each
+    element are only read once."""
+    __slots__ = ["rules", "tags"]
+
+    def __init__(self, expressions: List[XPath]) -> None:
+        self.rules = [Rule(expression) for expression in expressions]
+        self.tags: Optional[Tuple[str, ...]] = None
+        if all(rule.tags is not None for rule in self.rules):
+            self.tags = tuple(sorted(frozenset().union(*(r.tags for r in self.rules))))  # type: ignore[arg-type]
+
+    def iterate(self, tree: _Element) -> Iterator[_Element]:
+        "Iterate over the descendants of the tree which can be selected by the rules."
+        iterator = tree.iter(*self.tags) if self.tags else tree.iter("*")
+        for elem in iterator:
+            if elem is not tree:
+                yield elem
+
+    def scan(self, tree: _Element) -> List[List[_Element]]:
+        """Return the elements matched by each rule in document order, only
+        the first one for rules marked as such. The traversal stops as soon
+        as all of them have found their element."""
+        results: List[List[_Element]] = [[] for _ in self.rules]
+        pending = list(enumerate(self.rules))
+        for elem in self.iterate(tree):
+            items = elem.items()
+            values = dict(items) if items else NO_ATTRIBUTES
+            done = False
+            for index, rule in pending:
+                if rule.matches(elem, values):
+                    results[index].append(elem)
+                    done = done or rule.first
+            if done:
+                pending = [(i, r) for i, r in pending if not (r.first and results[i])]
+                if not pending:
+                    break
+        return results
+
+    def first_match(self, tree: _Element) -> Tuple[Optional[int], Optional[_Element]]:
+        """Return the first rule, in the order of the list, which selects an element
+        and the first element it selects. Only the rules before the best one found
+        so far are tested, the traversal stops once the first rule has matched."""
+        best: Tuple[Optional[int], Optional[_Element]] = (None, None)
+        pending = list(enumerate(self.rules))
+        for elem in self.iterate(tree):
+            items = elem.items()
+            values = dict(items) if items else NO_ATTRIBUTES
+            for index, rule in pending:
+                if rule.matches(elem, values):
+                    best = (index, elem)
+                    pending = pending[:index]
+                    break
+            if not pending:
+                break
+        return best
+
+    def select(self, tree: _Element) -> Iterator[List[_Element]]:
+        """Yield the elements matched by each expression in turn, like
+        evaluating them one after another: elements removed from the tree
+        by the caller in the meantime are left out."""
+        results = self.scan(tree)
+        for index, matched in enumerate(results):
+            yield matched if index == 0 else [e for e in matched if is_descendant(e, tree)]
+
+    def first_valid(
+        self, index: int, candidates: List[_Element], tree: _Element
+    ) -> Optional[_Element]:
+        """Return the first element selected by the rule from the scan results,
+        the tree may have changed in between: the candidates which have been
+        removed or modified are skipped. Changes in the tree are not expected to
+        select new elements, the XPath expression is used as a fallback if
+        the rule only kept the first candidate."""
+        rule = self.rules[index]
+        for elem in candidates:
+            if rule.matches(elem) and is_descendant(elem, tree):
+                return elem
+        if rule.first and candidates:
+            return next((e for e in rule.expression(tree) if e is not None), None)
+        return None
+
+
+def is_descendant(elem: _Element, tree: _Element) -> bool:
+    "Check if the element is (still) a descendant of the tree."
+    parent = elem.getparent()
+    while parent is not None:
+        if parent is tree:
+            return True
+        parent = parent.getparent()
+    return False
+
+
+class AhoCorasick:
+    "Multi-pattern string search automaton: all the occurrences of the patterns are found in one pass over a text."
+    __slots__ = ["goto", "fail", "output"]
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.output: List[List[int]] = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                following = self.goto[state].get(char)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto.append({})
+                    self.output.append([])
+                    self.goto[state][char] = following
+                state = following
+            self.output[state].append(index)
+        # failure links, computed breadth-first
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                self.output[following] = self.output[following] + self.output[self.fail[following]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, int]]:
+        "Yield the index and end position of each pattern occurrence."
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position
+
+
+class AutomatonChannel:
+    """All the tests of a set of rules on a given attribute value, as bit masks
+    of satisfied atoms: the substrings are searched with an Aho-Corasick
+    automaton and the results are memoized for recurring values."""
+    __slots__ = [
+        "attributes", "table", "present", "missing", "equals",
+        "patterns", "contains", "starts", "automaton", "memo",
+    ]
+
+    def __init__(self, attributes: Tuple[str, ...], table: Optional[Dict[int, Optional[int]]]) -> None:
+        self.attributes = attributes
+        self.table = table
+        # masks of atoms satisfied by any existing value and by a missing attribute
+        self.present = self.missing = 0
+        self.equals: Dict[str, int] = {}
+        self.patterns: List[str] = []
+        self.contains: List[int] = []
+        self.starts: List[int] = []
+        self.automaton: Optional[AhoCorasick] = None
+        self.memo: Dict[str, int] = {}
+
+    def add(self, atom: Atom, bit: int) -> None:
+        "Register an atom identified by a bit."
+        if atom.kind == EXISTS:
+            self.present |= bit
+        elif atom.kind == EQUALS:
+            self.equals[atom.value] = self.equals.get(atom.value, 0) | bit
+        elif not atom.value:
+            # contains(x, "") and starts-with(x, "") are always true
+            self.present |= bit
+            self.missing |= bit
+        else:
+            if atom.value not in self.patterns:
+                self.patterns.append(atom.value)
+                self.contains.append(0)
+                self.starts.append(0)
+            index = self.patterns.index(atom.value)
+            if atom.kind == CONTAINS:
+                self.contains[index] |= bit
+            else:
+                self.starts[index] |= bit
+
+    def compile(self) -> None:
+        "Build the automaton once all atoms are registered."
+        self.automaton = AhoCorasick(self.patterns)
+
+    def evaluate(self, values: Dict[str, str]) -> int:
+        "Return the mask of atoms satisfied by the attributes."
+        if len(self.attributes) == 1:
+            value = values.get(self.attributes[0])
+        else:
+            value = next((v for k, v in values.items() if k in self.attributes), None)
+        if value is None:
+            return self.missing
+        mask = self.memo.get(value)
+        if mask is None:
+            mask = self._compute(value)
+            if len(self.memo) >= MAX_MEMO_SIZE:
+                self.memo.clear()
+            self.memo[value] = mask
+        return mask
+
+    def _compute(self, value: str) -> int:
+        if self.table is not None:
+            value = value.translate(self.table)
+        mask = self.present | self.equals.get(value, 0)
+        for index, end in self.automaton.search(value):  # type: ignore[union-attr]
+            mask |= self.contains[index]
+            if end + 1 == len(self.patterns[index]):
+                mask |= self.starts[index]
+        return mask
+
+
+MAX_MEMO_SIZE = 2**16
+
+
+class AutomatonMatcher(RuleMatcher):
+    """Same as RuleMatcher, but the attribute tests of all rules are
+    evaluated at once per element: one automaton per attribute channel
+    finds all the strings, then each condition is a bit mask test.
+    Suited to long lists of rules such as the discard expressions."""
+    __slots__ = ["channels", "compiled", "memo", "missing"]
+
+    def __init__(self, expressions: List[XPath]) -> None:
+        super().__init__(expressions)
+        channels: Dict[Tuple[Any, ...], AutomatonChannel] = {}
+        # rule: branches as (tags, [(condition tags, condition mask)])
+        self.compiled: List[List[Tuple[Optional[FrozenSet[str]], List[Tuple[FrozenSet[str], int]]]]] = []
+        bit = 1
+        for rule in self.rules:
+            branches = []
+            for branch in rule.branches:
+                conditions = []
+                for condition in branch.conditions:
+                    mask = 0
+                    for atom in condition.atoms:
+                        if atom.kind == TAG:
+                            continue
+                        table = tuple(sorted(atom.table.items())) if atom.table is not None else None
+                        key = (atom.attributes, table)
+                        if key not in channels:
+                            channels[key] = AutomatonChannel(atom.attributes, atom.table)
+                        channels[key].add(atom, bit)
+                        mask |= bit
+                        bit <<= 1
+                    conditions.append((condition.tags, mask))
+                branches.append((branch.tags, conditions))
+            self.compiled.append(branches)
+        self.channels = list(channels.values())
+        self.memo: Dict[Tuple[str, int], List[int]] = {}
+        for channel in self.channels:
+            channel.compile()
+        # result for elements without attributes
+        self.missing = 0
+        for channel in self.channels:
+            self.missing |= channel.missing
+
+    def satisfied(self, values: Dict[str, str]) -> int:
+        "Return the mask of the atoms satisfied by the attributes of an element."
+        if not values:
+            return self.missing
+        satisfied = 0
+        for channel in self.channels:
+            satisfied |= channel.evaluate(values)
+        return satisfied
+
+    def matching(self, elem: _Element, values: Optional[Dict[str, str]] = None) -> List[int]:
+        "Return the indices of the rules which select the element."
+        tag = elem.tag
+        if not isinstance(tag, str) or (self.tags is not None and tag not in self.tags):
+            return []
+        satisfied = self.satisfied(dict(elem.items()) if values is None else values)
+        # the result only depends on the tag and the satisfied atoms, which recur
+        key = (tag, satisfied)
+        indices = self.memo.get(key)
+        if indices is None:
+            indices = [
+                index
+                for index, (rule, branches) in enumerate(zip(self.rules, self.compiled))
+                if (rule.tags is None or tag in rule.tags)
+                and any(
+                    (tags is None or tag in tags)
+                    and all(tag in ctags or mask & satisfied for ctags, mask in conditions)
+                    for tags, conditions in branches
+                )
+            ]
+            if len(self.memo) >= MAX_MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = indices
+        return indices
+
+    def scan(self, tree: _Element) -> List[List[_Element]]:
+        "Return the elements matched by each rule in document order."
+        results: List[List[_Element]] = [[] for _ in self.rules]
+        pending = list(zip(range(len(self.rules)), self.rules, self.compiled))
+        for elem in self.iterate(tree):
+            tag = elem.tag
+            items = elem.items()
+            satisfied = self.satisfied(dict(items)) if items else self.missing
+            done = False
+            for index, rule, branches in pending:
+                if rule.tags is not None and tag not in rule.tags:
+                    continue
+                for tags, conditions in branches:
+                    if (tags is None or tag in tags) and all(
+                        tag in ctags or mask & satisfied for ctags, mask in conditions
+                    ):
+                        results[index].append(elem)
+                        done = done or rule.first
+                        break
+            if done:
+                pending = [p for p in pending if not (p[1].first and results[p[0]])]
+                if not pending:
+                    break
+        return results
@@ -0,0 +1,384 @@
+"""
+Extraction of the metadata of a page: the candidates are gathered in a single
+traversal of the tree, before the cleaning removes the <head> and other parts,
+and only the fields asked for are resolved.
+"""
+
+import re
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, cast
+from urllib.parse import urljoin, urlsplit
+
+from lxml.etree import XPath, _Element, iterwalk
+from lxml.html import HtmlElement
+
+from .json_metadata import MAX_JSON_SCRIPTS, extract_json_ld
+from .matchers import NO_ATTRIBUTES, AutomatonMatcher, Rule
+from .settings import Document
+from .utils import line_processing, trim
+from .xpaths import (
+    AUTHOR_DISCARD_XPATHS,
+    AUTHOR_XPATHS,
+    CATEGORIES_XPATHS,
+    TAGS_XPATHS,
+    TITLE_XPATHS,
+)
+
+METADATA_FIELDS = (
+    "author",
+    "categories",
+    "date",
+    "description",
+    "hostname",
+    "image",
+    "license",
+    "pagetype",
+    "sitename",
+    "tags",
+    "title",
+    "url",
+)
+
+# meta elements, by name or property in lower case, in order of preference
+META_TITLE = ["og:title", "twitter:title", "dc.title", "dcterms.title", "citation_title", "parsely-title", "title"]
+META_AUTHOR = ["author", "article:author", "dc.creator", "dcterms.creator", "citation_author", "parsely-author", "byl"]
+META_DESCRIPTION = ["og:description", "description", "twitter:description", "dc.description"]
+META_SITENAME = ["og:site_name", "application-name", "twitter:site"]
+META_IMAGE = ["og:image", "og:image:url", "og:image:secure_url", "twitter:image", "twitter:image:src"]
+META_URL = ["og:url", "twitter:url"]
+META_SECTION = ["article:section"]
+META_TAGS = ["article:tag", "keywords", "news_keywords", "citation_keywords", "dc.subject"]
+META_DATE = [
+    "article:published_time", "og:article:published_time", "datepublished", "dc.date",
+    "dcterms.date", "citation_publication_date", "parsely-pub-date", "date", "article:modified_time",
+]
+
+TITLE_SEPARATOR = re.compile(r"^(.+?)\s+[–•·—|⁄*⋆~‹«<›»>:-]\s+(.+)$")
+AUTHOR_PREFIX = re.compile(r"^(?:(?:posted|written)\s+by|by|von|par|de|from)[:\s]+", re.I)
+AUTHOR_SEPARATOR = re.compile(r"\s*(?:;|,|&|\|| and | und | et )\s*")
+ISO_DATE = re.compile(r"(?<!\d)\d{4}-[01]\d-[0-3]\d(?!\d)")
+CC_LICENSE = re.compile(r"/(by-nc-nd|by-nc-sa|by-nc|by-nd|by-sa|by|zero)/([1-9]\.[0-9])")
+JSON_LD_FIELDS = {"author", "categories", "pagetype", "sitename", "title"}
+LINK_PATTERNS = {"categories": re.compile(r"/categor(?:y|ies)/"), "tags": re.compile(r"/tags?/")}
+
+MAX_TITLE_LENGTH = 200
+MAX_AUTHOR_LENGTH = 120
+
+LINK_STEP = "//a[@href]"
+
+
+def _relative(expression: XPath) -> XPath:
+    "Adapt an expression over the whole document to a test on each element."
+    # the root element is never a candidate, //x is the same as .//x from the root
+    path = re.sub(r"(^|\|)\s*//", r"\1.//", expression.path.strip())
+    # rel="me" compares the text of a child element named rel, never found in HTML
+    return XPath(path.replace(' or rel="me"', ""))
+
+
+def _container(expression: XPath) -> XPath:
+    "Container part of an expression of the form ...//a[@href]."
+    path = expression.path.strip()
+    if not path.endswith(LINK_STEP):
+        raise ValueError(f"unsupported expression: {path}")
+    return _relative(XPath(path[: -len(LINK_STEP)]))
+
+
+# the discarded subtrees are known before the author rules are tested
+RULE_GROUPS = [
+    ("discard", [_relative(expression) for expression in AUTHOR_DISCARD_XPATHS]),
+    ("title", [_relative(expression) for expression in TITLE_XPATHS]),
+    ("author", [_relative(expression) for expression in AUTHOR_XPATHS]),
+    ("categories", [_container(expression) for expression in CATEGORIES_XPATHS]),
+    ("tags", [_container(expression) for expression in TAGS_XPATHS]),
+]
+MATCHER = AutomatonMatcher([expression for _, expressions in RULE_GROUPS for expression in expressions])
+# rule index -> (group, index in the group)
+RULE_INDEX = [(group, num) for group, expressions in RULE_GROUPS for num in range(len(expressions))]
+AUTHOR_DISCARD_RULES = MATCHER.rules[: len(AUTHOR_DISCARD_XPATHS)]
+
+
+def _valid_text(elem: _Element, text: Callable[[_Element], str], limit: int) -> Optional[str]:
+    "Text of the element if it has a plausible length."
+    content = text(elem)
+    return content if 2 < len(content) < limit else None
+
+
+def _element_text(elem: _Element) -> str:
+    return trim(" ".join(elem.itertext()))
+
+
+def _author_text(elem: _Element) -> str:
+    "Text of the element without the subtrees which cannot contain an author."
+    return trim(" ".join(_pruned_texts(elem, AUTHOR_DISCARD_RULES)))
+
+
+def _pruned_texts(elem: _Element, rules: List[Rule]) -> List[str]:
+    "Texts of an element without the subtrees selected by the rules, their tails excepted."
+    parts = [elem.text] if elem.text else []
+    for child in elem:
+        if isinstance(child.tag, str) and not any(rule.matches(child) for rule in rules):
+            parts.extend(_pruned_texts(child, rules))
+        if child.tail:
+            parts.append(child.tail)
+    return parts
+
+
+class MetadataCandidates:
+    """Raw metadata gathered in a single traversal of a tree: meta and link
+    elements, JSON-LD scripts of the page and the first candidates of the rules
+    in xpaths.py."""
+
+    __slots__ = [
+        "authors", "category_links", "h1", "h2", "json_ld", "licenses",
+        "links", "meta", "structured", "tag_links", "title_tag", "titles",
+    ]
+
+    def __init__(self) -> None:
+        # first content of each meta name or property, in lower case
+        self.meta: Dict[str, str] = {}
+        # first target of each link relation
+        self.links: Dict[str, str] = {}
+        self.title_tag: Optional[str] = None
+        self.h1: List[str] = []
+        self.h2: Optional[str] = None
+        # first valid result of each rule
+        self.titles: List[Optional[str]] = [None] * len(TITLE_XPATHS)
+        self.authors: List[Optional[str]] = [None] * len(AUTHOR_XPATHS)
+        # link texts of each rule
+        self.category_links: List[List[str]] = [[] for _ in CATEGORIES_XPATHS]
+        self.tag_links: List[List[str]] = [[] for _ in TAGS_XPATHS]
+        self.licenses: List[str] = []
+        # contents of the JSON-LD scripts, only parsed if needed
+        self.json_ld: List[str] = []
+        self.structured: Optional[Document] = None
+
+    def fill(self, document: Document, fields: Iterable[str] = METADATA_FIELDS, url: Optional[str] = None) -> None:
+        "Resolve the given fields and set them in the document."
+        for field in fields:
+            resolver = RESOLVERS.get(field)
+            if resolver is not None:
+                setattr(document, field, resolver(self, url))
+
+    def _meta(self, names: List[str]) -> Optional[str]:
+        return next((self.meta[name] for name in names if self.meta.get(name)), None)
+
+    def _json(self) -> Document:
+        "Metadata of the JSON-LD scripts, parsed on first use."
+        if self.structured is None:
+            self.structured = extract_json_ld(self.json_ld)
+        return self.structured
+
+    def _split_title(self) -> Tuple[Optional[str], Optional[str]]:
+        "Title and site name of the <title> element, if it is made of two parts."
+        if not self.title_tag:
+            return None, None
+        match = TITLE_SEPARATOR.match(self.title_tag)
+        return (match[1], match[2]) if match else (self.title_tag, None)
+
+    def title(self, url: Optional[str] = None) -> Optional[str]:
+        "Title of the page: metadata, JSON-LD, single h1, rules, <title> element, then headings."
+        title = self._meta(META_TITLE)
+        if title:
+            sitename = self.sitename()
+            match = TITLE_SEPARATOR.match(title)
+            if sitename and match and match[2] == sitename:
+                title = match[1]
+            return trim(title)
+        if self._json().title:
+            return self._json().title
+        if len(self.h1) == 1 and self.h1[0]:
+            return self.h1[0]
+        title = next((title for title in self.titles if title), None) or self._split_title()[0]
+        if title:
+            return trim(title)
+        return next((h1 for h1 in self.h1 if h1), None) or self.h2
+
+    def author(self, url: Optional[str] = None) -> Optional[str]:
+        "Authors separated by semicolons, from the metadata, JSON-LD or the rules."
+        if not self._meta(META_AUTHOR) and self._json().author:
+            return self._json().author
+        author = self._meta(META_AUTHOR) or next((author for author in self.authors if author), None)
+        if not author or author.startswith("http"):
+            return None
+        names = AUTHOR_SEPARATOR.split(AUTHOR_PREFIX.sub("", trim(author)))
+        return "; ".join(dict.fromkeys(name for name in names if name and "@" not in name)) or None
+
+    def sitename(self, url: Optional[str] = None) -> Optional[str]:
+        "Name of the site from the metadata, the second part of the <title> element or JSON-LD."
+        sitename = self._meta(META_SITENAME)
+        if sitename:
+            return trim(sitename.lstrip("@")) or None
+        # the JSON-LD publisher is often the company behind the site
+        return self._split_title()[1] or self._json().sitename
+
+    def url(self, url: Optional[str] = None) -> Optional[str]:
+        "Canonical URL of the page, resolved against the URL given for it."
+        for candidate in (self.links.get("canonical"), self._meta(META_URL)):
+            if candidate:
+                candidate = urljoin(url, candidate) if url else candidate
+                if candidate.startswith(("http://", "https://")):
+                    return candidate
+        return url
+
+    def hostname(self, url: Optional[str] = None) -> Optional[str]:
+        "Host name of the canonical URL, without www."
+        hostname = urlsplit(self.url(url) or "").hostname
+        return hostname[4:] if hostname and hostname.startswith("www.") else hostname
+
+    def date(self, url: Optional[str] = None) -> Optional[str]:
+        "Publication date of the page from the metadata, in ISO format."
+        for name in META_DATE:
+            match = ISO_DATE.search(self.meta.get(name, ""))
+            if match:
+                return match[0]
+        return None
+
+    def description(self, url: Optional[str] = None) -> Optional[str]:
+        "Description of the page from the metadata."
+        description = self._meta(META_DESCRIPTION)
+        return trim(description) if description else None
+
+    def image(self, url: Optional[str] = None) -> Optional[str]:
+        "Main image of the page from the metadata."
+        image = self._meta(META_IMAGE)
+        return urljoin(url, image) if image and url else image
+
+    def pagetype(self, url: Optional[str] = None) -> Optional[str]:
+        "OpenGraph type of the page, JSON-LD type otherwise."
+        return self.meta.get("og:type") or self._json().pagetype
+
+    def license(self, url: Optional[str] = None) -> Optional[str]:
+        "License of the page, Creative Commons licenses are shortened."
+        for candidate in [self.links.get("license"), *self.licenses]:
+            if candidate:
+                match = CC_LICENSE.search(candidate)
+                return f"CC {match[1].upper()} {match[2]}" if match else trim(candidate)
+        return None
+
+    def categories(self, url: Optional[str] = None) -> List[str]:
+        "Categories found by the first rule which selects any, JSON-LD or the metadata otherwise."
+        results = next((texts for texts in self.category_links if texts), None) or self._json().categories
+        if not results:
+            results = [self.meta[name] for name in META_SECTION if self.meta.get(name)]
+        return _unique(results)
+
+    def tags(self, url: Optional[str] = None) -> List[str]:
+        "Tags from the metadata or found by the first rule which selects any."
+        content = self._meta(META_TAGS)
+        if content:
+            return _unique(content.split(","))
+        return _unique(next((texts for texts in self.tag_links if texts), []))
+
+
+RESOLVERS: Dict[str, Callable[[MetadataCandidates, Optional[str]], Any]] = {
+    field: getattr(MetadataCandidates, field) for field in METADATA_FIELDS
+}
+
+
+def _unique(texts: List[str]) -> List[str]:
+    "Clean the texts and remove the duplicates, keeping the order."
+    return list(dict.fromkeys(filter(None, (line_processing(text) for text in texts))))
+
+
+def collect_metadata(tree: _Element, fields: Iterable[str] = METADATA_FIELDS) -> MetadataCandidates:
+    """Gather the metadata candidates of the page in a single traversal: the rules
+    of all fields are tested at once on each element, only the results of the
+    fields asked for are kept."""
+    fields = set(fields)
+    candidates = MetadataCandidates()
+    groups = fields & {"title", "author", "categories", "tags"}
+    with_json = bool(fields & JSON_LD_FIELDS)
+    if "author" in groups:
+        groups.add("discard")
+    # rule index -> (link texts, link pattern) of the categories and tags
+    containers = {
+        index: (candidates.category_links[num] if group == "categories" else candidates.tag_links[num], LINK_PATTERNS[group])
+        for index, (group, num) in enumerate(RULE_INDEX)
+        if group in LINK_PATTERNS and group in groups
+    }
+    # number of open elements selected by each container rule and by the discard rules
+    opened = dict.fromkeys(containers, 0)
+    discarded = 0
+    # (element, index of the container rule or -1 for a discarded one)
+    scopes: List[Tuple[_Element, int]] = []
+
+    for event, elem in iterwalk(tree, events=("start", "end"), tag="*"):
+        if event == "end":
+            while scopes and scopes[-1][0] is elem:
+                index = scopes.pop()[1]
+                if index < 0:
+                    discarded -= 1
+                else:
+                    opened[index] -= 1
+            continue
+        tag = elem.tag
+        items = elem.items()
+        values = dict(items) if items else NO_ATTRIBUTES
+
+        if tag == "meta":
+            name = (values.get("property") or values.get("name") or values.get("itemprop") or "").lower()
+            content = values.get("content")
+            if name and content and name not in candidates.meta:
+                candidates.meta[name] = content
+            continue
+        if tag == "link":
+            href = values.get("href")
+            for rel in values.get("rel", "").lower().split():
+                if href and rel not in candidates.links:
+                    candidates.links[rel] = href
+            continue
+        if tag == "script":
+            # scripts are removed by the cleaning
+            if (
+                with_json
+                and elem.text
+                and values.get("type", "").strip().lower() == "application/ld+json"
+                and len(candidates.json_ld) < MAX_JSON_SCRIPTS
+            ):
+                candidates.json_ld.append(elem.text)
+            continue
+        if tag == "title":
+            if candidates.title_tag is None:
+                candidates.title_tag = _element_text(elem)
+            continue
+        if tag == "h1":
+            candidates.h1.append(_element_text(elem))
+        elif tag == "h2" and candidates.h2 is None:
+            candidates.h2 = _element_text(elem) or None
+        elif tag == "a":
+            if values.get("rel") == "license":
+                candidates.licenses.append(_element_text(elem) or values.get("href", ""))
+            href = values.get("href")
+            if href is not None:
+                for index, count in opened.items():
+                    results, pattern = containers[index]
+                    if count and pattern.search(href):
+                        results.append(cast(HtmlElement, elem).text_content())
+
+        if not groups:
+            continue
+        for index in MATCHER.matching(elem, values):
+            group, num = RULE_INDEX[index]
+            if group not in groups:
+                continue
+            if group == "discard":
+                discarded += 1
+                scopes.append((elem, -1))
+            elif group == "title":
+                if candidates.titles[num] is None:
+                    candidates.titles[num] = _valid_text(elem, _element_text, MAX_TITLE_LENGTH)
+            elif group == "author":
+                if not discarded and candidates.authors[num] is None:
+                    candidates.authors[num] = _valid_text(elem, _author_text, MAX_AUTHOR_LENGTH)
+            else:
+                opened[index] += 1
+                scopes.append((elem, index))
+    return candidates
+
+
+def extract_metadata(tree: _Element, fields: Iterable[str] = METADATA_FIELDS, url: Optional[str] = None) -> Document:
+    "Extract the given metadata fields of a page into a new document."
+    fields = list(fields)
+    document = Document()
+    collect_metadata(tree, fields).fill(document, fields, url)
+    return document
@@ -0,0 +1,276 @@
+# pylint:disable-msg=E0611
+"""
+Functions to run the extraction on a series of documents in parallel.
+"""
+
+import asyncio
+import logging
+
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .core import _internal_extraction
+from .settings import PARALLEL_CORES, Extractor
+from .stats import ExtractionStats, collect_stats
+from .utils import make_chunks
+
+
+LOGGER = logging.getLogger(__name__)
+
+# small chunks keep the workers busy even if some documents are slow
+DEFAULT_CHUNKSIZE = 4
+
+# extraction arguments, set once per worker process
+WORKER_ARGS: Dict[str, Any] = {}
+WORKER_OPTIONS = {"stats": False}
+
+
+def _init_worker(kwargs: Dict[str, Any], with_stats: bool = False) -> None:
+    "Store the extraction arguments in the worker process."
+    WORKER_ARGS.clear()
+    WORKER_ARGS.update(kwargs)
+    WORKER_OPTIONS["stats"] = with_stats
+
+
+def _extract_text(filecontent: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+    """Extract a single document and only return the rendered text,
+    a pair (content, options) replaces the options of the document."""
+    if isinstance(filecontent, tuple):
+        filecontent, options = filecontent
+        kwargs = {**kwargs, "options": options}
+    try:
+        document = _internal_extraction(filecontent, **kwargs)
+    except Exception as err:  # pragma: no cover
+        LOGGER.error("extraction failed in worker: %s", err)
+        return None
+    return document.text if document is not None else None
+
+
+def _extract_chunk(
+    chunk: Tuple[Any, ...]
+) -> Tuple[List[Optional[str]], Optional[ExtractionStats]]:
+    """Extract a series of documents and only return the rendered text,
+    along with the stats of the chunk if required."""
+    if not WORKER_OPTIONS["stats"]:
+        return [_extract_text(filecontent, WORKER_ARGS) for filecontent in chunk], None
+    with collect_stats() as stats:
+        results = [_extract_text(filecontent, WORKER_ARGS) for filecontent in chunk]
+    return results, stats
+
+
+def extract_many(
+    iterable: Iterable[Any],
+    output_format: str = "markdown",
+    *,
+    include_tables: bool = True,
+    include_images: bool = False,
+    include_formatting: bool = False,
+    include_links: bool = False,
+    options: Optional[Extractor] = None,
+    ordered: bool = True,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    max_workers: Optional[int] = None,
+    stats: Optional[ExtractionStats] = None,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    """Extract the text of a series of documents using a pool of processes.
+    Yields tuples (input index, text or None), either in input order
+    or as soon as the results are available (ordered=False).
+    The input is consumed lazily, so that memory use stays bounded.
+    Pairs (content, options) set the options of a single document, e.g. its URL.
+    If a stats object is given, the workers' timings are merged into it."""
+    kwargs = {
+        "output_format": output_format,
+        "include_tables": include_tables,
+        "include_images": include_images,
+        "include_formatting": include_formatting,
+        "include_links": include_links,
+        "options": options,
+    }
+    max_workers = max_workers or PARALLEL_CORES
+    chunksize = max(chunksize, 1)
+    chunks = enumerate(make_chunks(iterable, chunksize))
+
+    # no pool needed
+    if max_workers == 1:
+        _init_worker(kwargs, stats is not None)
+        for chunk_num, chunk in chunks:
+            results, chunk_stats = _extract_chunk(chunk)
+            if stats is not None and chunk_stats is not None:
+                stats.merge(chunk_stats)
+            yield from enumerate(results, chunk_num * chunksize)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(kwargs, stats is not None),
+    ) as executor:
+        # keep a limited number of chunks in flight
+        pending: Dict[Future, Tuple[int, int]] = {}
+        done_chunks: Dict[int, Tuple[int, List[Optional[str]]]] = {}
+        next_chunk = 0
+
+        def submit_next() -> bool:
+            "Submit the next chunk if there is one."
+            try:
+                chunk_num, chunk = next(chunks)
+            except StopIteration:
+                return False
+            future = executor.submit(_extract_chunk, chunk)
+            pending[future] = (chunk_num, chunk_num * chunksize)
+            return True
+
+        # bound the number of chunks held in memory, including
+        # finished ones waiting for a straggler in ordered mode
+        window = max_workers * 2
+
+        def fill_window() -> None:
+            "Keep the workers busy within the memory bounds."
+            while len(pending) + len(done_chunks) < window and submit_next():
+                pass
+
+        fill_window()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk_num, start = pending.pop(future)
+                results, chunk_stats = future.result()
+                if stats is not None and chunk_stats is not None:
+                    stats.merge(chunk_stats)
+                if not ordered:
+                    yield from enumerate(results, start)
+                else:
+                    done_chunks[chunk_num] = (start, results)
+            # release results in input order
+            while next_chunk in done_chunks:
+                start, results = done_chunks.pop(next_chunk)
+                yield from enumerate(results, start)
+                next_chunk += 1
+            fill_window()
+
+
+async def aextract(
+    filecontent: Any,
+    output_format: str = "markdown",
+    *,
+    include_tables: bool = True,
+    include_images: bool = False,
+    include_formatting: bool = False,
+    include_links: bool = False,
+    options: Optional[Extractor] = None,
+    executor: Optional[Executor] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Optional[str]:
+    """Extract the text of a document without blocking the event loop.
+    The CPU-bound work runs on the given executor (the loop's default
+    thread pool otherwise), an optional semaphore caps the number of
+    documents in flight across calls."""
+    kwargs = {
+        "output_format": output_format,
+        "include_tables": include_tables,
+        "include_images": include_images,
+        "include_formatting": include_formatting,
+        "include_links": include_links,
+        "options": options,
+    }
+    loop = asyncio.get_running_loop()
+    func = partial(_extract_text, filecontent, kwargs)
+    if semaphore is None:
+        return await loop.run_in_executor(executor, func)
+    async with semaphore:
+        return await loop.run_in_executor(executor, func)
+
+
+async def aextract_many(
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    output_format: str = "markdown",
+    *,
+    include_tables: bool = True,
+    include_images: bool = False,
+    include_formatting: bool = False,
+    include_links: bool = False,
+    options: Optional[Extractor] = None,
+    executor: Optional[Executor] = None,
+    concurrency: Optional[int] = None,
+    ordered: bool = True,
+) -> AsyncIterator[Tuple[int, Optional[str]]]:
+    """Extract the text of documents coming from a (possibly asynchronous)
+    iterable. Yields tuples (input index, text or None) with at most
+    `concurrency` documents in flight, in input order or as completed.
+    Pending work is cancelled if the consumer stops iterating; documents
+    already running on an executor are left to finish."""
+    extract = partial(
+        aextract,
+        output_format=output_format,
+        include_tables=include_tables,
+        include_images=include_images,
+        include_formatting=include_formatting,
+        include_links=include_links,
+        options=options,
+        executor=executor,
+    )
+    concurrency = concurrency or PARALLEL_CORES
+
+    if isinstance(items, AsyncIterable):
+        aiterator = items.__aiter__()
+        iterator = None
+    else:
+        aiterator = None
+        iterator = iter(items)
+
+    async def run(index: int, filecontent: Any) -> Tuple[int, Optional[str]]:
+        "Bind the result to the input index."
+        return index, await extract(filecontent)
+
+    in_flight: Deque["asyncio.Task[Tuple[int, Optional[str]]]"] = deque()
+    index, exhausted = 0, False
+    try:
+        while True:
+            # schedule new documents within the concurrency bounds
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    if aiterator is not None:
+                        filecontent = await aiterator.__anext__()
+                    else:
+                        filecontent = next(iterator)  # type: ignore[arg-type]
+                except (StopAsyncIteration, StopIteration):
+                    exhausted = True
+                    break
+                in_flight.append(asyncio.ensure_future(run(index, filecontent)))
+                index += 1
+            if not in_flight:
+                break
+            if ordered:
+                yield await in_flight.popleft()
+            else:
+                finished: Set["asyncio.Task[Tuple[int, Optional[str]]]"]
+                finished, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    in_flight.remove(task)
+                    yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
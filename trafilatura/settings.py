@@ -3,10 +3,13 @@
 Listing a series of settings that are applied module-wide.
 """
 
+from collections import OrderedDict
 from configparser import ConfigParser
-from datetime import datetime
+from datetime import date
+from functools import lru_cache
 from html import unescape
-from typing import Any, Dict, List, Optional, Set
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
 
 try:
     from os import sched_getaffinity
@@ -23,6 +26,9 @@ from lxml.etree import _Element, Element, XPath
 
 from .utils import line_processing
 
+if TYPE_CHECKING:
+    from .boilerplate import BoilerplateLearner
+
 
 SUPPORTED_FMT_CLI = ["csv", "json", "html", "markdown", "txt", "xml", "xmltei"]
 SUPPORTED_FORMATS = set(SUPPORTED_FMT_CLI) | {
@@ -62,6 +68,43 @@ CONFIG_MAPPING = {
     "min_file_size": "MIN_FILE_SIZE",
 }
 
+# number of configurations whose parsed values are kept
+CONFIG_CACHE_SIZE = 16
+# id -> (configuration, raw values of the DEFAULT section, parsed values)
+CONFIG_VALUES: "OrderedDict[int, Tuple[ConfigParser, Dict[str, str], Dict[str, Any]]]" = OrderedDict()
+CONFIG_LOCK = Lock()
+
+
+def config_values(config: ConfigParser) -> Dict[str, Any]:
+    """Parse the values of the configuration used by the options, once
+    per configuration object unless its DEFAULT section has changed since."""
+    raw = config.defaults()
+    with CONFIG_LOCK:
+        entry = CONFIG_VALUES.get(id(config))
+        if entry is not None and entry[0] is config and entry[1] == raw:
+            CONFIG_VALUES.move_to_end(id(config))
+            return entry[2]
+    values: Dict[str, Any] = {
+        key: config.getint("DEFAULT", value) for key, value in CONFIG_MAPPING.items()
+    }
+    # optional values
+    max_tree_size = config.get("DEFAULT", "MAX_TREE_SIZE", fallback="")
+    values["max_tree_size"] = int(max_tree_size) if max_tree_size else None
+    values["timeout"] = config.getfloat("DEFAULT", "EXTRACTION_TIMEOUT", fallback=0)
+    values["extensive_date_search"] = config.getboolean("DEFAULT", "EXTENSIVE_DATE_SEARCH")
+    with CONFIG_LOCK:
+        CONFIG_VALUES[id(config)] = (config, dict(raw), values)
+        CONFIG_VALUES.move_to_end(id(config))
+        if len(CONFIG_VALUES) > CONFIG_CACHE_SIZE:
+            CONFIG_VALUES.popitem(last=False)
+    return values
+
+
+@lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def read_config_file(filename: Optional[str]) -> ConfigParser:
+    "Read a settings file once per process, the result should not be modified."
+    return use_config(filename)
+
 
 # todo Python >= 3.10: use dataclass with slots=True
 class Extractor:
@@ -87,10 +130,13 @@ class Extractor:
         # deduplication
         "min_duplcheck_size",
         "max_repetitions",
+        # site-level boilerplate
+        "learner",
         # rest
         "max_file_size",
         "min_file_size",
         "max_tree_size",
+        "timeout",
         # meta
         "source",
         "url",
@@ -102,6 +148,16 @@ class Extractor:
         "url_blacklist",
     ]
 
+    # set from the config file, see CONFIG_MAPPING
+    min_extracted_size: int
+    min_output_size: int
+    min_output_comm_size: int
+    min_extracted_comm_size: int
+    min_duplcheck_size: int
+    max_repetitions: int
+    max_file_size: int
+    min_file_size: int
+
     def __init__(
         self,
         *,
@@ -125,10 +181,13 @@ class Extractor:
         author_blacklist: Optional[Set[str]] = None,
         url_blacklist: Optional[Set[str]] = None,
         date_params: Optional[Dict[str, str]] = None,
+        learner: Optional["BoilerplateLearner"] = None,
     ):
         self._set_source(url, source)
         self._set_format(output_format)
         self._add_config(config)
+        # lower latency, slightly lower recall: no fallback on the next body expressions,
+        # pruning without backup, a single link density pass and plain text rendering
         self.fast: bool = fast
         self.focus: str = (
             "recall" if recall else "precision" if precision else "balanced"
@@ -139,6 +198,7 @@ class Extractor:
         self.images: bool = images
         self.tables: bool = tables
         self.dedup: bool = dedup
+        self.learner: Optional["BoilerplateLearner"] = learner
         self.lang: Optional[str] = lang
         self.url: Optional[str] = url
         self.only_with_metadata: bool = only_with_metadata
@@ -152,9 +212,19 @@ class Extractor:
             or output_format == "xmltei"
         )
         self.date_params: Dict[str, Any] = date_params or set_date_params(
-            self.config.getboolean("DEFAULT", "EXTENSIVE_DATE_SEARCH")
+            config_values(self.config)["extensive_date_search"]
+        )
+
+    def frozen(self) -> "PlanOptions":
+        "Frozen and hashable view of the options which determine the extraction plan."
+        return PlanOptions(
+            self.fast, self.focus, self.format, self.formatting, self.images, self.links, self.tables
         )
-        self.max_tree_size = None
+
+    @property
+    def plan(self) -> "ExtractionPlan":
+        "Extraction plan of the current options, compiled once per process."
+        return compile_plan(self.frozen())
 
     def _set_source(self, url: Optional[str], source: Optional[str]) -> None:
         "Set the source attribute in a robust way."
@@ -173,15 +243,19 @@ class Extractor:
 
     def _add_config(self, config: ConfigParser) -> None:
         "Store options loaded from config file."
-        for key, value in CONFIG_MAPPING.items():
-            setattr(self, key, config.getint("DEFAULT", value))
+        values = config_values(config)
+        for key in CONFIG_MAPPING:
+            setattr(self, key, values[key])
+        # optional values
+        self.max_tree_size: Optional[int] = values["max_tree_size"]
+        self.timeout: float = values["timeout"]
         self.config = config
 
 
 def args_to_extractor(args: Any, url: Optional[str] = None) -> Extractor:
     "Derive extractor configuration from CLI args."
     options = Extractor(
-        config=use_config(filename=args.config_file),
+        config=read_config_file(args.config_file),
         output_format=args.output_format,
         formatting=args.formatting,
         precision=args.precision,
@@ -205,7 +279,7 @@ def set_date_params(extensive: bool = True) -> Dict[str, Any]:
     return {
         "original_date": True,
         "extensive_search": extensive,
-        "max_date": datetime.now().strftime("%Y-%m-%d"),
+        "max_date": date.today().isoformat(),
     }
 
 
@@ -455,6 +529,74 @@ TAG_CATALOG = frozenset(
 )
 # + list(CUT_EMPTY_ELEMS)
 
+PRESERVE_IMG_CLEANING = {"figure", "picture", "source"}
+
+
+class PlanOptions(NamedTuple):
+    "Frozen and hashable view of the options which determine the extraction plan."
+    fast: bool
+    focus: str
+    format: str
+    formatting: bool
+    images: bool
+    links: bool
+    tables: bool
+
+
+class ExtractionPlan:
+    """Settings derived from a set of options, compiled once and shared by all the
+    extractions using them: tag sets, cleaning and stripping lists, compiled XPath
+    selections and rendering flags. Read-only, rebuilt from the options when pickled."""
+
+    __slots__ = ["body_stripped", "cleaning", "link_selection", "minimal", "options", "potential_tags", "stripping"]
+
+    def __init__(self, options: PlanOptions) -> None:
+        self.options = options
+        # determine cleaning strategy, use lists to keep it deterministic
+        cleaning, stripping = MANUALLY_CLEANED.copy(), MANUALLY_STRIPPED.copy()
+        if not options.tables:
+            cleaning.extend(["table", "td", "th", "tr"])
+        if options.images:
+            # Many websites have <img> inside <figure> or <picture> or <source> tag
+            cleaning = [e for e in cleaning if e not in PRESERVE_IMG_CLEANING]
+            stripping.remove("img")
+        self.cleaning: Tuple[str, ...] = tuple(cleaning)
+        self.stripping: Tuple[str, ...] = tuple(stripping)
+
+        potential_tags = set(TAG_CATALOG)
+        if options.tables:
+            potential_tags.update(["table", "td", "th", "tr"])
+        if options.images:
+            potential_tags.add("graphic")
+        if options.links:
+            potential_tags.add("ref")
+        self.potential_tags: FrozenSet[str] = frozenset(potential_tags)
+        # elements stripped from the selected body before the conversion
+        self.body_stripped: Tuple[str, ...] = tuple(
+            tag for tag in ("ref", "span") if tag not in self.potential_tags
+        )
+
+        # links kept for the link density tests, the others are stripped
+        self.link_selection: Optional[XPath] = None
+        if not options.links:
+            expression = ".//*[self::div or self::li or self::p]//a"
+            if options.tables:
+                expression += "|.//table//a"
+            self.link_selection = XPath(expression)
+
+        # the fast mode uses the minimal rendering unless formatting is required
+        self.minimal = options.fast and not options.formatting
+
+    def __reduce__(self) -> Tuple[Any, Tuple[PlanOptions]]:
+        # XPath objects cannot be pickled
+        return compile_plan, (self.options,)
+
+
+@lru_cache(maxsize=64)
+def compile_plan(options: PlanOptions) -> ExtractionPlan:
+    "Compile the extraction plan of a set of options, once per process."
+    return ExtractionPlan(options)
+
 
 JUSTEXT_LANGUAGES = {
     "ar": "Arabic",
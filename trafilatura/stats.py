@@ -0,0 +1,249 @@
+"""
+Optional instrumentation of the extraction pipeline: wall and CPU time
+per processing stage and document counters, aggregated across a batch.
+"""
+
+import heapq
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from math import floor, log2
+from threading import Lock
+from time import perf_counter, thread_time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# stats object active in the current context, None when disabled
+CURRENT_STATS: ContextVar[Optional["ExtractionStats"]] = ContextVar(
+    "trafilatura_stats", default=None
+)
+
+# histogram resolution: 4 buckets per power of two (about 19% wide)
+BUCKETS_PER_OCTAVE = 4
+MIN_DURATION = 1e-7
+
+
+class _NullTimer:
+    "Do nothing, used when the instrumentation is disabled."
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+    def record(self) -> None:
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    "Measure wall and CPU time of a stage and store it."
+    __slots__ = ["stats", "stage", "wall", "cpu"]
+
+    def __init__(self, stats: "ExtractionStats", stage: str) -> None:
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.wall, self.cpu = perf_counter(), thread_time()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stats.add_time(
+            self.stage, perf_counter() - self.wall, thread_time() - self.cpu
+        )
+
+
+class _StageTotal(_StageTimer):
+    """Sum the time of a stage spread over several blocks,
+    stored as a single measure by record()."""
+    __slots__ = ["total_wall", "total_cpu"]
+
+    def __init__(self, stats: "ExtractionStats", stage: str) -> None:
+        super().__init__(stats, stage)
+        self.total_wall = self.total_cpu = 0.0
+
+    def __exit__(self, *args: Any) -> None:
+        self.total_wall += perf_counter() - self.wall
+        self.total_cpu += thread_time() - self.cpu
+
+    def record(self) -> None:
+        "Store the total time of the blocks."
+        self.stats.add_time(self.stage, self.total_wall, self.total_cpu)
+
+
+class StageStats:
+    "Aggregated timings of a single stage, with a log-scale histogram for percentiles."
+    __slots__ = ["count", "wall", "cpu", "wall_max", "histogram"]
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.wall: float = 0.0
+        self.cpu: float = 0.0
+        self.wall_max: float = 0.0
+        self.histogram: Dict[int, int] = {}
+
+    def add(self, wall: float, cpu: float) -> None:
+        "Record a single measure."
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.wall_max = max(self.wall_max, wall)
+        bucket = floor(log2(max(wall, MIN_DURATION)) * BUCKETS_PER_OCTAVE)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def merge(self, other: "StageStats") -> None:
+        "Add the values of another stage object."
+        self.count += other.count
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.wall_max = max(self.wall_max, other.wall_max)
+        for bucket, num in other.histogram.items():
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + num
+
+    def percentile(self, value: float) -> float:
+        "Approximate the given percentile (0-100) of the wall time."
+        if not self.count:
+            return 0.0
+        threshold, seen = self.count * value / 100, 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= threshold:
+                # upper bound of the bucket
+                return min(2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE), self.wall_max)
+        return self.wall_max  # pragma: no cover
+
+    def as_dict(self) -> Dict[str, float]:
+        "Summarize the measures."
+        return {
+            "count": self.count,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "wall_mean": self.wall / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.wall_max,
+        }
+
+
+class ExtractionStats:
+    """Collect timings and counters of the extraction stages. The object
+    can be passed to the extraction functions or activated for a block
+    of code with collect_stats(), results of several documents, threads
+    or processes are aggregated with merge()."""
+    __slots__ = ["stages", "counters", "documents", "slowest", "max_slowest", "_lock"]
+
+    def __init__(self, max_slowest: int = 10) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.documents: int = 0
+        # min-heap of (duration, source) to spot outliers
+        self.slowest: List[Tuple[float, str]] = []
+        self.max_slowest = max_slowest
+        self._lock = Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != "_lock"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._lock = Lock()
+
+    def stage(self, name: str) -> _StageTimer:
+        "Return a context manager timing the given stage."
+        return _StageTimer(self, name)
+
+    def add_time(self, stage: str, wall: float, cpu: float = 0.0) -> None:
+        "Store the time spent in a stage."
+        if stage not in self.stages:
+            self.stages[stage] = StageStats()
+        self.stages[stage].add(wall, cpu)
+
+    def count(self, name: str, value: int = 1) -> None:
+        "Increment a counter."
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_document(self, doc_stats: "ExtractionStats", source: Optional[str], duration: float) -> None:
+        "Merge the stats of a single document and keep track of the slowest ones."
+        with self._lock:
+            self._merge(doc_stats)
+            self.documents += 1
+            self._push_slowest(duration, source or "")
+
+    def _push_slowest(self, duration: float, source: str) -> None:
+        if len(self.slowest) < self.max_slowest:
+            heapq.heappush(self.slowest, (duration, source))
+        elif self.slowest and duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, source))
+
+    def _merge(self, other: "ExtractionStats") -> None:
+        for name, stage in other.stages.items():
+            if name not in self.stages:
+                self.stages[name] = StageStats()
+            self.stages[name].merge(stage)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    def merge(self, other: "ExtractionStats") -> None:
+        "Aggregate the results of another stats object, e.g. from a worker."
+        with self._lock:
+            self._merge(other)
+            self.documents += other.documents
+            for duration, source in other.slowest:
+                self._push_slowest(duration, source)
+
+    def as_dict(self) -> Dict[str, Any]:
+        "Summarize all the measures as a dictionary."
+        return {
+            "documents": self.documents,
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()},
+            "counters": dict(self.counters),
+            "slowest": sorted(self.slowest, reverse=True),
+        }
+
+
+def current_stats() -> Optional[ExtractionStats]:
+    "Return the stats object of the current extraction, if any."
+    return CURRENT_STATS.get()
+
+
+def measure(stats: Optional[ExtractionStats], stage: str) -> Any:
+    "Time a stage if the instrumentation is active."
+    return NULL_TIMER if stats is None else _StageTimer(stats, stage)
+
+
+def measure_total(stats: Optional[ExtractionStats], stage: str) -> Any:
+    """Time a stage made of several blocks if the instrumentation is active,
+    the total is stored once when record() is called."""
+    return NULL_TIMER if stats is None else _StageTotal(stats, stage)
+
+
+@contextmanager
+def collect_stats(stats: Optional[ExtractionStats] = None) -> Iterator[ExtractionStats]:
+    "Activate the instrumentation for all extractions run in the block."
+    stats = stats or ExtractionStats()
+    token = CURRENT_STATS.set(stats)
+    try:
+        yield stats
+    finally:
+        CURRENT_STATS.reset(token)
+
+
+@contextmanager
+def track_document(stats: ExtractionStats, source: Optional[str] = None) -> Iterator[ExtractionStats]:
+    "Record the stages of a single document and add them to the aggregated stats."
+    doc_stats = ExtractionStats()
+    token = CURRENT_STATS.set(doc_stats)
+    start, cpu_start = perf_counter(), thread_time()
+    try:
+        yield doc_stats
+    finally:
+        CURRENT_STATS.reset(token)
+        duration = perf_counter() - start
+        doc_stats.add_time("total", duration, thread_time() - cpu_start)
+        stats.add_document(doc_stats, source, duration)
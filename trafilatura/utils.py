@@ -7,16 +7,38 @@ content filtering and language detection.
 import logging
 import re
 
-
+from codecs import (
+    BOM_UTF8,
+    BOM_UTF16_BE,
+    BOM_UTF16_LE,
+    BOM_UTF32_BE,
+    BOM_UTF32_LE,
+    getincrementaldecoder,
+    lookup,
+)
 from functools import lru_cache
-from itertools import islice
-from typing import Any, cast, Literal, Optional
-from unicodedata import normalize
-
-
-from lxml.etree import _Element
+from itertools import chain, islice
+from mmap import ACCESS_READ, mmap
+from os import PathLike, fstat
+from html import unescape
+from typing import Any, AnyStr, cast, Dict, Literal, Optional, Tuple, Union
+from unicodedata import is_normalized, normalize
+
+try:
+    from charset_normalizer import from_bytes  # type: ignore[import-not-found]
+except ImportError:
+    from_bytes = None  # type: ignore[assignment]
+
+try:
+    import py3langid  # type: ignore[import-not-found]
+except ImportError:
+    py3langid = None  # type: ignore[assignment]
+
+LANGID_FLAG = py3langid is not None
+
+from lxml.etree import _Element, Element
 from lxml.html import HtmlElement, HTMLParser, fromstring
-
+from lxml.html.defs import block_tags
 
 
 LOGGER = logging.getLogger(__name__)
@@ -25,20 +47,64 @@ UNICODE_ALIASES = {"utf-8", "utf_8"}
 
 DOCTYPE_TAG = re.compile("^< ?! ?DOCTYPE[^>]*/[^<]*>", re.I)
 FAULTY_HTML = re.compile(r"(<html.*?)\s*/>", re.I)
+# same for bytes, along with the line breaks of splitlines() besides \n and \r
+REPAIR_PATTERNS: Dict[type, Any] = {
+    str: (
+        DOCTYPE_TAG,
+        FAULTY_HTML,
+        ("\n", "\r", "doctype", "<html", "/>", r"\1>"),
+        "\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029",
+    ),
+    bytes: (
+        re.compile(DOCTYPE_TAG.pattern.encode(), re.I),
+        re.compile(FAULTY_HTML.pattern.encode(), re.I),
+        (b"\n", b"\r", b"doctype", b"<html", b"/>", rb"\1>"),
+        b"",
+    ),
+}
+LINE_END = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# encoding sniffing on the first bytes of a document
+SNIFF_SIZE = 4096
+# UTF-32 first since its little-endian BOM starts with the UTF-16 one
+BOMS = [
+    (BOM_UTF32_LE, "utf-32"),
+    (BOM_UTF32_BE, "utf-32"),
+    (BOM_UTF8, "utf-8-sig"),
+    (BOM_UTF16_LE, "utf-16"),
+    (BOM_UTF16_BE, "utf-16"),
+]
+XML_DECLARATION = re.compile(rb"""^\s*<\?xml[^>]*?encoding\s*=\s*["']?([\w.:-]+)""", re.I)
+META_CHARSET = re.compile(rb"""<meta[^>]+?charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+# as used by lxml to refuse strings with an encoding declaration
+STRING_DECLARATION = re.compile(r"""^(<\?xml[^>]+)\s+encoding\s*=\s*["'][^"']*["'](\s*\?>|)""")
+# labels handled as windows-1252 by browsers
+WINDOWS_1252_ALIASES = {"ascii", "iso8859-1"}
 HTML_STRIP_TAGS = re.compile(r"(<!--.*?-->|<[^>]*>)")
 
 # note: htmldate could use HTML comments
 # huge_tree=True, remove_blank_text=True
-HTML_PARSER = HTMLParser(
-    collect_ids=False,
-    default_doctype=False,
-    encoding="utf-8",
-    remove_comments=True,
-    remove_pis=True,
-)
+HTML_PARSER_OPTIONS: Dict[str, Any] = {
+    "collect_ids": False,
+    "default_doctype": False,
+    "encoding": "utf-8",
+    "remove_comments": True,
+    "remove_pis": True,
+}
+HTML_PARSER = HTMLParser(**HTML_PARSER_OPTIONS)
+
+# files are passed to the parser in chunks of this size
+FEED_CHUNK_SIZE = 2**16
+# documents returned as they are by lxml.html.fromstring(), the others are fragments
+FULL_HTML = re.compile(rb"^\s*<(?:html|!doctype)", re.I)
+# beginning of a fed document kept until the repairs can be determined
+HEAD_SIZE = 2**16
 
 LINES_TRIMMING = re.compile(r"(?<![p{P}>])\n", flags=re.UNICODE | re.MULTILINE)
 
+# characters on which str.splitlines() breaks, runs of them amount to a single newline once empty lines are removed
+LINE_BREAKS = re.compile("(?:[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029])+")
+
 URL_BLACKLIST_REGEX = re.compile(r"^https?://|/+$")
 
 # Regex to check image file extensions
@@ -59,8 +125,8 @@ FORMATTING_PROTECTED = {
 SPACING_PROTECTED = {"code", "pre"}
 
 # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Content-Language
-# TARGET_LANG_ATTRS = ('http-equiv="content-language"', 'property="og:locale"')
-# RE_HTML_LANG = re.compile(r'([a-z]{2})')
+TARGET_LANG_ATTRS = ('http-equiv="content-language"', 'property="og:locale"')
+RE_HTML_LANG = re.compile(r"([a-z]{2})")
 
 # Mostly filters for social media
 RE_FILTER = re.compile(
@@ -132,24 +198,111 @@ def isutf8(data: bytes) -> bool:
 #     return htmltext or str(filecontent, encoding='utf-8', errors='replace')
 
 
-def is_dubious_html(beginning: str) -> bool:
+def sniff_encoding(data: bytes) -> Optional[str]:
+    """Find the encoding of a document in the first bytes: byte order mark,
+    XML declaration or meta element. Return a Python codec name or None."""
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    beginning = data[:SNIFF_SIZE]
+    match = XML_DECLARATION.match(beginning) or META_CHARSET.search(beginning)
+    if not match:
+        return None
+    try:
+        encoding = lookup(match[1].decode("ascii")).name
+    except LookupError:
+        LOGGER.warning("unknown encoding: %s", match[1])
+        return None
+    # declared UTF-16/32 without BOM: the bytes read so far are ASCII-compatible
+    if encoding.startswith(("utf-16", "utf-32")):
+        return "utf-8"
+    return "cp1252" if encoding in WINDOWS_1252_ALIASES else encoding
+
+
+def guess_encoding(data: bytes) -> str:
+    "Guess the encoding of a document which is not valid UTF-8."
+    if from_bytes is not None:
+        sample = data if len(data) < 10000 else data[:5000] + data[-5000:]
+        result = from_bytes(sample).best()
+        if result is not None and result.encoding not in UNICODE_ALIASES:
+            return cast(str, result.encoding)
+    return "cp1252"
+
+
+def decode_html(data: bytes) -> Union[bytes, str]:
+    """Determine the encoding of a byte string: UTF-8 content is returned
+    as it is in order to be passed directly to the parser, other encodings
+    are decoded. Invalid sequences are replaced."""
+    encoding = sniff_encoding(data)
+    if encoding is None:
+        encoding = "utf-8" if isutf8(data) else guess_encoding(data)
+    if encoding in UNICODE_ALIASES:
+        return data
+    if encoding == "utf-8-sig":
+        return data[len(BOM_UTF8):]
+    return data.decode(encoding, errors="replace")
+
+
+def is_dubious_html(beginning: Union[bytes, str]) -> bool:
     "Assess if the object is proper HTML (awith a corresponding tag or declaration)."
+    if isinstance(beginning, bytes):
+        return b"html" not in beginning
     return "html" not in beginning
 
 
-def repair_faulty_html(htmlstring: str, beginning: str) -> str:
-    "Repair faulty HTML strings to make then palatable for libxml2."
+def _line_bounds(
+    text: Any, start: int, newline: AnyStr, carriage: AnyStr, all_breaks: bool
+) -> Tuple[int, Optional[int]]:
+    "Find the end of the line beginning at start and the start of the next one, as splitlines() does."
+    if all_breaks:
+        match = LINE_END.search(text, start)
+        return (match.start(), match.end()) if match else (len(text), None)
+    ends = [pos for pos in (text.find(newline, start), text.find(carriage, start)) if pos != -1]
+    if not ends:
+        return len(text), None
+    end = min(ends)
+    return end, end + (2 if text[end : end + 2] == carriage + newline else 1)
+
+
+def repair_prefix(data: Any, beginning: AnyStr) -> Tuple[AnyStr, int, AnyStr]:
+    """Find the repairs needed by a faulty document (string, bytes or memory map),
+    expressed as a new beginning replacing data[:offset] and a suffix,
+    so that large documents do not need to be copied."""
+    doctype_tag, faulty_html, literals, other_breaks = REPAIR_PATTERNS[
+        str if isinstance(data, str) else bytes
+    ]
+    newline, carriage, doctype, html_tag, closing, replacement = literals
+    offset, suffix = 0, newline[:0]
     # libxml2/LXML issue: https://bugs.launchpad.net/lxml/+bug/1955915
-    if "doctype" in beginning:
-        firstline, _, rest = htmlstring.partition("\n")
-        htmlstring = DOCTYPE_TAG.sub("", firstline, count=1) + "\n" + rest
-    # other issue with malformed documents: check first three lines
-    for i, line in enumerate(iter(htmlstring.splitlines())):
-        if "<html" in line and line.endswith("/>"):
-            htmlstring = FAULTY_HTML.sub(r"\1>", htmlstring, count=1)
-            break
-        if i > 2:
+    if doctype in beginning:
+        end = data.find(newline)
+        match = doctype_tag.match(data, 0, len(data) if end == -1 else end)
+        if match:
+            offset = match.end()
+        if end == -1:
+            suffix = newline
+    # other issue with malformed documents: check first four lines
+    # without splitting the whole document, rare line breaks require a regex
+    all_breaks = any(char in data for char in other_breaks)
+    start = offset
+    for _ in range(4):
+        end, following = _line_bounds(data, start, newline, carriage, all_breaks)
+        if (
+            data.find(html_tag, start, end) != -1
+            and data[max(start, end - len(closing)) : end] == closing
+        ):
+            return faulty_html.sub(replacement, data[offset:end], count=1), end, suffix
+        if following is None:
             break
+        start = following
+    return newline[:0], offset, suffix
+
+
+def repair_faulty_html(htmlstring: AnyStr, beginning: AnyStr) -> AnyStr:
+    "Repair faulty HTML strings or bytes to make then palatable for libxml2."
+    prefix, offset, suffix = repair_prefix(htmlstring, beginning)
+    if prefix or offset or suffix:
+        return prefix + htmlstring[offset:] + suffix
     return htmlstring
 
 
@@ -167,27 +320,90 @@ def fromstring_bytes(htmlobject: str) -> Optional[HtmlElement]:
 
 def load_html(htmlobject: Any) -> Optional[HtmlElement]:
     """Load object given as input and validate its type
-    (accepted: lxml.html tree, trafilatura/urllib3 response, bytestring and string)
-    """
+    (accepted: lxml.html tree, trafilatura/urllib3 response, bytestring, string and path).
+    Bytes are parsed directly if they are UTF-8 and decoded once otherwise."""
     if isinstance(htmlobject, HtmlElement):
         return htmlobject
-    if not isinstance(htmlobject, (bytes, str)):
+    if isinstance(htmlobject, PathLike):
+        return load_html_file(htmlobject)
+    if isinstance(htmlobject, bytes):
+        htmlobject = decode_html(htmlobject)
+    elif not isinstance(htmlobject, str):
         raise TypeError("incompatible input type", type(htmlobject))
     tree = None
     beginning = htmlobject[:50].lower()
     check_flag = is_dubious_html(beginning)
     htmlobject = repair_faulty_html(htmlobject, beginning)
-    fallback_parse = False
+    if isinstance(htmlobject, str):
+        # strings with an encoding declaration are refused by lxml
+        if STRING_DECLARATION.match(htmlobject):
+            tree = fromstring_bytes(htmlobject)
+        else:
+            try:
+                tree = fromstring(htmlobject, parser=HTML_PARSER)
+            except Exception as err:  # pragma: no cover
+                LOGGER.error("lxml parsing failed: %s", err)
+            if tree is None or len(tree) < 1:
+                tree = fromstring_bytes(htmlobject)
+    else:
+        try:
+            tree = fromstring(htmlobject, parser=HTML_PARSER)
+        except Exception as err:  # pragma: no cover
+            LOGGER.error("lxml parsing failed: %s", err)
+    if tree is not None and check_flag is True and len(tree) < 2:
+        LOGGER.error(
+            "parsed tree length: %s, wrong data type or not valid HTML",
+            len(tree),
+        )
+        tree = None
+    return tree
+
+
+def load_html_file(path: Union[str, "PathLike[str]"]) -> Optional[HtmlElement]:
+    """Parse a file through a memory map: UTF-8 documents are passed to the parser
+    in chunks, without a copy of the whole content. Fragments and documents in other
+    encodings are loaded at once, with the same result as load_html()."""
+    with open(path, "rb") as filehandle:
+        if fstat(filehandle.fileno()).st_size == 0:
+            LOGGER.error("empty file: %s", path)
+            return None
+        with mmap(filehandle.fileno(), 0, access=ACCESS_READ) as data:
+            return _parse_mapped(data)
+
+
+def _parse_mapped(data: mmap) -> Optional[HtmlElement]:
+    "Parse the content of a memory map, incrementally if possible."
+    beginning = data[:SNIFF_SIZE]
+    encoding = sniff_encoding(beginning)
+    if encoding not in (None, "utf-8"):
+        return load_html(data[:])
+    lowered = beginning[:50].lower()
+    prefix, offset, suffix = repair_prefix(data, lowered)
+    if not FULL_HTML.match(prefix + data[offset : offset + SNIFF_SIZE]):
+        return load_html(data[:])
+    # content without declaration: check that it is valid UTF-8 on the way
+    decoder = getincrementaldecoder("utf-8")() if encoding is None else None
+    parser = HTMLParser(**HTML_PARSER_OPTIONS)
+    chunks = chain(
+        (prefix,),
+        (data[pos : pos + FEED_CHUNK_SIZE] for pos in range(offset, len(data), FEED_CHUNK_SIZE)),
+        (suffix,),
+    )
+    tree = None
     try:
-        tree = fromstring(htmlobject, parser=HTML_PARSER)
-    except ValueError:
-        tree = fromstring_bytes(htmlobject)
-        fallback_parse = True
-    except Exception as err:  # pragma: no cover
+        for chunk in chunks:
+            if chunk:
+                if decoder is not None:
+                    decoder.decode(chunk)
+                parser.feed(chunk)
+        if decoder is not None:
+            decoder.decode(b"", True)
+        tree = parser.close()
+    except UnicodeDecodeError:
+        return load_html(data[:])
+    except Exception as err:
         LOGGER.error("lxml parsing failed: %s", err)
-    if (tree is None or len(tree) < 1) and not fallback_parse:
-        tree = fromstring_bytes(htmlobject)
-    if tree is not None and check_flag is True and len(tree) < 2:
+    if tree is not None and is_dubious_html(lowered) and len(tree) < 2:
         LOGGER.error(
             "parsed tree length: %s, wrong data type or not valid HTML",
             len(tree),
@@ -196,21 +412,196 @@ def load_html(htmlobject: Any) -> Optional[HtmlElement]:
     return tree
 
 
-@lru_cache(maxsize=2**14)
+def fragment_root(doc: HtmlElement) -> HtmlElement:
+    """Select the root of a parsed document which does not start with html or doctype,
+    as lxml.html.fromstring() does (libxml2 does not create several bodies or heads)."""
+    body = doc.find("body")
+    if body is None or doc.find("head") is not None:
+        return doc
+    if (
+        len(body) == 1
+        and (not body.text or not body.text.strip())
+        and (not body[-1].tail or not body[-1].tail.strip())
+    ):
+        return body[0]
+    body.tag = "div" if any(el.tag in block_tags for el in body.iter(Element)) else "span"
+    return body
+
+
+class HTMLFeed:
+    """Parse a document given in chunks of bytes with lxml's incremental parser,
+    with the same encoding detection and repairs as load_html(). The beginning is
+    kept until the repairs can be determined, parsing stops if max_size is exceeded."""
+
+    __slots__ = [
+        "decoder",
+        "dubious",
+        "failed",
+        "full_html",
+        "head",
+        "line_breaks",
+        "max_size",
+        "parser",
+        "size",
+        "suffix",
+    ]
+
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.head: Optional[bytearray] = bytearray()
+        self.line_breaks = [0, 0]
+        self.parser: Optional[HTMLParser] = None
+        self.decoder: Any = None
+        self.dubious = self.full_html = self.failed = False
+        self.suffix = b""
+
+    @property
+    def too_large(self) -> bool:
+        "The document exceeds the maximum size."
+        return self.max_size is not None and self.size > self.max_size
+
+    def feed(self, chunk: bytes) -> None:
+        "Parse a chunk of the document."
+        if self.failed:
+            return
+        self.size += len(chunk)
+        if self.too_large:
+            LOGGER.error("too large: length over %s", self.max_size)
+            self._stop()
+        elif self.head is not None:
+            self.head += chunk
+            self.line_breaks[0] += chunk.count(b"\n")
+            self.line_breaks[1] += chunk.count(b"\r")
+            # enough lines or bytes to determine the encoding and the repairs
+            if len(self.head) >= HEAD_SIZE or max(self.line_breaks) > 4:
+                self._start(False)
+        else:
+            self._parse(chunk)
+
+    def close(self) -> Optional[HtmlElement]:
+        "Finish parsing and return the tree, None if the document is invalid or too large."
+        if self.head is not None and not self.failed:
+            self._start(True)
+        if self.decoder is not None and not self.failed:
+            self._parse(b"", True)
+        if self.suffix:
+            self._feed_parser(self.suffix)
+        parser = self.parser
+        self._stop()
+        if parser is None:
+            return None
+        try:
+            tree = parser.close()
+        except Exception as err:
+            LOGGER.error("lxml parsing failed: %s", err)
+            return None
+        if not self.full_html:
+            tree = fragment_root(tree)
+        if self.dubious and len(tree) < 2:
+            LOGGER.error(
+                "parsed tree length: %s, wrong data type or not valid HTML",
+                len(tree),
+            )
+            return None
+        return tree
+
+    def _stop(self) -> None:
+        "Discard the parser and the data."
+        self.failed, self.parser, self.head = True, None, None
+
+    def _start(self, final: bool) -> None:
+        "Determine the encoding and the repairs, then start parsing."
+        head, self.head = bytes(self.head or b""), None
+        if not head:
+            self._stop()
+            return
+        encoding = sniff_encoding(head)
+        if encoding is None:
+            try:
+                getincrementaldecoder("utf-8")().decode(head, final)
+                encoding = "utf-8"
+            except UnicodeDecodeError:
+                encoding = guess_encoding(head)
+        if encoding == "utf-8-sig":
+            head, encoding = head[len(BOM_UTF8) :], "utf-8"
+        # other encodings are converted on the fly, the parser expects UTF-8
+        if encoding not in UNICODE_ALIASES:
+            self.decoder = getincrementaldecoder(encoding)(errors="replace")
+            head = self.decoder.decode(head, final).encode("utf-8")
+        beginning = head[:50].lower()
+        self.dubious = is_dubious_html(beginning)
+        prefix, offset, self.suffix = repair_prefix(head, beginning)
+        self.full_html = bool(FULL_HTML.match(prefix + head[offset : offset + SNIFF_SIZE]))
+        self.parser = HTMLParser(**HTML_PARSER_OPTIONS)
+        self._feed_parser(prefix + head[offset:])
+
+    def _parse(self, chunk: bytes, final: bool = False) -> None:
+        "Convert the chunk if necessary and pass it to the parser."
+        if self.decoder is not None:
+            chunk = self.decoder.decode(chunk, final).encode("utf-8")
+        # a suffix is only needed if the document has no newline
+        if self.suffix and b"\n" in chunk:
+            self.suffix = b""
+        self._feed_parser(chunk)
+
+    def _feed_parser(self, data: bytes) -> None:
+        if data and self.parser is not None:
+            try:
+                self.parser.feed(data)
+            except Exception as err:
+                LOGGER.error("lxml parsing failed: %s", err)
+                self._stop()
+
+
 def return_printables_and_spaces(char: str) -> str:
     "Return a character if it belongs to certain classes"
     return char if char.isprintable() or char.isspace() else ""
 
 
+class ControlCharacterTable(Dict[int, Optional[int]]):
+    """Translation table for str.translate() deleting the characters which are neither
+    printable nor spaces. The first code points are computed in advance, the other ones
+    are added as they are encountered, up to a maximum size."""
+
+    __slots__ = ["max_size"]
+
+    def __init__(self, precomputed: int = 0x800, max_size: int = 2**16) -> None:
+        super().__init__()
+        self.max_size = max_size
+        for codepoint in range(precomputed):
+            self[codepoint] = self._value(codepoint)
+
+    @staticmethod
+    def _value(codepoint: int) -> Optional[int]:
+        return codepoint if return_printables_and_spaces(chr(codepoint)) else None
+
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        value = self._value(codepoint)
+        if len(self) < self.max_size:
+            self[codepoint] = value
+        return value
+
+
+CONTROL_TABLE = ControlCharacterTable()
+ASCII_CONTROL = re.compile(
+    "[%s]" % "".join(re.escape(chr(c)) for c in range(128) if CONTROL_TABLE[c] is None)
+)
+
+
 def remove_control_characters(string: str) -> str:
     """Prevent non-printable and XML invalid character errors"""
-    return "".join(map(return_printables_and_spaces, string))
+    if string.isascii():
+        return ASCII_CONTROL.sub("", string) if ASCII_CONTROL.search(string) else string
+    return string.translate(CONTROL_TABLE)
 
 
 def normalize_unicode(
     string: str, unicodeform: Literal["NFC", "NFD", "NFKC", "NFKD"] = "NFC"
 ) -> str:
     "Normalize the given string to the specified unicode format."
+    if string.isascii() or is_normalized(unicodeform, string):
+        return string
     return normalize(unicodeform, string)
 
 
@@ -226,6 +617,8 @@ def line_processing(
         line.replace("&#13;", "\r")
         .replace("&#10;", "\n")
         .replace("&nbsp;", "\u00A0")
+        if "&" in line
+        else line
     )
     if not preserve_space:
         # remove newlines that are not related to punctuation or markup
@@ -263,6 +656,14 @@ def sanitize(
         return None
 
 
+def sanitize_text(text: str) -> str:
+    """Same result as unescape(sanitize(text, True)) in a few passes over the whole text:
+    control characters are deleted first since they do not include line breaks, empty
+    lines are removed at once and the space entities are left to the unescaping."""
+    text = LINE_BREAKS.sub("\n", remove_control_characters(text)).strip("\n")
+    return unescape(text.replace("\u2424", ""))
+
+
 def sanitize_tree(tree: _Element) -> _Element:
     """Trims spaces, removes control characters and normalizes unicode"""
     for elem in tree.iter():
@@ -336,15 +737,51 @@ def make_chunks(iterable: Any, n: int) -> Any:
         yield batch
 
 
-# def is_acceptable_length(my_len: int, options: Any) -> bool:
-#     "Check if the document length is within acceptable boundaries."
-#     if my_len < options.min_file_size:
-#         LOGGER.error("too small/incorrect for URL %s", options.url)
-#         return False
-#     if my_len > options.max_file_size:
-#         LOGGER.error("too large: length %s for URL %s", my_len, options.url)
-#         return False
-#     return True
+def is_acceptable_length(my_len: int, options: Any) -> bool:
+    "Check if the document length is within acceptable boundaries."
+    if my_len < options.min_file_size:
+        LOGGER.error("too small/incorrect for URL %s", options.url)
+        return False
+    if my_len > options.max_file_size:
+        LOGGER.error("too large: length %s for URL %s", my_len, options.url)
+        return False
+    return True
+
+
+def check_html_lang(tree: HtmlElement, target_language: str, strict: bool = False) -> bool:
+    """Check HTML meta-elements for language information and split
+    the result in case there are several languages."""
+    for attr in TARGET_LANG_ATTRS:
+        elems = tree.findall(f".//meta[@{attr}][@content]")
+        if elems:
+            if any(target_language in RE_HTML_LANG.split(elem.get("content", "").lower()) for elem in elems):
+                return True
+            LOGGER.debug("%s lang attr failed", attr)
+            return False
+    # HTML lang attribute: sometimes a wrong indication
+    if strict:
+        elems = tree.xpath("//html[@lang]")
+        if elems:
+            if any(target_language in RE_HTML_LANG.split(elem.get("lang", "").lower()) for elem in elems):
+                return True
+            LOGGER.debug("HTML lang failed")
+            return False
+    LOGGER.debug("No relevant lang elements found")
+    return True
+
+
+def language_classifier(text: str) -> Optional[str]:
+    "Identify the language of a text if the optional detector is installed."
+    if py3langid is None:
+        return None
+    return py3langid.classify(text)[0]  # type: ignore[no-any-return]
+
+
+def is_acceptable_tree_size(tree: _Element, max_tree_size: Optional[int]) -> bool:
+    "Check if the tree has no more elements than allowed, without counting them all."
+    if not max_tree_size:
+        return True
+    return next(islice(tree.iter(), max_tree_size, None), None) is None
 
 
 def textfilter(element: _Element) -> bool:
@@ -4,23 +4,40 @@
 # """
 
 
-from html import unescape
-from typing import List, Optional
+import csv
+import json
 import logging
-from lxml.etree import   _Element
 
+from codecs import getincrementaldecoder
+from copy import deepcopy
+from datetime import date
+from functools import lru_cache
+from html import unescape
+from io import StringIO
 from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, TextIO, Tuple
 
+from lxml.etree import DTD, Element, SubElement, _Element, iterwalk, strip_tags, xmlfile
+
+from .deadline import current_deadline
+from .stats import current_stats, measure
 from .utils import (
+    LINE_BREAKS,
     is_element_in_item,
     is_first_element_in_item,
     is_in_table_cell,
     is_last_element_in_cell,
     is_last_element_in_item,
-    sanitize,
+    normalize_unicode,
+    remove_control_characters,
+    sanitize_text,
     text_chars_test,
 )
 
+if TYPE_CHECKING:
+    from .settings import Document
+
 MAX_TABLE_WIDTH = 1000
 LOGGER = logging.getLogger(__name__)
 PKG_VERSION = version("trafilatura")
@@ -46,6 +63,55 @@ META_ATTRIBUTES = [
 
 HI_FORMATTING = {"#b": "**", "#i": "*", "#u": "__", "#t": "`"}
 
+# metadata fields of the header of the TXT formats, in this order
+TEXT_HEADER_FIELDS = [
+    "title",
+    "author",
+    "url",
+    "hostname",
+    "description",
+    "sitename",
+    "date",
+    "categories",
+    "tags",
+    "fingerprint",
+    "id",
+    "license",
+]
+# number of rendered fragments gathered before they are cleaned and written
+FLUSH_FRAGMENTS = 256
+# elements surrounded by line breaks in the minimal rendering
+MINIMAL_BREAKS = {"head", "item", "lb", "list", "p", "quote", "row", "table"}
+
+# fields of the CSV output, in this order
+CSV_FIELDS = [
+    "url",
+    "id",
+    "fingerprint",
+    "hostname",
+    "title",
+    "image",
+    "date",
+    "text",
+    "comments",
+    "license",
+    "pagetype",
+]
+CSV_NULL = "null"
+
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+TEI_NAMESPACE = "http://www.tei-c.org/ns/1.0"
+TEI_DTD = Path(__file__).parent / "data" / "tei_corpus.dtd"
+# elements of the internal format without TEI equivalent in the DTD, other unknown ones are stripped
+TEI_RENAMED = {"a": "ref", "cell": "seg", "row": "item", "table": "list"}
+TEI_VALID_TAGS = {"ab", "del", "div", "graphic", "hi", "item", "lb", "list", "p", "quote", "ref", "seg"}
+TEI_VALID_ATTRS = {"rend", "target", "type", "url"}
+# elements allowed as children of a division, the rest is wrapped in paragraphs
+TEI_DIV_CHILDREN = {"ab", "div", "list", "p", "quote"}
+# elements holding phrases, in which blocks are not allowed
+TEI_PHRASES = {"ab", "del", "hi", "p", "ref", "seg"}
+
 
 # # https://github.com/lxml/lxml/blob/master/src/lxml/html/__init__.py
 def delete_element(element: _Element, keep_tail: bool = True) -> None:
@@ -70,6 +136,17 @@ def delete_element(element: _Element, keep_tail: bool = True) -> None:
 
 def replace_element_text(element: _Element, include_formatting: bool) -> str:
     """Determine element text based on just the text of the element. One must deal with the tail separately."""
+    return format_element_text(element, include_formatting, None)
+
+
+def format_element_text(
+    element: _Element,
+    include_formatting: bool,
+    context: Optional[Tuple[bool, bool, bool]],
+) -> str:
+    """Format the text of an element, the position in table cells and list items
+    is either given as (last element in cell, first element in item, in table cell)
+    or determined by looking at the ancestors."""
     elem_text = element.text or ""
     # handle formatting: convert to markdown
     if include_formatting and element.text:
@@ -114,15 +191,21 @@ def replace_element_text(element: _Element, include_formatting: bool) -> str:
                 elem_text = link_text
         else:
             LOGGER.warning("empty link: %s %s", elem_text, element.attrib)
+    if context is None:
+        last_in_cell = is_last_element_in_cell(element)
+        first_in_item = is_first_element_in_item(element)
+        in_cell = is_in_table_cell(element)
+    else:
+        last_in_cell, first_in_item, in_cell = context
     # cells
     if element.tag == "cell":
         elem_text = elem_text.strip()
 
-        if elem_text and not is_last_element_in_cell(element):
+        if elem_text and not last_in_cell:
             elem_text = f"{elem_text} "
 
     # within lists
-    if is_first_element_in_item(element) and not is_in_table_cell(element):
+    if first_in_item and not in_cell:
         elem_text = f"- {elem_text}"
 
     return elem_text
@@ -215,6 +298,167 @@ def process_element(
         returnlist.append("\n")
 
 
+class _Frame:
+    "State of an element during the rendering: context passed down and cells counted up."
+    __slots__ = ["element", "children", "position", "in_cell", "below_cell", "item", "cells"]
+
+    def __init__(
+        self, element: _Element, in_cell: bool, below_cell: bool, item: Optional[_Element]
+    ) -> None:
+        self.element = element
+        self.children: List[_Element] = []
+        self.position = 0
+        # in a table cell (the element itself included, not for a root),
+        # below a table cell (ancestors only), closest list item (element included)
+        self.in_cell = in_cell
+        self.below_cell = below_cell
+        self.item = item
+        # number of cells in the subtree
+        self.cells = 0
+
+
+def _open_element(
+    element: _Element,
+    parent: Optional[_Frame],
+    returnlist: List[str],
+    include_formatting: bool,
+) -> _Frame:
+    "Render the beginning of an element, same as the first part of process_element()."
+    tag = element.tag
+    if parent is None:
+        below_cell = bool(element.xpath("ancestor::cell"))
+        item = next((e for e in element.iterancestors("item")), None)
+        in_cell = element.getparent() is not None and (below_cell or tag == "cell")
+    else:
+        below_cell = parent.below_cell or parent.element.tag == "cell"
+        item = parent.item
+        in_cell = below_cell or tag == "cell"
+    if tag == "item":
+        item = element
+    frame = _Frame(element, in_cell, below_cell, item)
+
+    if tag == "cell" and element.getprevious() is None:
+        returnlist.append("| ")
+
+    if element.text:
+        # this is the text that comes before the first child
+        last_in_cell = in_cell and (
+            len(element) == 0 if tag == "cell" else element.getnext() is None
+        )
+        first_in_item = item is not None and (item is element or not item.text)
+        returnlist.append(
+            format_element_text(
+                element, include_formatting, (last_in_cell, first_in_item, in_cell)
+            )
+        )
+
+    if element.tail and tag != "graphic" and in_cell:
+        returnlist.append(element.tail.strip())
+
+    # read the children now, the formatting of code blocks can remove some
+    frame.children = list(element)
+    return frame
+
+
+def _close_element(frame: _Frame, returnlist: List[str], include_formatting: bool) -> None:
+    "Render the end of an element, same as the second part of process_element()."
+    element, tag = frame.element, frame.element.tag
+    if not element.text:
+        if tag == "graphic":
+            # add source, default to ''
+            text = f'{element.get("title", "")} {element.get("alt", "")}'
+            returnlist.append(f'![{text.strip()}]({element.get("src", "")})')
+
+            if element.tail:
+                returnlist.append(f" {element.tail.strip()}")
+        # newlines for textless elements
+        elif tag in NEWLINE_ELEMS:
+            # add line after table head
+            if tag == "row":
+                cell_count = frame.cells
+                # restrict columns to a maximum of 1000
+                span_info = element.get("colspan") or element.get("span")
+                if not span_info or not span_info.isdigit():
+                    max_span = 1
+                else:
+                    max_span = min(int(span_info), MAX_TABLE_WIDTH)
+                # row ended so draw extra empty cells to match max_span
+                if cell_count < max_span:
+                    returnlist.append(f'{"|" * (max_span - cell_count)}\n')
+                # if this is a head row, draw the separator below
+                if any(
+                    child.tag == "cell" and child.get("role") == "head"
+                    for child in element
+                ):
+                    returnlist.append(f'\n|{"---|" * max_span}\n')
+            else:
+                returnlist.append("\n")
+        elif tag != "cell" and tag != "item":
+            # cells still need to append vertical bars
+            # but nothing more to do with other textless elements
+            return
+
+    in_item = frame.item is not None
+    following = element.getnext()
+    if tag in NEWLINE_ELEMS and not frame.below_cell and not in_item:
+        # spacing hack
+        returnlist.append(
+            "\n\u2424\n" if include_formatting and tag != "row" else "\n"
+        )
+    elif tag == "cell":
+        returnlist.append(" | ")
+    elif tag not in SPECIAL_FORMATTING and not (
+        frame.in_cell and following is None
+    ):
+        returnlist.append(" ")
+
+    # this is text that comes after the closing tag, so it should be after any NEWLINE_ELEMS
+    # unless it's within a list item or a table
+    if element.tail and not frame.in_cell:
+        returnlist.append(
+            element.tail.strip() if in_item or tag == "list" else element.tail
+        )
+
+    # deal with list items alone
+    if (
+        in_item
+        and not frame.in_cell
+        and (
+            len(element) == 0
+            if tag == "item"
+            else following is None or following.tag == "item"
+        )
+    ):
+        returnlist.append("\n")
+
+
+def render_element(
+    element: _Element,
+    returnlist: List[str],
+    include_formatting: bool,
+    flush: Optional[Callable[[], None]] = None,
+) -> None:
+    """Convert a LXML element and its children to a flattened string representation
+    in a single iterative traversal, with the same output as process_element().
+    The optional flush callback is called after each child of the element."""
+    deadline = current_deadline()
+    stack = [_open_element(element, None, returnlist, include_formatting)]
+    while stack:
+        frame = stack[-1]
+        if frame.position < len(frame.children):
+            deadline.check()
+            child = frame.children[frame.position]
+            frame.position += 1
+            stack.append(_open_element(child, frame, returnlist, include_formatting))
+            continue
+        stack.pop()
+        _close_element(frame, returnlist, include_formatting)
+        if stack:
+            stack[-1].cells += frame.cells + (frame.element.tag == "cell")
+            if flush is not None and len(stack) == 1:
+                flush()
+
+
 def xmltotxt(xmloutput: Optional[_Element], include_formatting: bool) -> str:
     "Convert to plain text format and optionally preserve formatting as markdown."
     if xmloutput is None:
@@ -222,6 +466,464 @@ def xmltotxt(xmloutput: Optional[_Element], include_formatting: bool) -> str:
 
     returnlist: List[str] = []
 
-    process_element(xmloutput, returnlist, include_formatting)
+    render_element(xmloutput, returnlist, include_formatting)
+
+    with measure(current_stats(), "sanitize"):
+        return sanitize_text("".join(returnlist))
+
+
+class TextWriter:
+    """Fused version of xmltotxt(), sanitize_text() and normalize_unicode(): the fragments
+    rendered for each block are cleaned as they come and written to a text sink, so that
+    the memory used depends on the size of the largest block and not of the document.
+    The output is optionally stripped as a whole, as with str.strip()."""
+
+    __slots__ = ["carry", "fragments", "newline", "section", "sink", "space", "started", "stats", "strip"]
+
+    def __init__(self, sink: TextIO, strip: bool = False) -> None:
+        self.sink = sink
+        self.strip = strip
+        self.fragments: List[str] = []
+        # raw text kept for the next cleaning pass
+        self.carry = ""
+        # line break held back until the rest of the tree is known
+        self.newline = False
+        # some text has been written for the current tree
+        self.section = False
+        # whitespace held back and some text written, if the output is stripped
+        self.space = ""
+        self.started = False
+        self.stats = current_stats()
+
+    def write(self, text: str) -> None:
+        "Write a text which does not need to be cleaned, such as a header."
+        self._emit(normalize_unicode(text))
+
+    def write_tree(self, tree: Optional[_Element], include_formatting: bool) -> None:
+        "Render a tree and write the cleaned result, same as sanitize_text(xmltotxt(tree))."
+        if tree is None:
+            return
+        render_element(tree, self.fragments, include_formatting, self._flush)
+        self._flush(True)
+
+    def write_plain(self, tree: Optional[_Element]) -> None:
+        """Write the text of a tree with line breaks around the blocks and bars between
+        the cells, without formatting: faster but coarser than write_tree().
+        The tree is left unchanged."""
+        if tree is None:
+            return
+        parts = self.fragments
+        for event, elem in iterwalk(tree, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag in MINIMAL_BREAKS:
+                    parts.append("\n")
+                # the content of comments and processing instructions is left out
+                if elem.text and isinstance(tag, str):
+                    parts.append(elem.text)
+            elif elem is not tree:
+                if tag in MINIMAL_BREAKS:
+                    parts.append("\n")
+                elif tag == "cell":
+                    parts.append(" | ")
+                if elem.tail:
+                    parts.append(elem.tail)
+        self._flush(True)
+
+    def close(self) -> None:
+        "Discard the trailing whitespace held back."
+        self.space = ""
+
+    def _flush(self, final: bool = False) -> None:
+        "Clean the text rendered so far, up to the last space unless the tree is finished."
+        if not final and len(self.fragments) < FLUSH_FRAGMENTS:
+            return
+        with measure(self.stats, "sanitize"):
+            raw = self.carry + "".join(self.fragments)
+            self.fragments.clear()
+            self.carry = ""
+            if not final:
+                # a split before a space cannot cut a line break, an entity or a character
+                # to be composed, the passes below give the same result on both parts
+                split = raw.rfind(" ")
+                if split <= 0:
+                    self.carry = raw
+                    return
+                raw, self.carry = raw[:split], raw[split:]
+            text = LINE_BREAKS.sub("\n", remove_control_characters(raw))
+            # strip the line breaks at both ends of the tree
+            if not self.section:
+                text = text.lstrip("\n")
+                self.section = bool(text)
+            if text and self.newline:
+                text = "\n" + text
+                self.newline = False
+            if text.endswith("\n"):
+                text = text[:-1]
+                self.newline = not final
+            if final:
+                self.section = self.newline = False
+            if "\u2424" in text:
+                text = text.replace("\u2424", "")
+            if "&" in text:
+                text = unescape(text)
+            self._emit(normalize_unicode(text))
+
+    def _emit(self, text: str) -> None:
+        "Write a cleaned text, holding back whitespace if the output is stripped."
+        if not self.strip:
+            if text:
+                self.sink.write(text)
+            return
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started = True
+        stripped = text.rstrip()
+        if stripped:
+            if self.space:
+                self.sink.write(self.space)
+            self.sink.write(stripped)
+            self.space = text[len(stripped) :]
+        else:
+            self.space += text
+
+
+class TextSinkAdapter:
+    "Binary file-like object passing the UTF-8 output of lxml on to a text sink."
+    __slots__ = ["decoder", "sink"]
+
+    def __init__(self, sink: TextIO) -> None:
+        self.sink = sink
+        self.decoder = getincrementaldecoder("utf-8")()
+
+    def write(self, data: bytes) -> int:
+        "Decode and pass on the data, characters split between writes are kept."
+        self.sink.write(self.decoder.decode(data))
+        return len(data)
+
+    def finish(self) -> None:
+        "Pass on the rest of the data."
+        self.sink.write(self.decoder.decode(b"", True))
+
+
+def normalize_tree(tree: _Element) -> None:
+    "Normalize the Unicode form of the texts of a tree in place."
+    for elem in tree.iter("*"):
+        if elem.text:
+            text = normalize_unicode(elem.text)
+            if text is not elem.text:
+                elem.text = text
+        if elem.tail:
+            tail = normalize_unicode(elem.tail)
+            if tail is not elem.tail:
+                elem.tail = tail
+
+
+def remove_empty_elements(tree: _Element) -> None:
+    "Remove the elements without content, except graphics and elements inside code blocks."
+    empty = [
+        element
+        for element in tree.iter("*")
+        if element.tag != "graphic"
+        and len(element) == 0
+        and not element.text
+        and not element.tail
+    ]
+    for element in empty:
+        parent = element.getparent()
+        if parent is not None and parent.tag != "code":
+            parent.remove(element)
+
+
+def metadata_attributes(document: "Document") -> Dict[str, str]:
+    "Gather the metadata fields of the document which are set, as strings."
+    values = {}
+    for attribute in META_ATTRIBUTES:
+        value = getattr(document, attribute, None)
+        if value:
+            values[attribute] = ";".join(value) if isinstance(value, list) else str(value)
+    return values
+
+
+def _render_text(tree: Optional[_Element], include_formatting: bool) -> str:
+    "Convert a tree to normalized text."
+    output = StringIO()
+    TextWriter(output).write_tree(tree, include_formatting)
+    return output.getvalue()
+
+
+def build_text_header(document: "Document") -> str:
+    "Build the metadata header of the TXT formats."
+    header = "---\n"
+    for attr in TEXT_HEADER_FIELDS:
+        if getattr(document, attr):
+            header += f"{attr}: {str(getattr(document, attr))}\n"
+    return header + "---\n"
+
+
+def write_txt(
+    document: "Document",
+    sink: TextIO,
+    include_formatting: bool = False,
+    with_metadata: bool = False,
+    minimal: bool = False,
+) -> None:
+    """Write the document as text or Markdown, cleaned and normalized block by block.
+    The minimal rendering writes plain text."""
+    writer = TextWriter(sink, strip=document.commentsbody is not None)
+    if with_metadata:
+        writer.write(build_text_header(document))
+    for num, tree in enumerate((document.body, document.commentsbody)):
+        if num and tree is not None:
+            writer.write("\n")
+        if minimal:
+            writer.write_plain(tree)
+        else:
+            writer.write_tree(tree, include_formatting)
+    writer.close()
 
-    return unescape(sanitize("".join(returnlist), True) or "")
+
+def write_csv(
+    document: "Document",
+    sink: TextIO,
+    include_formatting: bool = False,
+    delimiter: str = "\t",
+) -> None:
+    "Write the document as a CSV row with the CSV_FIELDS, without line terminator."
+    values = {
+        "text": _render_text(document.body, include_formatting),
+        "comments": _render_text(document.commentsbody, include_formatting),
+    }
+    writer = csv.writer(sink, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL, lineterminator="")
+    writer.writerow(
+        [values.get(field, getattr(document, field, None)) or CSV_NULL for field in CSV_FIELDS]
+    )
+
+
+def write_json(document: "Document", sink: TextIO, with_metadata: bool = False) -> None:
+    "Write the document as a JSON object, encoded incrementally."
+    data: Dict[str, Any] = {}
+    if with_metadata:
+        for slot in document.__slots__:
+            if slot not in ("body", "commentsbody", "comments", "raw_text", "text"):
+                data[slot] = getattr(document, slot, None)
+        data["source"] = data.pop("url")
+        data["source-hostname"] = data.pop("sitename")
+        data["excerpt"] = data.pop("description")
+        data["categories"] = ";".join(data["categories"] or [])
+        data["tags"] = ";".join(data["tags"] or [])
+    data["text"] = _render_text(document.body, False)
+    data["comments"] = _render_text(document.commentsbody, False)
+    for chunk in JSON_ENCODER.iterencode(data):
+        sink.write(chunk)
+
+
+def _wrap_loose_content(parent: _Element, allowed: Set[str], wrapper: str) -> None:
+    "Wrap the text and the children of an element which are not allowed there in new elements."
+    if not (parent.text and parent.text.strip()) and all(
+        child.tag in allowed and not (child.tail and child.tail.strip()) for child in parent
+    ):
+        return
+    text, parent.text = parent.text, None
+    children = list(parent)
+    for child in children:
+        parent.remove(child)
+    current: Optional[_Element] = None
+    for node, tail in [(None, text)] + [(child, child.tail) for child in children]:
+        if node is not None:
+            node.tail = None
+            if node.tag in allowed:
+                parent.append(node)
+                current = None
+            else:
+                if current is None:
+                    current = SubElement(parent, wrapper)
+                current.append(node)
+        if current is None and tail and tail.strip():
+            current = SubElement(parent, wrapper)
+        if current is not None and tail:
+            if len(current):
+                current[-1].tail = (current[-1].tail or "") + tail
+            else:
+                current.text = (current.text or "") + tail
+
+
+def convert_tei(tree: _Element) -> _Element:
+    """Convert a tree of the internal format to the elements and attributes
+    of the TEI DTD, in place: headings and code blocks become <ab> elements,
+    tables lists, and loose content of divisions is wrapped in paragraphs."""
+    # code blocks hold their lines directly
+    for elem in [elem for elem in tree.iterdescendants("code") if elem.find(".//code") is not None]:
+        strip_tags(elem, "code")
+    unknown = set()
+    for elem in tree.iterdescendants("*"):
+        tag = elem.tag
+        if tag == "head":
+            elem.tag = "ab"
+            elem.set("type", "header")
+        elif tag == "code":
+            if elem.getparent().tag in TEI_PHRASES:  # type: ignore[union-attr, operator]
+                elem.tag = "hi"
+                elem.set("rend", "code")
+            else:
+                elem.tag = "ab"
+                elem.set("type", "code")
+        elif tag == "graphic":
+            if elem.get("src"):
+                elem.set("url", elem.get("src"))  # type: ignore[arg-type]
+        elif tag == "a":
+            elem.set("target", elem.get("href", ""))
+        elif tag == "cell" and elem.get("role") == "head":
+            elem.set("type", "header")
+        elif tag == "table":
+            elem.set("type", "table")
+        elem.tag = TEI_RENAMED.get(elem.tag, elem.tag)  # type: ignore[arg-type]
+        if elem.tag not in TEI_VALID_TAGS:
+            unknown.add(elem.tag)
+        for attribute in [name for name in elem.attrib if name not in TEI_VALID_ATTRS]:
+            del elem.attrib[attribute]
+    if unknown:
+        strip_tags(tree, *unknown)
+    # blocks within phrases are merged with them
+    nested = [
+        elem for elem in tree.iterdescendants("ab", "p")
+        if elem.getparent().tag in TEI_PHRASES  # type: ignore[union-attr, operator]
+    ]
+    for elem in reversed(nested):
+        strip_tags(elem.getparent(), elem.tag)  # type: ignore[arg-type]
+    for elem in [tree, *tree.iterdescendants("div", "list")]:
+        if elem.tag == "list":
+            _wrap_loose_content(elem, {"item"}, "item")
+        else:
+            _wrap_loose_content(elem, TEI_DIV_CHILDREN, "p")
+    return tree
+
+
+def _prepare_trees(document: "Document") -> None:
+    "Clean and normalize the trees before an XML serialization."
+    for tree in (document.body, document.commentsbody):
+        if tree is not None:
+            remove_empty_elements(tree)
+            normalize_tree(tree)
+
+
+def _write_children(xf: Any, tag: str, tree: Optional[_Element], **attributes: str) -> None:
+    "Write the content of a tree under a new element, child by child."
+    with xf.element(tag, attributes):
+        if tree is None:
+            return
+        if tree.text:
+            xf.write(tree.text)
+        for child in tree:
+            xf.write(child, pretty_print=True)
+
+
+def write_xml(document: "Document", sink: TextIO) -> None:
+    "Write the document as XML, the trees are cleaned in place and streamed to the sink."
+    _prepare_trees(document)
+    adapter = TextSinkAdapter(sink)
+    with xmlfile(adapter, encoding="utf-8") as xf:
+        with xf.element("doc", metadata_attributes(document)):
+            _write_children(xf, "main", document.body)
+            _write_children(xf, "comments", document.commentsbody)
+    adapter.finish()
+
+
+def build_tei_header(document: "Document") -> _Element:
+    "Build the TEI header of a document from its metadata."
+    header = Element("teiHeader")
+    filedesc = SubElement(header, "fileDesc")
+    titlestmt = SubElement(filedesc, "titleStmt")
+    SubElement(titlestmt, "title", type="main").text = document.title
+    if document.author:
+        SubElement(titlestmt, "author").text = document.author
+    publicationstmt = SubElement(filedesc, "publicationStmt")
+    if document.license:
+        SubElement(publicationstmt, "publisher").text = document.sitename or document.hostname
+        SubElement(SubElement(publicationstmt, "availability"), "p").text = document.license
+    else:
+        # the publisher is also part of the source description
+        SubElement(publicationstmt, "p")
+    notes = [(name, getattr(document, name)) for name in ("id", "fingerprint") if getattr(document, name)]
+    if notes:
+        notesstmt = SubElement(filedesc, "notesStmt")
+        for name, value in notes:
+            SubElement(notesstmt, "note", type=name).text = value
+    bibl = SubElement(SubElement(filedesc, "sourceDesc"), "bibl")
+    bibl.text = ", ".join(
+        value for value in (document.title, document.author, document.sitename, document.date) if value
+    ) or None
+    if document.url:
+        SubElement(bibl, "ptr", type="URL", target=document.url)
+    profiledesc = SubElement(header, "profileDesc")
+    if document.description:
+        SubElement(SubElement(profiledesc, "abstract"), "p").text = document.description
+    if document.categories or document.tags:
+        keywords = SubElement(SubElement(profiledesc, "textClass"), "keywords")
+        for name in ("categories", "tags"):
+            if getattr(document, name):
+                SubElement(keywords, "term", type=name).text = ",".join(getattr(document, name))
+    creation = SubElement(profiledesc, "creation")
+    if not document.filedate:
+        document.filedate = date.today().isoformat()
+    SubElement(creation, "date", type="download").text = document.filedate
+    application = SubElement(
+        SubElement(SubElement(header, "encodingDesc"), "appInfo"),
+        "application",
+        version=PKG_VERSION,
+        ident="Trafilatura",
+    )
+    SubElement(application, "label").text = "Trafilatura"
+    SubElement(application, "ptr", target="https://github.com/adbar/trafilatura")
+    return header
+
+
+@lru_cache(maxsize=1)
+def _load_tei_dtd() -> DTD:
+    "Load the TEI DTD shipped with the package once, raise an error if it is missing."
+    return DTD(str(TEI_DTD))
+
+
+def validate_tei(tree: _Element) -> bool:
+    "Validate a TEI document against the DTD."
+    dtd = _load_tei_dtd()
+    result = dtd.validate(tree)
+    if result is False:
+        LOGGER.warning("not a valid TEI document: %s", dtd.error_log.last_error)
+    return result
+
+
+def build_tei_output(document: "Document") -> _Element:
+    "Build the complete TEI tree of a document, from converted copies of its trees."
+    tei = Element("TEI", xmlns=TEI_NAMESPACE)
+    tei.append(build_tei_header(document))
+    body = SubElement(SubElement(tei, "text"), "body")
+    for name, tree in (("entry", document.body), ("comments", document.commentsbody)):
+        div = convert_tei(deepcopy(tree)) if tree is not None else Element("div")
+        div.tag = "div"
+        div.attrib.clear()
+        div.set("type", name)
+        body.append(div)
+    return tei
+
+
+def write_xmltei(document: "Document", sink: TextIO, tei_validation: bool = False) -> None:
+    """Write the document as XML-TEI, the trees are cleaned and converted in place
+    and streamed to the sink. Validation requires a complete copy of the document."""
+    _prepare_trees(document)
+    for tree in (document.body, document.commentsbody):
+        if tree is not None:
+            convert_tei(tree)
+    if tei_validation:
+        LOGGER.debug("TEI validation result: %s %s", validate_tei(build_tei_output(document)), document.url)
+    adapter = TextSinkAdapter(sink)
+    with xmlfile(adapter, encoding="utf-8") as xf:
+        with xf.element(f"{{{TEI_NAMESPACE}}}TEI", nsmap={None: TEI_NAMESPACE}):
+            xf.write(build_tei_header(document), pretty_print=True)
+            with xf.element(f"{{{TEI_NAMESPACE}}}text"):
+                with xf.element(f"{{{TEI_NAMESPACE}}}body"):
+                    _write_children(xf, f"{{{TEI_NAMESPACE}}}div", document.body, type="entry")
+                    _write_children(xf, f"{{{TEI_NAMESPACE}}}div", document.commentsbody, type="comments")
+    adapter.finish()
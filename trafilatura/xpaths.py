@@ -212,6 +212,19 @@ DISCARD_IMAGE_ELEMENTS = [
 ]
 
 
+REMOVE_COMMENTS_XPATH = [
+    XPath(
+        """.//*[self::div or self::list or self::section][
+    starts-with(translate(@id, "C","c"), 'comment') or
+    starts-with(translate(@class, "C","c"), 'comment') or
+    contains(@class, 'article-comments') or contains(@class, 'post-comments')
+    or starts-with(@id, 'comol') or starts-with(@id, 'disqus_thread')
+    or starts-with(@id, 'dsq-comments')
+    ]"""
+    )
+]
+
+
 COMMENTS_DISCARD_XPATH = [
     XPath(x)
     for x in (